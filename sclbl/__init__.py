@@ -3,9 +3,23 @@ The sclbl package provide CLI tools for the Scailable Platform
 """
 import sys
 
+from . import _profile  # imported first: this marks the start of the import (see --profile).
 from .cli import *
 from .version import __version__
 
+
+# __getattr__ exposes the asynchronous client (sclbl.Client) without importing it (and asyncio) for every command,
+# and cutfill (see _output.py) without importing the output module.
+def __getattr__(name):
+    if name == "Client":
+        from .client import Client
+        return Client
+    if name == "cutfill":
+        from ._output import cutfill
+        return cutfill
+    raise AttributeError("module 'sclbl' has no attribute " + repr(name))
+
+
 # Check python version
 if sys.version_info < (3, 0):
     print('sclbl requires Python 3, while Python ' + str(sys.version[0] + ' was detected. Terminating... '))
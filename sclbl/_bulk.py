@@ -0,0 +1,179 @@
+# Helpers for commands that operate on many files or objects in a single invocation.
+# Note: the heavier modules (csv, asyncio) are imported by the functions using them, to keep the startup of
+# the CLI fast.
+import glob as fileglob
+import json
+import os
+import random
+import threading
+import time
+
+
+# collect_files expands a file, directory, or glob pattern into a sorted list of ONNX files.
+def collect_files(pattern):
+    """ Collect ONNX files
+
+    A path to a single file is returned as is (such that a wrong extension still results in a
+    clear error from the upload), a directory is expanded to the .onnx files it contains, and any
+    other pattern is treated as a glob.
+
+    Args:
+        pattern: Path of a file or directory, or a glob pattern (e.g., "models/*.onnx").
+    Returns:
+        A sorted list of file paths (empty if nothing matched).
+    """
+    if os.path.isfile(pattern):
+        return [pattern]
+    if os.path.isdir(pattern):
+        return sorted(os.path.join(pattern, f) for f in os.listdir(pattern) if f.endswith('.onnx'))
+    return sorted(f for f in fileglob.glob(pattern, recursive=True) if os.path.isfile(f))
+
+
+# read_manifest reads an upload manifest mapping files to their name, docs, and example.
+def read_manifest(path):
+    """ Read an upload manifest
+
+    The manifest is a JSON object mapping ONNX files (relative to the manifest) to their details:
+
+        {"model_a.onnx": {"name": "Model A", "docs": "...", "example": "..."}, ...}
+
+    Args:
+        path: Path of the JSON manifest.
+    Returns:
+        A list of dicts with the keys 'file', 'name', 'docs', and 'example'.
+    Raises:
+        ValueError if the manifest is not a JSON object.
+    """
+    with open(path) as f:
+        manifest = json.load(f)
+    if not isinstance(manifest, dict):
+        raise ValueError("The manifest should map file names to their details.")
+
+    base = os.path.dirname(os.path.abspath(path))
+    jobs = []
+    for file, details in manifest.items():
+        details = details or {}
+        jobs.append({
+            'file': os.path.join(base, file),
+            'name': details.get('name', model_name(file)),
+            'docs': details.get('docs', "..."),
+            'example': details.get('example', "...")})
+    return jobs
+
+
+# model_name derives a default model name from the path of an ONNX file.
+def model_name(path):
+    """ Name of a model based on its file name (without directory and extension). """
+    return os.path.splitext(os.path.basename(path))[0]
+
+
+# read_rows reads the rows of a CSV (with header) or JSON (list of objects) file.
+def read_rows(path):
+    """ Read rows
+
+    Args:
+        path: Path of a .json file containing a list of objects, or of a CSV file with a header line.
+    Returns:
+        A list of dicts.
+    Raises:
+        ValueError if the file does not contain a list of rows.
+    """
+    import csv
+    with open(path, newline='') as f:
+        if path.lower().endswith('.json'):
+            rows = json.load(f)
+            if not isinstance(rows, list) or not all(isinstance(row, dict) for row in rows):
+                raise ValueError("The file should contain a list of objects.")
+            return rows
+        return [dict(row) for row in csv.DictReader(f)]
+
+
+# write_rows writes rows to a CSV or JSON file (based on the extension).
+def write_rows(path, rows, fields):
+    """ Write rows
+
+    Args:
+        path: Path of the output file; rows are written as JSON if it ends with .json, as CSV otherwise.
+        rows: List of dicts.
+        fields: List of the keys (columns) to write.
+    """
+    import csv
+    with open(path, 'w', newline='') as f:
+        if path.lower().endswith('.json'):
+            json.dump([{field: row.get(field, "") for field in fields} for row in rows], f, indent=2)
+        else:
+            writer = csv.DictWriter(f, fieldnames=fields, extrasaction='ignore')
+            writer.writeheader()
+            writer.writerows(rows)
+
+
+# results_path returns the default path of the results file for an input file.
+def results_path(path):
+    """ Path of the results file: mapping.csv becomes mapping.results.csv. """
+    root, ext = os.path.splitext(path)
+    if root.endswith('.results'):  # rerun using a results file.
+        return path
+    return root + '.results' + (ext or '.csv')
+
+
+class RateLimiter:
+    """ Limit the number of calls per second (see retry_async) """
+
+    def __init__(self, rate):
+        """ Create a rate limiter
+
+        Args:
+            rate: Maximum number of calls per second; 0 (or less) disables the limit.
+        """
+        self.interval = 1.0 / rate if rate > 0 else 0.0
+        self.next = 0.0
+        self.lock = threading.Lock()
+
+    def reserve(self):
+        """ Reserve the next call; returns the number of seconds to wait before making it. """
+        if not self.interval:
+            return 0.0
+        with self.lock:
+            now = time.monotonic()
+            slot = max(now, self.next)
+            self.next = slot + self.interval
+        return slot - now
+
+
+# retry_async awaits func() until it returns a truthy value, retrying with exponential backoff.
+async def retry_async(func, retries=3, backoff=0.5, limiter=None, retry_on=Exception):
+    """ Await with retries
+
+    Calls that return a falsy value or raise an exception of the type(s) retry_on are considered
+    failed and retried after backoff * 2^attempt seconds (with jitter). Other exceptions are raised
+    at once (e.g., use client.NotProcessedError for requests that must not be sent twice).
+
+    Args:
+        func: Function without arguments returning an awaitable.
+        retries: Maximum number of retries. Default 3.
+        backoff: Base delay in seconds. Default 0.5.
+        limiter: Optional RateLimiter that every attempt waits for.
+        retry_on: Exception type (or tuple of types) that is retried. Default Exception.
+    Returns:
+        The (truthy) result of func.
+    Raises:
+        The exception of the last attempt, or RuntimeError if the last attempt returned a falsy value.
+    """
+    import asyncio
+    for attempt in range(retries + 1):
+        if limiter:
+            await asyncio.sleep(limiter.reserve())
+        try:
+            result = await func()
+            if result:
+                return result
+            error = RuntimeError("The operation failed.")
+        except retry_on as e:
+            error = e
+        if attempt < retries:
+            await asyncio.sleep(backoff * (2 ** attempt) * random.uniform(0.5, 1.0))
+    raise error
+
+
+if __name__ == '__main__':
+    print("No command line options available for _bulk.py.")
@@ -0,0 +1,398 @@
+# Local (SQLite) cache of the models, devices, and assignments listed by the CLI, of the uploaded models,
+# and an index of the model, device, and assignment names (see lookup; the assignments are named after
+# their model and device). Every server (see EXEC_MODE) has a cache file of its own (see path).
+import json
+import os
+import time
+import sclbl._globals as glob
+
+KINDS = ("models", "devices", "assignments")  # The cached listings.
+INDEXED = {'models': 'cfid', 'devices': 'did', 'assignments': 'aid'}  # The listings indexed, and their id fields.
+
+
+class FetchError(Exception):
+    """ Unable to retrieve a page of records (of a listing; see walk) """
+    pass
+
+
+# scoped returns the location of a local file of the current server (next to the given location).
+def scoped(location, server=None):
+    """ Location of a local file of the current server
+
+    Args:
+        location: String, the location of the file (e.g., glob.CACHE_FILE); "" stays "".
+        server: String, the url of the user manager. Default glob.USER_MANAGER_URL.
+    Returns:
+        The location with the host (and port) of the server added to the name, e.g.,
+        cache-usermanager.sclbl.net_8008.sqlite.
+    """
+    if not location:
+        return location
+    host = (server or glob.USER_MANAGER_URL).split("://")[-1].split("/")[0]
+    base, extension = os.path.splitext(location)
+    return base + "-" + "".join(c if c.isalnum() or c in "-." else "_" for c in host) + extension
+
+
+# path returns the cache file of the current server.
+def path():
+    """ The cache file of the current server (see scoped). """
+    return scoped(glob.CACHE_FILE)
+
+
+# _connect opens the cache database, creating it if needed.
+def _connect():
+    """ Open the cache
+
+    A new connection is opened for every operation, such that the cache can be used from
+    multiple threads (e.g., when prefetching pages) and multiple processes.
+
+    Returns:
+        A sqlite3 connection.
+    """
+    import sqlite3  # imported here to keep the startup of the CLI fast.
+    os.makedirs(os.path.dirname(path()), exist_ok=True)
+    conn = sqlite3.connect(path(), timeout=10)
+    conn.execute("CREATE TABLE IF NOT EXISTS pages ("
+                 "kind TEXT, offset INTEGER, lim INTEGER, fetched REAL, records TEXT, "
+                 "PRIMARY KEY (kind, offset, lim))")
+    conn.execute("CREATE TABLE IF NOT EXISTS uploads ("
+                 "cfid TEXT, digest TEXT, details TEXT, uploaded REAL, PRIMARY KEY (cfid, digest, details))")
+    conn.execute("CREATE TABLE IF NOT EXISTS names (kind TEXT, id TEXT, name TEXT, rid TEXT, PRIMARY KEY (kind, id))")
+    conn.execute("CREATE INDEX IF NOT EXISTS names_by_name ON names (kind, name)")
+    return conn
+
+
+# get returns a cached page of records, or None if it is not cached (or no longer fresh).
+def get(kind, offset, limit, ttl=None):
+    """ Get a cached page
+
+    Args:
+        kind: String, one of KINDS.
+        offset: Int, offset of the page.
+        limit: Int, size of the page.
+        ttl: Float, maximum age of the page in seconds; None uses glob.CACHE_TTL, a negative ttl
+            accepts pages of any age.
+    Returns:
+        The list of records, or None.
+    """
+    ttl = glob.CACHE_TTL if ttl is None else ttl
+    try:
+        conn = _connect()
+        try:
+            row = conn.execute("SELECT fetched, records FROM pages WHERE kind = ? AND offset = ? AND lim = ?",
+                               (kind, offset, limit)).fetchone()
+        finally:
+            conn.close()
+    except Exception:  # A broken or locked cache should never break the CLI.
+        return None
+    if row is None or (ttl >= 0 and time.time() - row[0] > ttl):
+        return None
+    return json.loads(row[1])
+
+
+# put stores a page of records.
+def put(kind, offset, limit, records):
+    """ Store a page
+
+    The models and devices on the page are added to the name index as well.
+
+    Args:
+        kind: String, one of KINDS.
+        offset: Int, offset of the page.
+        limit: Int, size of the page.
+        records: List of records (dicts) as returned by the platform.
+    Returns:
+        True if the page was stored, False otherwise.
+    """
+    try:
+        conn = _connect()
+        try:
+            with conn:
+                conn.execute("INSERT OR REPLACE INTO pages VALUES (?, ?, ?, ?, ?)",
+                             (kind, offset, limit, time.time(), json.dumps(records)))
+                _index(conn, kind, records)
+        finally:
+            conn.close()
+    except Exception:
+        return False
+    return True
+
+
+# invalidate removes all cached pages of the given kinds.
+def invalidate(*kinds):
+    """ Invalidate cached listings
+
+    Called by the commands that change the state of the platform; the offsets of all records
+    following a created or deleted record shift, so the complete listing is removed.
+
+    Args:
+        kinds: Strings, the listings to remove (see KINDS).
+    Returns:
+        True if successful, False otherwise.
+    """
+    if not os.path.exists(path()):
+        return True
+    try:
+        conn = _connect()
+        try:
+            with conn:
+                conn.executemany("DELETE FROM pages WHERE kind = ?", [(kind,) for kind in kinds])
+        finally:
+            conn.close()
+    except Exception:
+        return False
+    return True
+
+
+# clear removes the cache completely (e.g., when the user details are reset).
+def clear():
+    """ Remove the cache files of all servers
+
+    Returns:
+        True if the caches were removed (or did not exist), False otherwise.
+    """
+    directory = os.path.dirname(glob.CACHE_FILE)
+    base, extension = os.path.splitext(os.path.basename(glob.CACHE_FILE))
+    try:
+        for name in os.listdir(directory) if os.path.isdir(directory) else []:
+            if name == base + extension or (name.startswith(base + "-") and name.endswith(extension)):
+                os.remove(os.path.join(directory, name))
+    except OSError:
+        return False
+    return True
+
+
+# _name returns the name of a record in the name index.
+def _name(record):
+    if 'name' in record or 'model_name' not in record:
+        return str(record.get('name') or "")
+    return str(record.get('model_name') or "") + " on " + str(record.get('device_name') or "")
+
+
+# _index adds (or updates) the names of models, devices, or assignments in the name index.
+def _index(conn, kind, records):
+    if kind in INDEXED:
+        key = INDEXED[kind]
+        conn.executemany("INSERT OR REPLACE INTO names VALUES (?, ?, ?, ?)",
+                         [(kind, str(r[key]), _name(r), str(r.get('rid') or "")) for r in records if r.get(key)])
+
+
+# index replaces the name index of a listing with the complete listing.
+def index(kind, records):
+    """ Rebuild the name index
+
+    The index is also updated with every page stored using put(); rebuilding it from a complete
+    listing removes the models or devices that no longer exist.
+
+    Args:
+        kind: String, one of INDEXED.
+        records: List of all records of the listing.
+    Returns:
+        True if successful, False otherwise.
+    """
+    try:
+        conn = _connect()
+        try:
+            with conn:
+                conn.execute("DELETE FROM names WHERE kind = ?", (kind,))
+                _index(conn, kind, records)
+        finally:
+            conn.close()
+    except Exception:
+        return False
+    return True
+
+
+# unindex removes deleted models or devices from the name index.
+def unindex(kind, ids):
+    """ Remove the objects ids of the listing kind (see INDEXED) from the name index. """
+    if not os.path.exists(path()):
+        return True
+    try:
+        conn = _connect()
+        try:
+            with conn:
+                conn.executemany("DELETE FROM names WHERE kind = ? AND id = ?", [(kind, i) for i in ids])
+        finally:
+            conn.close()
+    except Exception:
+        return False
+    return True
+
+
+# lookup finds models or devices in the name index by their name, or by a prefix of their name or id.
+def lookup(kind, text, limit=10):
+    """ Look up a name
+
+    Both the names and the ids are indexed, so a lookup takes constant time however many models or
+    devices are known.
+
+    Args:
+        kind: String, one of INDEXED.
+        text: String, the name, or a prefix of the name or id.
+        limit: Int, maximum number of matches returned.
+    Returns:
+        A list of dicts with the keys id, name, and rid ("" for models): the objects named text if
+        there are any, otherwise those whose name or id starts with text. Empty if nothing matches
+        (or the index is not available).
+    """
+    if not text or not os.path.exists(path()):
+        return []
+    end = text + chr(0x10ffff)  # upper bound of the strings starting with text.
+    try:
+        conn = _connect()
+        try:
+            rows = conn.execute("SELECT id, name, rid FROM names WHERE kind = ? AND name = ? LIMIT ?",
+                                (kind, text, limit)).fetchall()
+            if not rows:
+                rows = conn.execute("SELECT id, name, rid FROM names WHERE kind = ? AND name >= ? AND name < ? "
+                                    "LIMIT ?", (kind, text, end, limit)).fetchall()
+                rows += conn.execute("SELECT id, name, rid FROM names WHERE kind = ? AND id >= ? AND id < ? "
+                                     "LIMIT ?", (kind, text, end, limit)).fetchall()
+        finally:
+            conn.close()
+    except Exception:
+        return []
+    matches = {row[0]: {'id': row[0], 'name': row[1], 'rid': row[2]} for row in rows}
+    return list(matches.values())[:limit]
+
+
+# uploaded checks whether a model with identical content and details was uploaded before.
+def uploaded(digest, details, cfid=""):
+    """ Check the upload manifest
+
+    Args:
+        digest: String, hash of the ONNX file (see _files.file_hash).
+        details: String, hash of the name, docs, and example (see _files.details_hash).
+        cfid: String, the model that was updated; "" for uploads of new models (any model counts).
+    Returns:
+        True if the content was uploaded before (and recorded using record_upload), False otherwise.
+    """
+    if not os.path.exists(path()):
+        return False
+    try:
+        conn = _connect()
+        try:
+            if cfid:
+                row = conn.execute("SELECT 1 FROM uploads WHERE cfid = ? AND digest = ? AND details = ?",
+                                   (cfid, digest, details)).fetchone()
+            else:  # entries without cfid (of earlier versions) cannot be forgotten when the model is deleted.
+                row = conn.execute("SELECT 1 FROM uploads WHERE cfid != '' AND digest = ? AND details = ?",
+                                   (digest, details)).fetchone()
+        finally:
+            conn.close()
+    except Exception:
+        return False
+    return row is not None
+
+
+# record_upload adds a successful upload (or update) to the upload manifest.
+def record_upload(digest, details, cfid):
+    """ Record an upload
+
+    Only the latest content of a model is kept. Uploads whose cfid is unknown (the toolchain did not
+    return it) are not recorded, as they could not be forgotten when the model is deleted.
+
+    Args:
+        digest: String, hash of the ONNX file.
+        details: String, hash of the name, docs, and example.
+        cfid: String, the model that was uploaded or updated.
+    Returns:
+        True if recorded, False otherwise.
+    """
+    if not cfid:
+        return False
+    try:
+        conn = _connect()
+        try:
+            with conn:
+                conn.execute("DELETE FROM uploads WHERE cfid = ?", (cfid,))
+                conn.execute("INSERT OR REPLACE INTO uploads VALUES (?, ?, ?, ?)", (cfid, digest, details, time.time()))
+        finally:
+            conn.close()
+    except Exception:
+        return False
+    return True
+
+
+# forget_uploads removes the recorded uploads of a (deleted) model.
+def forget_uploads(cfid):
+    """ Remove the manifest entries of the model cfid. """
+    if not os.path.exists(path()):
+        return True
+    try:
+        conn = _connect()
+        try:
+            with conn:
+                conn.execute("DELETE FROM uploads WHERE cfid = ?", (cfid,))
+        finally:
+            conn.close()
+    except Exception:
+        return False
+    return True
+
+
+# cached_fetch wraps a page fetch function (e.g., Client.records) with the cache.
+def cached_fetch(kind, fetch, refresh=False, cached=False):
+    """ Cached fetch function
+
+    Args:
+        kind: String, one of KINDS.
+        fetch: Coroutine function called as fetch(offset, limit) returning a list of records.
+        refresh: Bool, if True the cache is not read (but is updated).
+        cached: Bool, if True only the cache is used (of any age) and fetch is never called.
+    Returns:
+        A coroutine function called as fetch(offset, limit) (see walk).
+    """
+    async def _fetch(offset, limit):
+        if not refresh:
+            records = get(kind, offset, limit, -1 if cached else None)
+            if records is not None:
+                return records
+        if cached:
+            raise FetchError("No cached " + kind + " found; run the command without --cached.")
+        records = await fetch(offset, limit)
+        put(kind, offset, limit, records)
+        return records
+
+    return _fetch
+
+
+# walk yields the records of all pages of a listing, retrieving the next page while a page is consumed.
+async def walk(fetch, offset=0, limit=100):
+    """ Iterate over all records of a listing (async generator)
+
+    Pages of limit records are retrieved until a page is incomplete; the next page is already
+    requested while the records of the current page are consumed, so at most two pages are held
+    in memory at any time. Used by Client.iter_records, and by the CLI to walk cached pages
+    without creating a client (see cached_fetch).
+
+    Args:
+        fetch: Coroutine function called as fetch(offset, limit) retrieving a page.
+        offset: Int, offset of the first record. Default 0.
+        limit: Int, the page size. Default 100.
+    Raises:
+        FetchError if a page cannot be retrieved (after yielding the records of the earlier pages).
+    """
+    import asyncio
+    limit = max(1, limit)
+    page = await fetch(offset, limit)
+    while True:
+        following = None
+        if len(page) >= limit:
+            following = asyncio.ensure_future(fetch(offset + limit, limit))
+        try:
+            for record in page:
+                yield record
+        except GeneratorExit:
+            if following:
+                following.cancel()
+            raise
+        if following is None:
+            return
+        page = await following
+        offset += limit
+
+
+if __name__ == '__main__':
+    print("No command line options available for _cache.py.")
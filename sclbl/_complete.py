@@ -0,0 +1,152 @@
+# Shell completion of model, device, and assignment ids and names (see the README for enabling it).
+#
+# Completion is served from a snapshot file (glob.COMPLETION_FILE; one per server, like the cache) that is
+# written from the name index of the local cache (see _cache.py) in a background process after every
+# listing; completing never touches the network or the cache database. The snapshot holds one line per
+# completion, "field<TAB>value<TAB>help", sorted by the bytes of the line, such that the completions of a
+# prefix are found by a binary search of the memory-mapped file: completing takes the same time for a
+# hundred or a hundred thousand entries.
+import os
+import sclbl._globals as glob
+from sclbl._cache import path as cache_path, scoped
+
+# The completed fields: the listing they are taken from, and whether the value is the id or the name
+# (the other is shown as help, where the shell supports it).
+FIELDS = {'cfid': ("models", 'id'), 'did': ("devices", 'id'), 'aid': ("assignments", 'id'),
+          'model-name': ("models", 'name'), 'device-name': ("devices", 'name')}
+LIMIT = 200  # Maximum number of completions returned.
+
+
+# _clean makes a value fit on a line of the snapshot.
+def _clean(text):
+    return " ".join(str(text).split())
+
+
+# write writes the snapshot from the name index of the cache.
+def write(cache_file=None, path=None):
+    """ Write the completion snapshot
+
+    Args:
+        cache_file: String, the cache database (default the cache of the current server).
+        path: String, the snapshot file (default the snapshot of the current server).
+    Returns:
+        The number of completions written, or None if the cache cannot be read or the snapshot
+        cannot be written.
+    """
+    import sqlite3
+    cache_file, path = cache_file or cache_path(), path or scoped(glob.COMPLETION_FILE)
+    if not path or not os.path.exists(cache_file):
+        return None
+    try:
+        conn = sqlite3.connect(cache_file, timeout=10)
+        try:
+            rows = conn.execute("SELECT kind, id, name FROM names").fetchall()
+        finally:
+            conn.close()
+    except sqlite3.Error:  # e.g., no listing indexed yet.
+        return None
+    lines = set()
+    for kind, id_, name in rows:
+        id_, name = _clean(id_), _clean(name)
+        for field, (listing, value) in FIELDS.items():
+            if listing == kind and (id_ if value == 'id' else name):
+                lines.add((field + "\t" + (id_ + "\t" + name if value == 'id' else name + "\t" + id_)).encode())
+    temporary = path + "." + str(os.getpid()) + ".tmp"
+    try:
+        with open(temporary, 'wb') as f:
+            f.write(b"".join(line + b"\n" for line in sorted(lines)))
+        os.replace(temporary, path)  # completions never see a partially written snapshot.
+    except OSError:
+        return None
+    return len(lines)
+
+
+# refresh rewrites the snapshot in a background process (the command that calls it does not wait).
+def refresh():
+    """ Refresh the completion snapshot in the background
+
+    Nothing is done when the cache did not change since the snapshot was written (e.g., a listing
+    served from the cache), or when glob.COMPLETION_FILE is "" (completion disabled).
+
+    Returns:
+        True if the background process was started, False otherwise.
+    """
+    import subprocess
+    import sys
+    cache_file, path = cache_path(), scoped(glob.COMPLETION_FILE)
+    try:
+        if not path or os.path.getmtime(path) > os.path.getmtime(cache_file):
+            return False
+    except OSError:  # no snapshot yet (or no cache, which write handles).
+        pass
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))  # also works from a checkout.
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [root, os.environ.get("PYTHONPATH")])))
+    code = "import sys; from sclbl._complete import write; write(*sys.argv[1:])"
+    try:
+        subprocess.Popen([sys.executable, "-c", code, cache_file, path], env=env,
+                         stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                         start_new_session=True)
+    except OSError:
+        return False
+    return True
+
+
+# _first returns the offset of the first line of the sorted data that is not smaller than key.
+def _first(data, key):
+    lo, hi = 0, len(data)  # both at the start of a line.
+    while lo < hi:
+        start = data.rfind(b"\n", 0, (lo + hi) // 2) + 1
+        end = data.find(b"\n", start)
+        if data[start:end] < key:
+            lo = end + 1
+        else:
+            hi = start
+    return lo
+
+
+# lookup returns the snapshot entries of a field starting with a prefix.
+def lookup(field, prefix, path=None, limit=LIMIT):
+    """ Complete a value
+
+    Args:
+        field: String, one of FIELDS.
+        prefix: String, the text typed so far.
+        path: String, the snapshot file (default the snapshot of the current server).
+        limit: Int, maximum number of entries returned.
+    Returns:
+        A list of (value, help) tuples in sorted order; empty if there is no snapshot.
+    """
+    import mmap
+    key = (field + "\t" + prefix).encode()
+    path = path or scoped(glob.COMPLETION_FILE)
+    if not path:
+        return []
+    try:
+        with open(path, 'rb') as f:
+            data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError):  # no snapshot (yet), or an empty one.
+        return []
+    entries = []
+    with data:
+        position = _first(data, key)
+        while len(entries) < limit and data[position:position + len(key)] == key:
+            end = data.find(b"\n", position)
+            value, _, help_ = data[position + len(field) + 1:end].decode(errors="replace").partition("\t")
+            entries.append((value, help_))
+            position = end + 1
+    return entries
+
+
+# completer returns the shell_complete function of an option completing a field.
+def completer(field):
+    """ Completion callback for click.option(shell_complete=...) """
+
+    def complete(ctx, param, incomplete):
+        from click.shell_completion import CompletionItem
+        return [CompletionItem(value, help=help_) for value, help_ in lookup(field, incomplete)]
+
+    return complete
+
+
+if __name__ == '__main__':
+    print("No command line options available for _complete.py.")
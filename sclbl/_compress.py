@@ -0,0 +1,131 @@
+# Optional compression of upload request bodies.
+import os
+import sclbl._globals as glob
+from sclbl._files import CHUNK_SIZE
+
+METHODS = glob.COMPRESS_METHODS  # Values of the --compress option.
+MIN_SAVING = 0.1  # Minimum (estimated) fraction of the body saved by compression; otherwise it is sent as is.
+SAMPLE_BLOCKS = 4  # Number of blocks of CHUNK_SIZE bytes sampled to estimate the compression ratio.
+
+
+# resolve translates a --compress option value into the compression method to use.
+def resolve(method):
+    """ Resolve the compression method
+
+    Args:
+        method: String, one of METHODS; "auto" uses zstd when the zstandard package is installed
+            and gzip otherwise.
+    Returns:
+        "gzip", "zstd", or None (no compression).
+    Raises:
+        ValueError if the method is unknown or zstd is requested without the zstandard package.
+    """
+    import importlib.util
+    if method in (None, "", "none"):
+        return None
+    if method not in METHODS:
+        raise ValueError("Unknown compression method " + str(method) + ".")
+    available = importlib.util.find_spec("zstandard") is not None
+    if method == "auto":
+        return "zstd" if available else "gzip"
+    if method == "zstd" and not available:
+        raise ValueError("zstd compression requires the zstandard package (pip install zstandard).")
+    return method
+
+
+# compressor returns a new streaming compressor (with compress() and flush()) for the method.
+def compressor(method):
+    """ Streaming compressor for "gzip" or "zstd". """
+    if method == "zstd":
+        import zstandard
+        return zstandard.ZstdCompressor(level=3).compressobj()
+    import zlib
+    return zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)  # 16 + MAX_WBITS writes a gzip header.
+
+
+# estimate_ratio estimates the compression ratio of a file by compressing a few evenly spaced blocks.
+def estimate_ratio(path, method, blocks=SAMPLE_BLOCKS):
+    """ Estimate the compression ratio
+
+    Compressing a sample (at most blocks * CHUNK_SIZE bytes, spread over the file) is cheap compared
+    to the upload itself and tells whether compressing the complete file is worth the time.
+
+    Args:
+        path: Path of the file.
+        method: "gzip" or "zstd".
+        blocks: Int, number of blocks sampled. Default SAMPLE_BLOCKS.
+    Returns:
+        Float, the compressed size divided by the original size of the sample (1.0 for empty files).
+    """
+    size = os.path.getsize(path)
+    if size <= blocks * CHUNK_SIZE:
+        offsets = range(0, size, CHUNK_SIZE)
+    else:
+        offsets = [i * (size - CHUNK_SIZE) // (blocks - 1) for i in range(blocks)] if blocks > 1 else [0]
+    raw, compressed = 0, 0
+    with open(path, 'rb') as f:
+        for offset in offsets:
+            f.seek(offset)
+            block = f.read(CHUNK_SIZE)
+            c = compressor(method)
+            raw += len(block)
+            compressed += len(c.compress(block)) + len(c.flush())
+    return compressed / raw if raw else 1.0
+
+
+class CompressedBody:
+    """ A request body compressed while it is streamed
+
+    Wraps a body with a read() method (see _transport.MultipartStream). Iterating over it reads and
+    compresses the body block by block; the compressed size is not known up front, so requests sends
+    it using chunked transfer encoding. Every iteration starts from the beginning of the body again
+    (e.g., to retry a request) and updates the size and timing statistics.
+    """
+
+    def __init__(self, body, method):
+        """ Create the body
+
+        Args:
+            body: The uncompressed body; an object with read() and rewind() methods.
+            method: "gzip" or "zstd".
+        """
+        self.body = body
+        self.method = method
+        self.raw = 0  # Uncompressed bytes read from the body.
+        self.sent = 0  # Compressed bytes produced.
+        self.seconds = 0.0  # Time spent compressing.
+
+    def __iter__(self):
+        import time
+        self.body.rewind()
+        self.raw, self.sent, self.seconds = 0, 0, 0.0
+        c = compressor(self.method)
+        while True:
+            block = self.body.read(CHUNK_SIZE)
+            start = time.perf_counter()
+            out = c.compress(block) if block else c.flush()
+            self.seconds += time.perf_counter() - start
+            self.raw += len(block)
+            self.sent += len(out)
+            if out:
+                yield out
+            if not block:
+                break
+
+
+# summary formats the compression part of an upload report (see _transport.upload_model) for the user.
+def summary(report):
+    """ Describe the compression of an upload, e.g., 'Compressed (gzip) 10.0 MB to 2.1 MB (21%) in 0.4s.' """
+    from sclbl._transport import format_bytes
+    if report.get('compression'):
+        return ("Compressed (" + report['compression'] + ") " + format_bytes(report['size']) + " to " +
+                format_bytes(report['sent']) + " (" + str(int(round(100 * report['sent'] / max(report['size'], 1)))) +
+                "%) in " + "{:.1f}".format(report['seconds']) + "s.")
+    if report.get('estimate') is not None:
+        return ("Sent uncompressed; compression would save only about " +
+                str(int(round(100 * (1 - report['estimate'])))) + "%.")
+    return ""
+
+
+if __name__ == '__main__':
+    print("No command line options available for _compress.py.")
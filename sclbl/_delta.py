@@ -0,0 +1,290 @@
+# Delta updates: sending only the parts of a model that changed since its last update (see update --delta).
+#
+# An ONNX file is a serialized (protobuf) ModelProto. Its graph consists of fields for every node,
+# initializer (tensor), input, and output; retraining part of a model changes only some of these. The
+# file is split into segments at these fields, without decoding them (so the onnx package is not needed),
+# and every segment of the new model that also occurs in the copy of the previous update kept on this
+# machine is replaced by a reference to it:
+#
+#     SCLBL-DELTA 1\n
+#     {"base": <sha256 of the previous model>, "digest": <sha256 of the new model>, "size": <bytes>,
+#      "ops": [["copy", <offset in the previous model>, <length>], ["add", <length>], ...]}\n
+#     <the bytes of the "add" operations, in order>
+#
+# The toolchain rebuilds the new model by concatenating the copied and added bytes (see apply).
+import hashlib
+import json
+import os
+import shutil
+import time
+import sclbl._globals as glob
+
+MAGIC = b"SCLBL-DELTA 1\n"  # The first line of a patch.
+MIN_SAVING = 0.1  # Minimum fraction of the model a patch has to save; otherwise the complete model is sent.
+GRAPH = 7  # Field number of the graph in a ModelProto.
+UNSUPPORTED = {404, 405, 501}  # Statuses of a PATCH request to a toolchain that does not support patches.
+RECHECK = 7 * 24 * 3600.0  # Seconds after which patches are tried again on a toolchain that did not support them.
+
+
+# _varint reads a protobuf varint at position; it returns the value and the position after it.
+def _varint(data, position):
+    value, shift = 0, 0
+    while True:
+        if position >= len(data) or shift > 63:
+            raise ValueError("Truncated or invalid varint.")
+        byte = data[position]
+        value |= (byte & 0x7f) << shift
+        position += 1
+        if not byte & 0x80:
+            return value, position
+        shift += 7
+
+
+# _fields yields (field number, start, payload start, end) for the protobuf fields in data[start:end].
+def _fields(data, start, end):
+    position = start
+    while position < end:
+        tag, payload = _varint(data, position)
+        wire = tag & 7
+        if wire == 0:
+            _, stop = _varint(data, payload)
+        elif wire == 1:
+            stop = payload + 8
+        elif wire == 2:
+            length, payload = _varint(data, payload)
+            stop = payload + length
+        elif wire == 5:
+            stop = payload + 4
+        else:
+            raise ValueError("Unsupported protobuf wire type " + str(wire) + ".")
+        if stop > end:
+            raise ValueError("Truncated protobuf field.")
+        yield tag >> 3, position, payload, stop
+        position = stop
+
+
+# segments splits a serialized ONNX model at the fields of the model and of its graph.
+def segments(data):
+    """ Split a model
+
+    Args:
+        data: Bytes (or a memory map) of an ONNX file.
+    Returns:
+        A list of (start, end) offsets covering data in order: a segment per field of the model,
+        except for the graph, which is split into its header (tag and length) and a segment per
+        field of the graph (every node, initializer, input, output, ...).
+    Raises:
+        ValueError if data is not a serialized protobuf message.
+    """
+    result = []
+    for number, start, payload, end in _fields(data, 0, len(data)):
+        if number == GRAPH and payload < end and data[start] & 7 == 2:
+            result.append((start, payload))
+            result.extend((s, e) for _, s, _, e in _fields(data, payload, end))
+        else:
+            result.append((start, end))
+    return result
+
+
+# _digest returns the sha256 digest of (part of) a file.
+def _digest(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+# diff computes the operations rebuilding new from base.
+def diff(base, new):
+    """ Compare two models
+
+    Args:
+        base: Bytes (or a memory map) of the previous model.
+        new: Bytes (or a memory map) of the new model.
+    Returns:
+        A list of operations: ("copy", offset in base, length) and ("add", offset in new, length);
+        adjacent operations are merged.
+    Raises:
+        ValueError if either is not a serialized protobuf message.
+    """
+    known = {}
+    for start, end in segments(base):
+        known.setdefault(_digest(base[start:end]), start)
+    ops = []
+    for start, end in segments(new):
+        offset = known.get(_digest(new[start:end]))
+        op = ("copy", offset, end - start) if offset is not None else ("add", start, end - start)
+        if ops and ops[-1][0] == op[0] and ops[-1][1] + ops[-1][2] == op[1]:
+            ops[-1] = (op[0], ops[-1][1], ops[-1][2] + op[2])
+        else:
+            ops.append(op)
+    return ops
+
+
+# write_patch writes the patch turning the model at base_path into the model at path.
+def write_patch(base_path, path, out):
+    """ Write a patch (see the top of this file)
+
+    Neither model is read into memory as a whole: both are memory mapped, and the added bytes are
+    copied from the new model to out.
+
+    Args:
+        base_path: Path of the previous model.
+        path: Path of the new model.
+        out: Path of the patch written.
+    Returns:
+        Int, the size of the patch in bytes.
+    Raises:
+        ValueError if either file is not an ONNX model.
+        OSError if a file cannot be read or written.
+    """
+    import mmap
+    with open(base_path, 'rb') as b, open(path, 'rb') as n:
+        if not os.fstat(b.fileno()).st_size or not os.fstat(n.fileno()).st_size:
+            raise ValueError("Empty model.")
+        with mmap.mmap(b.fileno(), 0, access=mmap.ACCESS_READ) as base, \
+                mmap.mmap(n.fileno(), 0, access=mmap.ACCESS_READ) as new:
+            ops = diff(base, new)
+            header = {'base': _digest(base), 'digest': _digest(new), 'size': len(new),
+                      'ops': [list(op) if op[0] == "copy" else ["add", op[2]] for op in ops]}
+            with open(out, 'wb') as f:
+                f.write(MAGIC + json.dumps(header, separators=(",", ":")).encode('utf-8') + b"\n")
+                for op in ops:
+                    if op[0] == "add":
+                        f.write(new[op[1]:op[1] + op[2]])
+                return f.tell()
+
+
+# apply rebuilds a model from the previous model and a patch (the counterpart of write_patch).
+def apply(base, patch):
+    """ Apply a patch
+
+    Args:
+        base: Bytes of the previous model.
+        patch: Bytes of the patch.
+    Returns:
+        The bytes of the new model.
+    Raises:
+        ValueError if the patch is invalid or was made for another previous model.
+    """
+    if not patch.startswith(MAGIC) or b"\n" not in patch[len(MAGIC):]:
+        raise ValueError("Not a model patch.")
+    line, _, added = patch[len(MAGIC):].partition(b"\n")
+    header = json.loads(line)
+    if _digest(base) != header['base']:
+        raise ValueError("The patch was made for another version of the model.")
+    parts, position = [], 0
+    for op in header['ops']:
+        if op[0] == "copy":
+            parts.append(base[op[1]:op[1] + op[2]])
+        else:
+            parts.append(added[position:position + op[1]])
+            position += op[1]
+    model = b"".join(parts)
+    if len(model) != header['size'] or _digest(model) != header['digest']:
+        raise ValueError("The patched model does not match the new model.")
+    return model
+
+
+# _base_path returns the path of the copy of the last model sent for cfid.
+def _base_path(cfid):
+    return os.path.join(glob.DELTA_DIR, "".join(c for c in cfid if c.isalnum() or c in "-_") + ".onnx")
+
+
+# prepare writes the patch of an update, if it is smaller than the model.
+def prepare(cfid, path, min_saving=MIN_SAVING):
+    """ Prepare a delta update
+
+    Args:
+        cfid: String, the model updated.
+        path: Path of the new model.
+        min_saving: Float, minimum fraction of the model the patch has to save. Default MIN_SAVING.
+    Returns:
+        A tuple (patch, size, reason): the path of the patch (a temporary file, to be removed by the
+        caller) and its size, or None, None, and the reason the complete model should be sent.
+    """
+    import tempfile
+    if not supported():
+        return None, None, "the toolchain does not support patches"
+    base = _base_path(cfid)
+    if not os.path.isfile(base):
+        return None, None, "there is no earlier delta update of this model from this machine"
+    handle, patch = tempfile.mkstemp(suffix=".patch", dir=glob.DELTA_DIR)
+    os.close(handle)
+    try:
+        size = write_patch(base, path, patch)
+    except (OSError, ValueError) as e:
+        os.remove(patch)
+        return None, None, "unable to compare it with its earlier update (" + str(e) + ")"
+    if size > (1 - min_saving) * os.path.getsize(path):
+        os.remove(patch)
+        return None, None, "a patch would not be smaller"
+    return patch, size, ""
+
+
+# keep stores a copy of the model sent for cfid, the base of its next delta update.
+def keep(cfid, path):
+    """ Keep the model as sent; returns True if successful, False otherwise. """
+    base = _base_path(cfid)
+    try:
+        os.makedirs(glob.DELTA_DIR, exist_ok=True)
+        shutil.copyfile(path, base + ".tmp")
+        os.replace(base + ".tmp", base)  # a failed copy never replaces the previous base.
+    except OSError:
+        return False
+    return True
+
+
+# _marker returns the file recording that the current toolchain does not support patches.
+def _marker():
+    from sclbl._cache import scoped
+    return scoped(os.path.join(glob.DELTA_DIR, "no-patches"), glob.TOOLCHAIN_URL)
+
+
+# supported tells whether patches should be sent to the current toolchain.
+def supported():
+    """ False if the toolchain did not support patches during the last RECHECK seconds, True otherwise. """
+    try:
+        return time.time() - os.path.getmtime(_marker()) > RECHECK
+    except OSError:  # not recorded.
+        return True
+
+
+# unsupported records that the current toolchain does not support patches (see supported).
+def unsupported():
+    """ Record that patches are not supported; returns True if successful, False otherwise. """
+    try:
+        os.makedirs(glob.DELTA_DIR, exist_ok=True)
+        with open(_marker(), 'w'):
+            pass
+    except OSError:
+        return False
+    return True
+
+
+# forget removes the copy of a (deleted) model.
+def forget(cfid=None):
+    """ Remove the copy of the model cfid, or (without cfid) of all models. """
+    try:
+        if cfid is None:
+            shutil.rmtree(glob.DELTA_DIR, ignore_errors=True)
+        elif os.path.exists(_base_path(cfid)):
+            os.remove(_base_path(cfid))
+    except OSError:
+        return False
+    return True
+
+
+# summary formats the delta part of an update report (see _transport.update_model) for the user.
+def summary(report):
+    """ Describe a delta update, e.g., 'Sent a patch of 1.2 MB instead of the complete model (45.0 MB; 3%).' """
+    from sclbl._transport import format_bytes
+    delta = report.get('delta')
+    if not delta:
+        return ""
+    if delta['patch'] is not None:
+        return ("Sent a patch of " + format_bytes(delta['patch']) + " instead of the complete model (" +
+                format_bytes(delta['model']) + "; " + str(int(round(100 * delta['patch'] / max(delta['model'], 1)))) +
+                "%).")
+    return "Sent the complete model: " + delta['reason'] + "."
+
+
+if __name__ == '__main__':
+    print("No command line options available for _delta.py.")
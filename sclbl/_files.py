@@ -0,0 +1,47 @@
+# Utilities for reading (potentially very large) ONNX model files.
+import json
+import os
+
+CHUNK_SIZE = 1024 * 1024  # Bytes processed at once when streaming a file.
+
+
+# file_hash computes the sha256 hash of a file by streaming over a memory map.
+def file_hash(path, chunk_size=CHUNK_SIZE):
+    """ Hash a file
+
+    The file is memory mapped and hashed chunk by chunk, so it is never read into memory as a whole.
+
+    Args:
+        path: Path of the file.
+        chunk_size: Int, number of bytes hashed at once. Default CHUNK_SIZE.
+    Returns:
+        The hexadecimal sha256 digest of the file.
+    Raises:
+        OSError if the file cannot be read.
+    """
+    import hashlib
+    import mmap
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        if size == 0:  # empty files cannot be memory mapped.
+            return digest.hexdigest()
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            view = memoryview(mapped)
+            try:
+                for start in range(0, size, chunk_size):
+                    digest.update(view[start:start + chunk_size])
+            finally:
+                view.release()
+    return digest.hexdigest()
+
+
+# details_hash computes a hash of the details (name, docs, example) sent along with a model.
+def details_hash(**details):
+    """ Hash the details of an upload; changed details should never be skipped. """
+    import hashlib
+    return hashlib.sha256(json.dumps(details, sort_keys=True).encode('utf-8')).hexdigest()
+
+
+if __name__ == '__main__':
+    print("No command line options available for _files.py.")
@@ -1,7 +1,9 @@
 # Global settings for the sclbl CLI commands
+import os
+import click
 
 # Settings:
-EXEC_MODE = "live"  # or "develop" or "live"
+EXEC_MODE = os.environ.get("SCLBL_EXEC_MODE", "live")  # or "develop" or "local" (e.g., test/mock_server.py)
 DEBUG = False  # Set debug mode (extensive printing from sclblpy package)
 
 # Servers
@@ -18,5 +20,18 @@ elif EXEC_MODE == "develop":
     TOOLCHAIN_URL = "https://dev.toolchain.sclbl.net:8010"
     TASK_MANAGER_URL = "https://dev.taskmanager.sclbl.net:8080"
 
+# Option values (kept here, such that the commands can be declared without importing their modules)
+FORMATS = ["table", "json", "jsonl", "csv"]  # Values of the --format option (see _output.py).
+COMPRESS_METHODS = ["none", "auto", "gzip", "zstd"]  # Values of the --compress option (see _compress.py).
+WAIT_TIMEOUT: float = 1800.0  # Default maximum number of seconds to wait for conversions (see _watch.py).
+
+# Local storage (see _cache.py)
+CONFIG_DIR: str = os.environ.get("SCLBL_CONFIG_DIR", click.get_app_dir("sclbl"))  # Location of local files.
+CACHE_FILE: str = os.path.join(CONFIG_DIR, "cache.sqlite")  # Location of the local metadata cache.
+CACHE_TTL: float = float(os.environ.get("SCLBL_CACHE_TTL", 60))  # Seconds a cached listing is considered fresh.
+TOKEN_FILE: str = os.path.join(CONFIG_DIR, "token.json")  # Location of the cached access token (see _token.py).
+DELTA_DIR: str = os.path.join(CONFIG_DIR, "models")  # Copies of the models sent using update --delta (see _delta.py).
+COMPLETION_FILE: str = os.path.join(CONFIG_DIR, "completion.tsv")  # Completion snapshot ("": none; see _complete.py).
+
 if __name__ == '__main__':
     print("No command line options available for _globals.py.")
\ No newline at end of file
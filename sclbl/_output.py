@@ -0,0 +1,173 @@
+# Rendering of listings: tables for people, and JSON, JSON lines, and CSV for scripts.
+import json
+import sys
+import sclbl._globals as glob
+
+FORMATS = glob.FORMATS  # Values of the --format option.
+BATCH_SIZE = 1000  # Default number of records rendered before they are written to the output at once.
+MIN_WIDTH = 8  # Minimum width of a column that is shortened to fit the terminal.
+
+
+# write_records writes the records of a listing in one of the FORMATS.
+def write_records(records, fmt, columns, out=None, batch_size=BATCH_SIZE):
+    """ Write records
+
+    All formats are streamed: records are written (in batches of batch_size) while they arrive.
+    json and jsonl contain the complete records; csv and tables contain the columns. The columns of
+    a table are sized to the first batch; longer values that follow are shortened (see cutfill).
+
+    Args:
+        records: Iterable of records (dicts).
+        fmt: String, one of FORMATS.
+        columns: List of (title, key, shrink) tuples; shrink indicates that the values of the column
+            may be shortened to fit the table to the terminal (e.g., names, but not ids).
+        out: Text stream written to. Default sys.stdout.
+        batch_size: Int, the number of records written at once; e.g., the page size of a listing, such
+            that every page is written as soon as it arrives. Default BATCH_SIZE.
+    Returns:
+        The number of records written.
+    Raises:
+        Errors raised while iterating over records, after writing the records received until then
+        (and closing a json array).
+    """
+    out = out or sys.stdout
+    if fmt == "table":
+        return _write_table(records, columns, out, batch_size)
+
+    keys = [key for title, key, shrink in columns]
+    if fmt == "csv":
+        import csv
+        import io
+        buffer = io.StringIO()
+        writer = csv.writer(buffer, lineterminator="\n")
+        writer.writerow(keys)
+        out.write(buffer.getvalue())
+
+        def render(batch):
+            buffer.seek(0)
+            buffer.truncate()
+            writer.writerows([[record.get(key, "") for key in keys] for record in batch])
+            return buffer.getvalue()
+    elif fmt == "json":
+        out.write("[")
+
+        def render(batch):  # a batch is encoded at once, and written without its brackets.
+            return ("" if not count else ",") + json.dumps(batch)[1:-1]
+    else:
+        encode = json.JSONEncoder(check_circular=False).encode
+
+        def render(batch):
+            return "\n".join(map(encode, batch)) + "\n"
+
+    count, batch = 0, []
+    try:
+        for record in records:
+            batch.append(record)
+            if len(batch) >= batch_size:
+                out.write(render(batch))
+                count, batch = count + len(batch), []
+    finally:
+        if batch:
+            out.write(render(batch))
+            count += len(batch)
+        if fmt == "json":
+            out.write("]\n")
+        out.flush()
+    return count
+
+
+# _write_table streams records as a table sized to the first batch of records.
+def _write_table(records, columns, out, batch_size, width=None):
+    """ Write a table
+
+    Every column is as wide as its widest value (or title) in the first batch. If the table is wider
+    than the terminal, the columns that may shrink are shortened (see cutfill) to make it fit.
+
+    Args:
+        records: Iterable of records (dicts).
+        columns: List of (title, key, shrink) tuples (see write_records).
+        out: Text stream written to.
+        batch_size: Int, the number of records written at once.
+        width: Int, the maximum width of the table. Default: the width of the terminal.
+    Returns:
+        The number of records written.
+    """
+    count, batch, widths = 0, [], None
+    try:
+        for record in records:
+            batch.append(record)
+            if len(batch) >= batch_size:
+                if widths is None:
+                    widths = _widths(batch, columns, width)
+                    out.write(_header(columns, widths))
+                out.write("".join(_row(record, columns, widths) for record in batch))
+                count, batch = count + len(batch), []
+    finally:
+        if batch and widths is None:
+            widths = _widths(batch, columns, width)
+            out.write(_header(columns, widths))
+        if widths is not None:
+            out.write("".join(_row(record, columns, widths) for record in batch) + _rule(widths))
+            count += len(batch)
+            out.flush()
+    return count
+
+
+# _widths returns the widths of the columns of a table of records.
+def _widths(records, columns, width=None):
+    """ The width of every column (see _write_table). """
+    from shutil import get_terminal_size
+    widths = [max([len(title) + 1] + [len(str(record.get(key, ""))) for record in records])
+              for title, key, shrink in columns]
+    width = width or get_terminal_size().columns
+    excess = sum(widths) + 3 * (len(widths) - 1) - width
+    shrinkable = [i for i, (title, key, shrink) in enumerate(columns) if shrink]
+    while excess > 0 and shrinkable:
+        widest = max(shrinkable, key=lambda i: widths[i])
+        if widths[widest] <= MIN_WIDTH:
+            break
+        cut = min(excess, widths[widest] - MIN_WIDTH, max(1, widths[widest] // 4))
+        widths[widest] -= cut
+        excess -= cut
+    return widths
+
+
+# _line renders the cells of a table row.
+def _line(cells, widths):
+    return " | ".join(cutfill(cell, w) for cell, w in zip(cells, widths)).rstrip() + "\n"
+
+
+# _rule renders a horizontal line as wide as a table.
+def _rule(widths):
+    return "-" * (sum(widths) + 3 * (len(widths) - 1)) + "\n"
+
+
+# _header renders the titles of a table.
+def _header(columns, widths):
+    return _rule(widths) + _line([title + ":" for title, key, shrink in columns], widths) + _rule(widths)
+
+
+# _row renders a record as a table row.
+def _row(record, columns, widths):
+    return _line([str(record.get(key, "")) for title, key, shrink in columns], widths)
+
+
+# cutfill is a utility to print string of the right length
+def cutfill(string, length):
+    """ Cutfill formats strings
+
+    If the input string is longer than length, it is trimmed to length-2 adding "..".
+    If the input string is shorter than length, it will be padded.
+
+    Args:
+        string: String to operate on
+        length: Desired length of the output
+    Returns:
+        The shortened/padded string
+    """
+    out = (string[:(length-2)] + '..') if len(string) > length else string
+    return out.ljust(length)
+
+
+if __name__ == '__main__':
+    print("No command line options available for _output.py.")
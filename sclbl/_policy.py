@@ -0,0 +1,243 @@
+# The transport policy applied to every request to the platform (see _transport._Session).
+#
+# - Retries: requests that are safe to repeat are retried with exponential backoff and jitter, within a
+#   budget of backoff time per request (BACKOFF_BUDGET) and a budget of retries per process (RETRY_RATIO
+#   of all requests), such that a struggling platform is not flooded with retries. Responses that tell
+#   the request was not processed (429, 503) are retried for all methods; connection errors, timeouts,
+#   and other server errors (a gateway error may follow a processed request) only for idempotent methods (an
+#   assignment must not be created twice), or when no connection was made.
+# - Timeouts: every request has a connect timeout and a read timeout (the longest wait for the next bytes of
+#   the response), so a server that stops responding fails the request instead of hanging the command.
+#   While a request body is sent, every block has to be sent within the connect timeout; uploads wait
+#   longer for their response (UPLOAD_TIMEOUT), as the toolchain reads the complete model first.
+# - Hedged reads: a GET that takes longer than usual (the 95th percentile of recent reads of the server)
+#   is sent a second time, and the first response is used.
+# - Circuit breaker: after BREAKER_FAILURES consecutive failures of a server, its requests fail at once
+#   (CircuitOpenError) for BREAKER_COOLDOWN seconds; then a single request tests whether it is back.
+#
+# Streaming request bodies (uploads) cannot be repeated by the policy; upload_model retries those itself.
+import random
+import threading
+import time
+import requests
+
+IDEMPOTENT = {"GET", "HEAD", "OPTIONS", "PUT", "DELETE"}  # Methods that may be repeated after any failure.
+UNPROCESSED = {429, 503}  # Status codes of requests the server did not process (retried for any method).
+CONNECT_TIMEOUT = 10.0  # Seconds to connect to a server (and to send a block of a request body).
+READ_TIMEOUT = 60.0  # Seconds to wait for (the next bytes of) a response.
+UPLOAD_TIMEOUT = 600.0  # Seconds to wait for the response to an upload.
+MAX_ATTEMPTS = 4  # Maximum number of attempts of a request.
+BACKOFF = 0.25  # Seconds before the first retry (doubling with every retry, with jitter).
+MAX_BACKOFF = 4.0  # Maximum seconds between two attempts.
+BACKOFF_BUDGET = 10.0  # Maximum seconds spent waiting for retries of a single request.
+RETRY_RATIO = 0.2  # Retries allowed per request sent by this process (plus MIN_RETRIES).
+MIN_RETRIES = 10
+HEDGE_AFTER = 1.0  # Seconds before a GET is hedged while too few reads have been seen to know what is slow.
+MIN_HEDGE_AFTER = 0.05  # Minimum seconds before a GET is hedged.
+HEDGE_RATIO = 0.1  # Maximum fraction of the reads that is hedged.
+HEDGE_SAMPLES = 100  # Number of recent reads (per server) used to decide when a read is slow.
+BREAKER_FAILURES = 5  # Consecutive failures of a server that open its circuit.
+BREAKER_COOLDOWN = 5.0  # Seconds an open circuit fails requests at once.
+
+
+class CircuitOpenError(requests.RequestException):
+    """ A request was not sent because its server failed repeatedly (see the circuit breaker above). """
+    pass
+
+
+class CircuitBreaker:
+    """ Circuit breaker of a single server """
+
+    def __init__(self, host):
+        self.host = host
+        self.failures = 0  # Consecutive failures.
+        self.opened = None  # Time the circuit opened (None while closed).
+        self.probing = False  # A request is testing whether the server is back.
+        self.lock = threading.Lock()
+
+    def check(self):
+        """ Raise CircuitOpenError if requests to the server should fail at once. """
+        with self.lock:
+            if self.opened is None:
+                return
+            remaining = self.opened + BREAKER_COOLDOWN - time.monotonic()
+            if remaining <= 0 and not self.probing:
+                self.probing = True  # half open: let this request through.
+                return
+        raise CircuitOpenError(self.host + " is not responding (" + str(self.failures) + " failures in a row); "
+                               "failing at once for " + "{:.0f}".format(max(remaining, 0)) + " more seconds.")
+
+    def success(self):
+        with self.lock:
+            self.failures, self.opened, self.probing = 0, None, False
+
+    def failure(self):
+        with self.lock:
+            self.failures += 1
+            if self.probing or self.failures >= BREAKER_FAILURES:
+                self.opened, self.probing = time.monotonic(), False
+
+
+class _Server:
+    """ The policy state of a server: its circuit breaker and recent read latencies. """
+
+    def __init__(self, host):
+        self.breaker = CircuitBreaker(host)
+        self.latencies = []
+        self.lock = threading.Lock()
+
+    def hedge_after(self):
+        """ Seconds after which a read is slow: the 95th percentile of the recent reads. """
+        with self.lock:
+            if len(self.latencies) < 20:
+                return HEDGE_AFTER
+            ordered = sorted(self.latencies)
+        return max(MIN_HEDGE_AFTER, ordered[int(0.95 * (len(ordered) - 1))])
+
+    def observe(self, seconds):
+        with self.lock:
+            self.latencies.append(seconds)
+            del self.latencies[:-HEDGE_SAMPLES]
+
+
+_servers = {}
+_lock = threading.Lock()
+_counts = {'requests': 0, 'retries': 0, 'reads': 0, 'hedges': 0}  # Totals of this process (see the budgets).
+_hedge_pool = None  # Threads running hedged reads (see _read).
+
+
+# _server returns the policy state of a server.
+def _server(url):
+    from urllib.parse import urlsplit
+    host = urlsplit(url).netloc
+    with _lock:
+        if host not in _servers:
+            _servers[host] = _Server(host)
+        return _servers[host]
+
+
+# _take increments a counter of the process if the budget allows it.
+def _take(counter, budget):
+    with _lock:
+        if _counts[counter] + 1 > budget():
+            return False
+        _counts[counter] += 1
+        return True
+
+
+# reset forgets all policy state (e.g., between tests).
+def reset():
+    """ Close all circuits and reset the budgets and latency statistics. """
+    with _lock:
+        _servers.clear()
+        _counts.update({'requests': 0, 'retries': 0, 'reads': 0, 'hedges': 0})
+
+
+# _replayable checks whether a request body can be sent again.
+def _replayable(kwargs):
+    body = kwargs.get('data')
+    return kwargs.get('files') is None and (body is None or isinstance(body, (bytes, str, dict)))
+
+
+# not_sent checks whether a failed request certainly did not reach the server (no connection was made).
+def not_sent(error):
+    """ True if the request that raised error was never sent (a connection error or an open circuit). """
+    if isinstance(error, CircuitOpenError):
+        return True
+    from urllib3.exceptions import NewConnectionError
+    reason = getattr(error.args[0], 'reason', None) if error.args else None
+    return isinstance(error, requests.ConnectTimeout) or isinstance(reason, NewConnectionError)
+
+
+# _delay returns the seconds to wait before the next attempt.
+def _delay(attempt, response=None):
+    if response is not None and response.headers.get("Retry-After", "").isdigit():
+        return min(float(response.headers["Retry-After"]), MAX_BACKOFF)
+    return random.uniform(0.5, 1.0) * min(BACKOFF * 2 ** attempt, MAX_BACKOFF)
+
+
+# send sends a request according to the policy.
+def send(attempt, method, url, **kwargs):
+    """ Send a request with retries, hedging, and a circuit breaker
+
+    Args:
+        attempt: Function sending the request once, called as attempt(method, url, **kwargs)
+            (e.g., requests.Session.request).
+        method: String, the HTTP method.
+        url: String, the complete url.
+        kwargs: Keyword arguments of the request.
+    Returns:
+        The requests.Response of the last attempt (which may still be an error response).
+    Raises:
+        requests.RequestException if the request failed (CircuitOpenError if it was not sent).
+    """
+    server = _server(url)
+    replayable = _replayable(kwargs)
+    with _lock:
+        _counts['requests'] += 1
+    waited = 0.0
+    for n in range(MAX_ATTEMPTS):
+        server.breaker.check()
+        response, error = None, None
+        try:
+            if method == "GET" and replayable:
+                response = _read(server, attempt, method, url, kwargs)
+            else:
+                response = attempt(method, url, **kwargs)
+        except requests.RequestException as e:
+            error = e
+        if error is None and response.status_code < 500:
+            server.breaker.success()
+            if response.status_code != 429:
+                return response
+        else:
+            server.breaker.failure()
+        if error is not None:
+            retry = method in IDEMPOTENT or not_sent(error)
+        else:
+            retry = response.status_code in UNPROCESSED or method in IDEMPOTENT
+        delay = _delay(n, response)
+        if not retry or not replayable or n + 1 == MAX_ATTEMPTS or waited + delay > BACKOFF_BUDGET or \
+                not _take('retries', lambda: MIN_RETRIES + RETRY_RATIO * _counts['requests']):
+            if error is not None:
+                raise error
+            return response
+        if response is not None:
+            response.close()
+        time.sleep(delay)
+        waited += delay
+
+
+# _read sends a GET request, hedging it when it is slow.
+def _read(server, attempt, method, url, kwargs):
+    global _hedge_pool
+    from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+    with _lock:
+        _counts['reads'] += 1
+        if _hedge_pool is None:
+            _hedge_pool = ThreadPoolExecutor(max_workers=64, thread_name_prefix="sclbl-hedge")
+
+    def timed():
+        start = time.monotonic()
+        response = attempt(method, url, **kwargs)
+        server.observe(time.monotonic() - start)
+        return response
+
+    first = _hedge_pool.submit(timed)
+    done, _ = wait([first], timeout=server.hedge_after())
+    if done or not _take('hedges', lambda: 1 + HEDGE_RATIO * _counts['reads']):
+        return first.result()
+    second = _hedge_pool.submit(timed)
+    pending = [first, second]
+    while True:
+        done, _ = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            pending.remove(future)
+            if future.exception() is None or not pending:
+                for other in pending:  # the slower request is abandoned; its response is closed.
+                    other.add_done_callback(lambda f: f.exception() is None and f.result().close())
+                return future.result()
+
+
+if __name__ == '__main__':
+    print("No command line options available for _policy.py.")
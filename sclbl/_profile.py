@@ -0,0 +1,144 @@
+# Timing and network instrumentation of the commands (see the --profile and --trace options).
+#
+# Spans are recorded for the import of the package, init(), signing in, every request to the platform
+# (with the bytes sent and received and the time waiting for the response), waiting for a free
+# request slot of the client (see client.LIMITS), and rendering the output. Spans nest: the output of
+# a listing is rendered while its pages are retrieved, so the render span includes those requests.
+# Recording is off unless enabled by start(); a disabled span costs a single attribute check.
+import sys
+import threading
+import time
+
+STARTED = time.perf_counter()  # The import of this module, the first module of the sclbl package.
+enabled = False  # Set by start(); spans are only recorded while enabled.
+_spans = []  # Recorded spans: (name, category, start, duration, thread id, args).
+_outputs = {}  # The reports written by finish(): summary (bool) and trace (path).
+
+
+class span:
+    """ A timed section of the command (a context manager)
+
+    The keyword arguments, and those added to args while the span is open (e.g., the status of a
+    response), are stored with the span.
+    """
+    __slots__ = ("name", "category", "args", "start")
+
+    def __init__(self, name, category="cli", **args):
+        self.name = name
+        self.category = category
+        self.args = args
+
+    def __enter__(self):
+        self.start = time.perf_counter() if enabled else None
+        return self
+
+    def __exit__(self, *exc):
+        if self.start is not None:
+            record(self.name, self.category, self.start, time.perf_counter() - self.start, **self.args)
+        return False
+
+
+# record adds a span that has already finished.
+def record(name, category, start, duration, **args):
+    """ Record a span (perf_counter start and duration in seconds) if recording is enabled. """
+    if enabled:
+        _spans.append((name, category, start, duration, threading.get_ident(), args))
+
+
+# start enables recording for the rest of the process.
+def start(summary=False, trace=""):
+    """ Start profiling
+
+    Args:
+        summary: Bool, print a summary to stderr when finished.
+        trace: String, path of a Chrome trace (JSON) file written when finished ("" for none).
+    Returns:
+        True if profiling was started, False if it is not requested or already running (e.g., for
+        the commands of `sclbl batch`); only the caller that started profiling should call finish().
+    """
+    global enabled
+    if enabled or not (summary or trace):
+        return False
+    enabled = True
+    _spans.clear()
+    _outputs.update({'summary': summary, 'trace': trace})
+    record("import", "startup", STARTED, time.perf_counter() - STARTED)
+    return True
+
+
+# finish stops recording and writes the summary and/or trace file.
+def finish(command=""):
+    """ Stop profiling and report (see start). """
+    global enabled
+    if not enabled:
+        return
+    enabled = False
+    total = time.perf_counter() - STARTED
+    if _outputs.get('trace'):
+        try:
+            write_trace(_outputs['trace'])
+            print("Trace written to " + _outputs['trace'] + " (open it in chrome://tracing or ui.perfetto.dev).",
+                  file=sys.stderr)
+        except OSError as e:
+            print("Unable to write the trace: " + str(e), file=sys.stderr)
+    if _outputs.get('summary'):
+        sys.stderr.write(summary(total, command))
+
+
+# _group returns the row of the summary a span is counted in; requests are grouped by method and endpoint.
+def _group(name, category):
+    if category == "remote":
+        method, _, path = name.partition(" ")
+        return method + " /" + path.strip("/").split("/")[0]
+    return name
+
+
+# summary renders the recorded spans as a table (per group of spans) followed by the network totals.
+def summary(total, command=""):
+    """ Profile summary
+
+    Args:
+        total: Float, the wall time of the command in seconds.
+        command: String, the command profiled (for the title).
+    Returns:
+        The summary as a string.
+    """
+    from sclbl._transport import format_bytes
+    groups = {}
+    for name, category, start, duration, thread, args in list(_spans):
+        group = groups.setdefault(_group(name, category), [0, 0.0, 0.0])
+        group[0] += 1
+        group[1] += duration
+        group[2] = max(group[2], duration)
+    lines = ["Profile" + (" of sclbl " + command if command else "") + ": " + "{:.3f}s".format(total) + " in total.",
+             "  " + "Span".ljust(32) + "Count".rjust(7) + "Total".rjust(10) + "Max".rjust(10)]
+    for name, (count, seconds, longest) in groups.items():
+        lines.append("  " + name[:32].ljust(32) + str(count).rjust(7) + "{:.3f}s".format(seconds).rjust(10) +
+                     "{:.3f}s".format(longest).rjust(10))
+
+    remote = [(duration, args) for name, category, start, duration, thread, args in list(_spans)
+              if category == "remote"]
+    if remote:
+        lines.append("  Network: " + str(len(remote)) + " requests; sent " +
+                     format_bytes(sum(args.get('sent', 0) for duration, args in remote)) + ", received " +
+                     format_bytes(sum(args.get('received', 0) for duration, args in remote)) + ".")
+        lines.append("  Of the " + "{:.3f}s".format(sum(duration for duration, args in remote)) + " in requests, " +
+                     "{:.3f}s".format(sum(args.get('wait', 0.0) for duration, args in remote)) +
+                     " was spent waiting for responses (latency and server time).")
+    return "\n".join(lines) + "\n"
+
+
+# write_trace writes the recorded spans in the Chrome trace event format.
+def write_trace(path):
+    """ Write a Chrome trace (JSON) file with a complete ("X") event per span. """
+    import json
+    import os
+    events = [{'name': name, 'cat': category, 'ph': "X", 'ts': round((start - STARTED) * 1e6, 1),
+               'dur': round(duration * 1e6, 1), 'pid': os.getpid(), 'tid': thread, 'args': args}
+              for name, category, start, duration, thread, args in list(_spans)]
+    with open(path, 'w') as f:
+        json.dump({'traceEvents': events, 'displayTimeUnit': "ms"}, f)
+
+
+if __name__ == '__main__':
+    print("No command line options available for _profile.py.")
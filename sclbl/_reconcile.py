@@ -0,0 +1,123 @@
+# Reconciling the assignments on the platform with a desired state (see the apply command).
+#
+# The desired state lists the models (names or cfids) that should be assigned to each device (name or did):
+#
+#     devices:
+#       Camera 1: [Resnet, Mobilenet]
+#       Camera 2: Resnet
+#       Camera 3: []        # removes all assignments of Camera 3
+#
+# Devices that are not listed are left alone. The file is JSON, or YAML if the PyYAML package is installed.
+import json
+import os
+
+
+# read_desired reads a desired state file.
+def read_desired(path):
+    """ Read the desired state
+
+    Args:
+        path: Path of a JSON or YAML file (see above).
+    Returns:
+        A list of (device, models) tuples in the order of the file; models is a list of strings.
+    Raises:
+        ValueError if the file cannot be parsed or does not describe a desired state.
+        OSError if the file cannot be read.
+    """
+    with open(path, 'r') as f:
+        text = f.read()
+    if os.path.splitext(path)[1].lower() in (".yaml", ".yml"):
+        try:
+            import yaml
+        except ImportError:
+            raise ValueError("Reading YAML requires the PyYAML package (pip install pyyaml); or use JSON.")
+        try:
+            state = yaml.safe_load(text)
+        except yaml.YAMLError as e:
+            raise ValueError(str(e))
+    else:
+        state = json.loads(text)
+    devices = state.get('devices') if isinstance(state, dict) else None
+    if not isinstance(devices, dict):
+        raise ValueError("Expected a mapping 'devices' of device names (or dids) to lists of models.")
+    desired = []
+    for device, models in devices.items():
+        models = [] if models is None else [models] if isinstance(models, str) else models
+        if not isinstance(models, list) or not all(isinstance(m, str) and m for m in models):
+            raise ValueError("The models of device " + str(device) + " should be a list of names (or cfids).")
+        desired.append((str(device), models))
+    return desired
+
+
+# _resolver returns a function finding a record by its id or (unique) name.
+def _resolver(records, key, kind, problems):
+    ids = {record.get(key): record for record in records}
+    names = {}
+    for record in records:
+        names.setdefault(record.get('name'), []).append(record)
+
+    def resolve(text):
+        if text in ids:
+            return ids[text]
+        named = names.get(text, [])
+        if len(named) == 1:
+            return named[0]
+        if named:
+            problems.append("The " + kind + " name '" + text + "' is ambiguous (" +
+                            ", ".join(record.get(key, "") for record in named) + "); please use the " + key + ".")
+        else:
+            problems.append("Unknown " + kind + " '" + text + "'.")
+        return None
+
+    return resolve
+
+
+# plan computes the minimal changes that turn the current assignments into the desired state.
+def plan(desired, models, devices, assignments):
+    """ Plan a reconciliation
+
+    Every listed device ends up with exactly the listed models: missing assignments are created,
+    and the assignments of other models (and duplicate assignments) to the device are deleted.
+    Assignments that are already in place are not touched.
+
+    Args:
+        desired: List of (device, models) tuples (see read_desired).
+        models: List of all model records.
+        devices: List of all device records.
+        assignments: List of all assignment records.
+    Returns:
+        A tuple (creates, deletes): the assignments to create (dicts with the keys cfid, did, rid,
+        model_name, and device_name) and the assignment records to delete.
+    Raises:
+        ValueError listing all unknown or ambiguous models and devices.
+    """
+    problems = []
+    model, device = _resolver(models, 'cfid', "model", problems), _resolver(devices, 'did', "device", problems)
+    wanted, managed = {}, {}  # (cfid, did) -> assignment to create; did -> device.
+    for device_text, model_texts in desired:
+        d = device(device_text)
+        if d is None:
+            continue
+        if not d.get('rid'):
+            problems.append("Device '" + device_text + "' has no registration id (rid).")
+            continue
+        managed[d['did']] = d
+        for model_text in model_texts:
+            m = model(model_text)
+            if m is not None:
+                wanted[(m['cfid'], d['did'])] = {'cfid': m['cfid'], 'did': d['did'], 'rid': d['rid'],
+                                                 'model_name': m.get('name', ""), 'device_name': d.get('name', "")}
+    if problems:
+        raise ValueError("\n".join(problems))
+
+    current = {}  # (cfid, did) -> assignments of managed devices.
+    for record in assignments:
+        if record.get('did') in managed:
+            current.setdefault((record.get('cfid'), record['did']), []).append(record)
+    creates = [row for pair, row in wanted.items() if pair not in current]
+    deletes = [record for pair, records in current.items() for record in (records[1:] if pair in wanted else records)]
+    return creates, deletes
+
+
+if __name__ == '__main__':
+    print("No command line options available for _reconcile.py.")
@@ -0,0 +1,139 @@
+# Local cache of the access token (JWT) issued by the user manager.
+#
+# sclblpy keeps the token in memory only, so every sclbl command used to sign in again. The token is
+# stored in TOKEN_FILE (readable by the current user only) together with the time it was issued, and
+# restored by init(); a background thread refreshes it shortly before sclblpy would.
+import json
+import os
+import threading
+import time
+import sclbl._globals as glob
+
+REFRESH_AFTER = 90  # Seconds after which the token is refreshed in the background (sclblpy refreshes after 120).
+EXPIRES_AFTER = 280  # Seconds after which sclblpy no longer uses a token, but signs in again.
+
+_saved = None  # The token last read from or written to TOKEN_FILE (to avoid writing it again).
+_refresher = None  # The background thread refreshing the token (see restore()).
+
+
+# load reads the cached token; it returns None if there is no (valid) token.
+def load(path=None):
+    """ Read the cached token
+
+    Args:
+        path: Path of the token file. Default glob.TOKEN_FILE.
+    Returns:
+        A dict with the token, uid, and issued (timestamp), or None if no token is cached, the
+        token has expired, it was issued by another user manager, or the file is readable by others.
+    """
+    path = path or glob.TOKEN_FILE
+    try:
+        if os.name == "posix" and os.stat(path).st_mode & 0o077:
+            return None
+        with open(path, 'r') as f:
+            token = json.load(f)
+        if token.get('server') != glob.USER_MANAGER_URL or time.time() - token['issued'] >= EXPIRES_AFTER:
+            return None
+        return token if token.get('token') and token.get('uid') else None
+    except (OSError, ValueError, KeyError, TypeError, AttributeError):
+        return None
+
+
+# save writes the current sclblpy token to the cache (only the owner can read it).
+def save(path=None):
+    """ Store sclblpy's current token
+
+    Args:
+        path: Path of the token file. Default glob.TOKEN_FILE.
+    Returns:
+        True if the token was written, False if there is no (new) token or it could not be written.
+    """
+    global _saved
+    import sclblpy._globals as spglob
+    path = path or glob.TOKEN_FILE
+    token = {'token': spglob.JWT_TOKEN, 'uid': spglob.JWT_USER_ID, 'issued': spglob.JWT_TIMESTAMP,
+             'server': glob.USER_MANAGER_URL}
+    if not token['token'] or token == _saved:
+        return False
+    try:
+        os.makedirs(os.path.dirname(path), mode=0o700, exist_ok=True)
+        temp = path + "." + str(os.getpid())
+        fd = os.open(temp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, 'w') as f:
+            json.dump(token, f)
+        os.replace(temp, path)
+    except OSError:
+        return False
+    _saved = token
+    return True
+
+
+# clear removes the cached token (e.g., on reset).
+def clear(path=None):
+    """ Remove the cached token. """
+    global _saved
+    _saved = None
+    try:
+        os.remove(path or glob.TOKEN_FILE)
+    except OSError:
+        pass
+
+
+# refresh refreshes the token if it is older than REFRESH_AFTER and stores the new one.
+def refresh():
+    """ Refresh the token
+
+    Returns:
+        The number of seconds until the token should be refreshed again.
+    """
+    import sclblpy._globals as spglob
+    from sclblpy._jwt import _refresh_jwt
+    if not spglob.JWT_TOKEN:
+        return 5.0  # not signed in (yet); check again later.
+    delay = spglob.JWT_TIMESTAMP + REFRESH_AFTER - time.time()
+    if delay > 0:
+        return delay
+    try:
+        refreshed = _refresh_jwt()
+    except Exception:
+        refreshed = False
+    if refreshed:
+        save()
+        return REFRESH_AFTER
+    return 5.0  # sclblpy signs in again itself when the token has expired.
+
+
+# restore puts the cached token in place for sclblpy and keeps it fresh while the process runs.
+def restore():
+    """ Restore the cached token
+
+    Sets the sclblpy token from the cache (if no token is set yet), starts the background refresh,
+    and makes sure that the token in use when the process exits is stored for the next command.
+
+    Returns:
+        True if a cached token was restored.
+    """
+    global _saved, _refresher
+    import atexit
+    import sclblpy._globals as spglob
+    token = None
+    if not spglob.JWT_TOKEN:
+        token = load()
+        if token:
+            spglob.JWT_TOKEN, spglob.JWT_USER_ID, spglob.JWT_TIMESTAMP = token['token'], token['uid'], token['issued']
+            _saved = {key: token.get(key) for key in ['token', 'uid', 'issued', 'server']}
+    if _refresher is None:
+        _refresher = threading.Thread(target=_refresh_loop, name="sclbl-token-refresh", daemon=True)
+        _refresher.start()
+        atexit.register(save)
+    return token is not None
+
+
+# _refresh_loop refreshes the token in the background for as long as the process runs.
+def _refresh_loop():
+    while True:
+        time.sleep(max(refresh(), 1.0))
+
+
+if __name__ == '__main__':
+    print("No command line options available for _token.py.")
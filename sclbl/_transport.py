@@ -0,0 +1,520 @@
+# Direct (streaming) requests to the Scailable platform.
+#
+# Note: this module imports requests and sclblpy; it should only be imported by the commands that need it.
+import json
+import os
+import time
+import uuid
+import requests
+import sclblpy._globals as spglob
+from sclblpy import __version__ as sclblpy_version
+from sclblpy._jwt import _check_jwt
+import sclbl._globals as glob
+import sclbl._policy as policy
+import sclbl._profile as profile
+from sclbl._files import CHUNK_SIZE
+from sclbl._compress import MIN_SAVING, CompressedBody, estimate_ratio
+
+
+LISTINGS = {'models': "/compute-functions/", 'devices': "/devices/", 'assignments': "/assignments/user/"}
+OBJECTS = {'model': "/compute-function/", 'device': "/device/", 'assignment': "/assign/"}
+
+
+class ClientError(Exception):
+    """ Platform request error """
+    pass
+
+
+class UploadError(ClientError):
+    """ Upload error; status is the status of the response of the toolchain (None without response). """
+
+    def __init__(self, message, status=None):
+        super().__init__(message)
+        self.status = status
+
+
+class NotProcessedError(ClientError):
+    """ The request was certainly not processed by the platform (not sent, or refused with status 429 or
+    503), so it is safe to send it again, e.g., to create an assignment. """
+    pass
+
+
+class MultipartStream:
+    """ A multipart/form-data request body that streams a file from a memory map
+
+    Only the part of the file that is being sent is held in memory: requests (urllib3) reads the body
+    in small blocks through read(). The total length is known up front, so the request is sent with a
+    Content-Length header (and not using chunked transfer encoding).
+    """
+
+    def __init__(self, fields, file_field, path, progress=None):
+        """ Create the body
+
+        Args:
+            fields: Dict of (string) form fields sent before the file.
+            file_field: String, the name of the form field of the file.
+            path: Path of the file.
+            progress: Optional function called as progress(bytes_sent, total_bytes) after every read.
+        """
+        import mmap
+        self.boundary = uuid.uuid4().hex
+        head = b""
+        for name, value in fields.items():
+            head += ("--" + self.boundary + "\r\n"
+                     "Content-Disposition: form-data; name=\"" + name + "\"\r\n\r\n").encode('utf-8')
+            head += value.encode('utf-8') + b"\r\n"
+        head += ("--" + self.boundary + "\r\n"
+                 "Content-Disposition: form-data; name=\"" + file_field + "\"; filename=\"" +
+                 os.path.basename(path) + "\"\r\nContent-Type: application/octet-stream\r\n\r\n").encode('utf-8')
+        self.parts = [head, None, ("\r\n--" + self.boundary + "--\r\n").encode('utf-8')]
+
+        self.file = open(path, 'rb')
+        self.size = os.fstat(self.file.fileno()).st_size
+        self.parts[1] = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ) if self.size else b""
+        self.length = len(self.parts[0]) + self.size + len(self.parts[2])
+        self.position = 0
+        self.progress = progress
+
+    @property
+    def content_type(self):
+        """ The Content-Type header of the body (including the boundary). """
+        return "multipart/form-data; boundary=" + self.boundary
+
+    def __len__(self):
+        return self.length
+
+    def read(self, size=-1):
+        """ Read (at most) size bytes of the body; size < 0 reads a chunk of CHUNK_SIZE bytes. """
+        size = CHUNK_SIZE if size is None or size < 0 else size
+        out = b""
+        offset = self.position
+        for part in self.parts:
+            if len(out) >= size:
+                break
+            if offset < len(part):
+                out += part[offset:offset + size - len(out)]
+                offset = 0
+            else:
+                offset -= len(part)
+        self.position += len(out)
+        if self.progress:
+            self.progress(self.position, self.length)
+        return out
+
+    def rewind(self):
+        """ Start reading the body from the beginning again (e.g., to retry a request). """
+        self.position = 0
+
+    def close(self):
+        """ Close the memory map and the file. """
+        if self.size:
+            self.parts[1].close()
+        self.file.close()
+
+
+POOL_SIZE = 32  # Maximum number of keep-alive connections per server (at least the number of concurrent --jobs).
+_session = None  # The requests.Session shared by all requests of this process (see session()).
+
+
+class _Session(requests.Session):
+    """ requests.Session sending every request according to the transport policy (see _policy.py), and
+    recording a span (see _profile.py) for every attempt while profiling. """
+
+    def request(self, method, url, **kwargs):
+        if kwargs.get('timeout') is None:
+            kwargs['timeout'] = (policy.CONNECT_TIMEOUT, policy.READ_TIMEOUT)
+        return policy.send(self._attempt, method.upper(), url, **kwargs)
+
+    def _attempt(self, method, url, **kwargs):
+        if not profile.enabled:
+            return super().request(method, url, **kwargs)
+        from urllib.parse import urlsplit
+        with profile.span(method + " " + urlsplit(url).path, "remote", host=urlsplit(url).netloc) as s:
+            response = super().request(method, url, **kwargs)
+            s.args.update({'status': response.status_code, 'sent': _body_size(response.request.body),
+                           'received': len(response.content), 'wait': response.elapsed.total_seconds()})
+        return response
+
+
+# _body_size returns the number of bytes sent as a request body.
+def _body_size(body):
+    if body is None:
+        return 0
+    if hasattr(body, 'sent'):  # a CompressedBody, after it has been sent.
+        return body.sent
+    try:
+        return len(body)
+    except TypeError:  # a generator; its size is unknown.
+        return 0
+
+
+# session returns the requests session that is shared by all requests of this process.
+def session():
+    """ Shared requests.Session (reusing connections to the platform). """
+    global _session
+    if _session is None:
+        _session = _Session()
+        adapter = requests.adapters.HTTPAdapter(pool_connections=4, pool_maxsize=POOL_SIZE)
+        _session.mount("https://", adapter)
+        _session.mount("http://", adapter)
+    return _session
+
+
+class _SessionRequests:
+    """ Stands in for the requests module within sclblpy, sending its requests through session(). """
+
+    def __getattr__(self, name):
+        if name in ("request", "get", "post", "put", "patch", "delete", "head", "options"):
+            return getattr(session(), name)
+        return getattr(requests, name)
+
+
+# route_sclblpy makes sclblpy send its requests through the shared session.
+def route_sclblpy():
+    """ Route sclblpy through the shared session
+
+    sclblpy calls requests.post() and friends, opening a new connection (and TLS handshake) for
+    every call. Routing these calls through session() keeps one pool of keep-alive connections per
+    server for the lifetime of the process, e.g., for all commands of `sclbl batch`.
+    """
+    import sclblpy.main
+    import sclblpy._jwt
+    sclblpy.main.requests = _SessionRequests()
+    sclblpy._jwt.req = sclblpy.main.requests
+
+
+_configured = False  # Set by setup() once sclblpy has been configured for this process.
+
+
+# check_version checks that the installed version of sclblpy is supported.
+def check_version():
+    """ Raises ClientError if the installed version of sclblpy is not supported. """
+    if sclblpy_version == "0.1.5":
+        raise ClientError("Please update your version of sclblpy to 0.1.6 or higher to use the sclbl CLI tools.")
+
+
+# setup configures sclblpy for the commands; called (once per process) by the CLI before contacting the platform.
+def setup(debug=None):
+    """ Configure sclblpy
+
+    Checks the version of sclblpy, suppresses its printing (unless debug), sets its target servers
+    (see _globals.py), routes its requests through the shared session (see route_sclblpy), and
+    reuses the access token of an earlier command if it is still valid (see _token.py). This changes
+    the global state of sclblpy, so it is left to the CLI: a client.Client used from Python uses
+    sclblpy as configured by its host process.
+
+    Args:
+        debug: Bool, keep the printing of sclblpy. Default glob.DEBUG.
+    Raises:
+        ClientError if the installed version of sclblpy is not supported.
+    """
+    global _configured
+    if _configured:
+        return
+    check_version()
+
+    from sclblpy import _set_taskmanager_URL, _set_toolchain_URL, _set_usermanager_URL, stop_print
+    if not (glob.DEBUG if debug is None else debug):  # If package not in debug mode, suppress printing from sclblpy.
+        stop_print()
+    _set_toolchain_URL(glob.TOOLCHAIN_URL)
+    _set_usermanager_URL(glob.USER_MANAGER_URL)
+    _set_taskmanager_URL(glob.TASK_MANAGER_URL)
+    route_sclblpy()
+    import sclbl._token
+    sclbl._token.restore()
+    _configured = True
+
+
+# upload_model uploads (or, if a cfid is given, updates) an ONNX model using a streaming request.
+def upload_model(path, name, docs="...", example="...", email=True, cfid="", progress=None, retries=2,
+                 backoff=1.0, compress=None, min_saving=MIN_SAVING, patch=False):
+    """ Upload a model
+
+    The streaming counterpart of sclblpy's upload_onnx and update_onnx: instead of loading the
+    complete model into memory, the request body is read in small blocks from a memory map of the
+    file. When the connection fails before the complete body was sent the request is retried (from the
+    start, as the toolchain does not support resuming a partial upload); after that, only updates (PUT)
+    are retried, as the toolchain may have processed the request.
+
+    With compress, the body is compressed while it is streamed and sent with a Content-Encoding
+    header. Compression is skipped when compressing a sample of the file saves less than min_saving.
+    With patch, path is a patch of the model cfid (see _delta.py), sent using a PATCH request.
+
+    Args:
+        path: Path of the ONNX file.
+        name: String, the name of the model.
+        docs: String, the documentation of the model.
+        example: String, example input of the model.
+        email: Bool, send a confirmation email after the conversion. Default True.
+        cfid: String, the model to update; "" uploads a new model.
+        progress: Optional function called as progress(bytes_sent, total_bytes).
+        retries: Int, number of retries after a connection error (see above). Default 2.
+        backoff: Float, seconds before the first retry (doubling for every retry). Default 1.0.
+        compress: Optional compression method, "gzip" or "zstd" (see _compress.resolve). Default None.
+        min_saving: Float, minimum estimated fraction of the body saved by compression. Default MIN_SAVING.
+        patch: Bool, path is a patch of the model cfid. Default False.
+    Returns:
+        A report (dict) of the upload: compression (the method used or None), size (bytes of the
+        request body), sent (bytes sent), seconds (time spent compressing), estimate (the
+        estimated compression ratio, or None without compress), and cfid (the model id, "" if
+        the toolchain did not return the id of a new model).
+    Raises:
+        UploadError if the model could not be uploaded.
+    """
+    if not os.path.isfile(path):
+        raise UploadError("Unable to open " + path + "; is the path correct?")
+    try:
+        authorize()
+    except ClientError as e:
+        raise UploadError(str(e))
+
+    url = glob.TOOLCHAIN_URL + "/upload/" + spglob.JWT_USER_ID + ("/" + cfid if cfid else "")
+    data = {
+        'email': email,
+        'package': sclblpy_version,
+        'toolchain': "onnx2c",
+        'name': name,
+        'docs': docs,
+        'exampleInput': example,
+        'exampleOutput': ""
+    }
+    estimate = estimate_ratio(path, compress) if compress else None
+    if estimate is not None and 1 - estimate < min_saving:
+        compress = None
+    body = MultipartStream({'data': json.dumps(data)}, 'bundle', path, progress)
+    headers = {'Authorization': spglob.JWT_TOKEN, 'Content-Type': body.content_type}
+    compressed = CompressedBody(body, compress) if compress else None
+    if compressed:
+        headers['Content-Encoding'] = compress
+    method = "PATCH" if patch else "PUT" if cfid else "POST"
+    try:
+        for attempt in range(retries + 1):
+            body.rewind()
+            try:
+                response = session().request(method, url, headers=headers, data=compressed if compressed else body,
+                                             timeout=(policy.CONNECT_TIMEOUT, policy.UPLOAD_TIMEOUT))
+                break
+            except policy.CircuitOpenError as e:
+                raise UploadError(str(e))
+            except (requests.ConnectionError, requests.Timeout) as e:
+                # Once the complete body was sent the toolchain may have processed it: only an update
+                # (PUT) can then be repeated safely, a new model (POST) would be created twice.
+                if method != "PUT" and body.position >= len(body) and not policy.not_sent(e):
+                    raise UploadError("The connection to the toolchain failed after the model was sent; it may "
+                                      "have been uploaded (see sclbl models): " + str(e))
+                if attempt == retries:
+                    raise UploadError("Unable to reach the toolchain: " + str(e))
+                time.sleep(backoff * 2 ** attempt)
+    finally:
+        body.close()
+
+    try:
+        result = response.json()
+    except ValueError:
+        raise UploadError("The toolchain did not return a valid JSON response (status " +
+                          str(response.status_code) + ").", response.status_code)
+    if result.get('error'):
+        raise UploadError("The toolchain returned an error: " + str(result.get('error')), response.status_code)
+    return {'compression': compress, 'size': len(body), 'sent': compressed.sent if compressed else len(body),
+            'seconds': compressed.seconds if compressed else 0.0, 'estimate': estimate,
+            'cfid': cfid or str(result.get('cfid') or "")}
+
+
+# update_model updates a model, sending only the changes since its last (delta) update if possible.
+def update_model(cfid, path, name, docs="...", example="...", email=True, progress=None, compress=None, delta=False):
+    """ Update a model
+
+    With delta, a patch of the changes since the last delta update of the model from this machine is
+    sent (see _delta.py) when it is sufficiently smaller than the model; otherwise, and when the
+    toolchain cannot apply the patch (status 409), the complete model is sent (see upload_model). A
+    toolchain that does not support patches at all (status 404, 405, or 501) is recorded, such that
+    no patches are sent to it for a while (see _delta.supported).
+
+    Returns:
+        The upload report (see upload_model); with delta it includes 'delta', a dict with the keys
+        patch (the size of the patch sent, or None), model (the size of the model), and reason (why
+        the complete model was sent).
+    Raises:
+        UploadError if the model could not be updated.
+    """
+    import sclbl._delta as _delta
+    report, info = None, None
+    if delta:
+        patch, size, reason = _delta.prepare(cfid, path)
+        info = {'patch': None, 'model': os.path.getsize(path) if os.path.isfile(path) else 0, 'reason': reason}
+        if patch:
+            try:
+                report = upload_model(patch, name, docs, example, email, cfid=cfid, progress=progress,
+                                      compress=compress, patch=True)
+                info['patch'] = size
+            except UploadError as e:
+                if e.status in _delta.UNSUPPORTED:
+                    _delta.unsupported()
+                    info['reason'] = "the toolchain does not support patches"
+                elif e.status == 409:  # e.g., the model was updated from another machine.
+                    info['reason'] = "the toolchain did not accept the patch (" + str(e) + ")"
+                else:
+                    raise
+            finally:
+                os.remove(patch)
+    if report is None:
+        report = upload_model(path, name, docs, example, email, cfid=cfid, progress=progress, compress=compress)
+    if delta:
+        report['delta'] = info
+        _delta.keep(cfid, path)
+    return report
+
+
+# authorize makes sure that a valid access token is available, signing in if needed.
+def authorize():
+    """ Sign in (if needed)
+
+    Raises:
+        ClientError if no valid access token can be obtained.
+    """
+    try:
+        with profile.span("sign in", "auth"):
+            authorized = _check_jwt()
+    except Exception as e:
+        raise ClientError("Unable to sign in: " + str(e))
+    if not authorized:
+        raise ClientError("Unable to sign in.")
+
+
+# signed_in checks whether the current access token can be used without contacting the user manager.
+def signed_in():
+    """ True if a token is available that sclblpy will not refresh. """
+    return bool(spglob.JWT_TOKEN) and time.time() - spglob.JWT_TIMESTAMP < 120
+
+
+# call sends an authorized request to the platform and returns the decoded JSON response.
+def call(method, url, data=None):
+    """ Platform request
+
+    Args:
+        method: String, the HTTP method.
+        url: String, the complete url.
+        data: Optional (JSON) string sent as the body.
+    Returns:
+        The decoded JSON response.
+    Raises:
+        NotProcessedError if the request was not sent or not processed (after the retries of the policy).
+        ClientError if the server cannot be reached or does not return JSON.
+    """
+    try:
+        response = session().request(method, url, headers={'Authorization': spglob.JWT_TOKEN}, data=data)
+    except requests.RequestException as e:
+        if policy.not_sent(e):
+            raise NotProcessedError("Unable to reach the platform: " + str(e))
+        raise ClientError("Unable to reach the platform: " + str(e))
+    if response.status_code in policy.UNPROCESSED:
+        raise NotProcessedError("The platform did not process the request (status " + str(response.status_code) +
+                                "); please try again later.")
+    try:
+        return response.json()
+    except ValueError:
+        raise ClientError("The platform did not return a valid JSON response (status " +
+                          str(response.status_code) + ").")
+
+
+# _check_result raises the error returned by the platform (if any).
+def _check_result(result, action):
+    if not isinstance(result, dict):
+        raise ClientError("Unable to " + action + "; unexpected response from the platform.")
+    if result.get('error'):
+        raise ClientError("Unable to " + action + ": " + str(result['error']))
+    return True
+
+
+# list_records retrieves a single page of models, devices, or assignments.
+def list_records(kind, offset=0, limit=20):
+    """ Retrieve a page of a listing
+
+    Args:
+        kind: String, "models", "devices", or "assignments".
+        offset: Int, the offset of the page.
+        limit: Int, the (maximum) number of records.
+    Returns:
+        A list of records (dicts).
+    Raises:
+        FetchError if the page cannot be retrieved.
+    """
+    from sclbl._cache import FetchError
+    url = glob.USER_MANAGER_URL + LISTINGS[kind] + spglob.JWT_USER_ID + "?limit=" + str(limit) + "&offset=" + \
+        str(offset)
+    try:
+        result = call("GET", url)
+    except ClientError as e:
+        raise FetchError(str(e))
+    if not isinstance(result, list):
+        raise FetchError("Unable to retrieve the " + kind + " (offset " + str(offset) + ").")
+    return result
+
+
+# create_assignment assigns a model to a device.
+def create_assignment(cfid, did, rid):
+    """ Create an assignment
+
+    Returns:
+        True if successful.
+    Raises:
+        ClientError if the assignment was not created.
+    """
+    data = json.dumps({'modelId': cfid, 'deviceId': did, 'registrationId': rid})
+    return _check_result(call("POST", glob.USER_MANAGER_URL + "/assign/" + spglob.JWT_USER_ID, data),
+                         "create the assignment")
+
+
+# delete_object deletes a model, device, or assignment.
+def delete_object(kind, object_id):
+    """ Delete an object
+
+    Args:
+        kind: String, "model", "device", or "assignment".
+        object_id: String, the cfid, did, or aid of the object.
+    Returns:
+        True if successful.
+    Raises:
+        ClientError if the object was not deleted.
+    """
+    url = glob.USER_MANAGER_URL + OBJECTS[kind] + spglob.JWT_USER_ID + "/" + object_id
+    return _check_result(call("DELETE", url), "delete " + kind + " " + object_id)
+
+
+# format_bytes formats a number of bytes for user feedback.
+def format_bytes(n):
+    """ Format bytes, e.g., 1536 becomes '1.5 KB'. """
+    for unit in ["B", "KB", "MB", "GB"]:
+        if n < 1024 or unit == "GB":
+            return (str(int(n)) if unit == "B" else "{:.1f}".format(n)) + " " + unit
+        n /= 1024.0
+
+
+# progress_printer returns a progress function (see upload_model) printing the progress and throughput.
+def progress_printer(label, interval=0.5):
+    """ Progress printer
+
+    Args:
+        label: String printed in front of the progress (e.g., the file name).
+        interval: Float, minimum number of seconds between two updates. Default 0.5.
+    Returns:
+        A function called as progress(bytes_sent, total_bytes).
+    """
+    state = {'start': time.monotonic(), 'printed': 0.0}
+
+    def progress(sent, total):
+        now = time.monotonic()
+        if sent < total and now - state['printed'] < interval:
+            return
+        if sent == 0:  # a retry; restart the throughput measurement.
+            state['start'] = now
+        state['printed'] = now
+        rate = sent / max(now - state['start'], 1e-6)
+        print("\r" + label + ": " + str(int(100 * sent / max(total, 1))) + "% (" + format_bytes(sent) + " of " +
+              format_bytes(total) + ", " + format_bytes(rate) + "/s)", end="\n" if sent >= total else "", flush=True)
+
+    return progress
+
+
+if __name__ == '__main__':
+    print("No command line options available for _transport.py.")
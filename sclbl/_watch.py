@@ -0,0 +1,162 @@
+# Waiting for models to be converted by the toolchain (see the watch command and upload/update --wait).
+#
+# The platform has no separate status endpoint: the conversion status is read from the models listing.
+# A single (paged) sweep over the listing returns the status of every watched model, so each poll costs
+# the same few requests however many models are watched. Records with a status field (e.g., "converting",
+# "ready", or "failed") are used as is; without one, a new model is ready once it is listed, and an
+# updated model once its record changed. When the record of an updated model has no status and did not
+# change, its conversion cannot be detected: its state is "unknown" (and it is not waited for). A model
+# that is not listed by a complete sweep does not exist (e.g., a mistyped cfid): its state is "missing",
+# except for new uploads, which may not be listed yet.
+import random
+import sclbl._globals as glob
+
+STATUS_KEYS = ['status', 'conversion_status', 'state']  # Record fields holding the conversion status.
+READY = {"ready", "available", "done", "completed", "converted", "success"}  # Final states of a converted model.
+FAILED = {"failed", "error", "rejected"}  # Final states of a model that could not be converted.
+TIMEOUT = glob.WAIT_TIMEOUT  # Default maximum number of seconds to wait for conversions.
+
+
+class Target:
+    """ A model that is waited for
+
+    Identified by its cfid or, for a new upload whose cfid is unknown, by its name: the first listed
+    model with that name that did not exist before the upload (exclude).
+    """
+
+    def __init__(self, cfid="", name="", exclude=None, baseline=None):
+        """ Create a target
+
+        Args:
+            cfid: String, the model id ("" if unknown).
+            name: String, the model name (used if cfid is "").
+            exclude: Set of cfids that existed before the upload, for new uploads (None otherwise).
+            baseline: The record of the model before it was updated (None for new models).
+        """
+        self.cfid = cfid
+        self.name = name
+        self.new = exclude is not None
+        self.exclude = exclude if exclude is not None else set()
+        self.baseline = baseline
+        self.state = "pending"
+        self.record = None
+
+    @property
+    def done(self):
+        return self.state in ("ready", "failed", "unknown", "missing")
+
+    def label(self):
+        """ The cfid (and name) for user feedback. """
+        return (self.cfid or "(new model)") + (" (" + self.name + ")" if self.name else "")
+
+    def update(self, records, complete=False):
+        """ Update the state from the listed records (a dict cfid -> record); returns True on a change.
+
+        With complete, records is the complete listing: a model that is not in it is missing, unless
+        it is a new upload.
+        """
+        record, claimed = records.get(self.cfid) if self.cfid else None, False
+        if record is None and not self.cfid:
+            found = [r for c, r in records.items() if r.get('name') == self.name and c not in self.exclude]
+            record = found[0] if found else None
+            if record is not None:  # claimed: other targets sharing exclude do not match it again.
+                self.cfid, claimed = record.get('cfid', ""), True
+                self.exclude.add(self.cfid)
+        if record is None:
+            if complete and self.cfid and not self.new:
+                self.state = "missing"
+                return True
+            return False
+        state = status(record)
+        if self.baseline is not None and record == self.baseline:  # the update has not been processed yet,
+            state = "pending" if state is not None else "unknown"  # or the listing does not show it at all.
+        elif state is None:  # no status reported: the model is listed (or its record changed).
+            state = "ready"
+        elif state in READY:
+            state = "ready"
+        elif state in FAILED:
+            state = "failed"
+        else:
+            state = "pending"
+        changed = claimed or state != self.state
+        self.state, self.record = state, record
+        return changed
+
+
+# status returns the (lower case) conversion status of a record, or None if it has none.
+def status(record):
+    """ Conversion status of a listed model, e.g., "converting" or "ready"; None if not reported. """
+    for key in STATUS_KEYS:
+        if record.get(key):
+            return str(record[key]).lower()
+    return None
+
+
+# delays yields the adaptive poll intervals: exponential backoff with jitter, reset when progress is seen.
+def delays(interval=2.0, max_interval=60.0, factor=1.5):
+    """ Poll intervals
+
+    Send True into the generator after a poll in which a model changed state to restart at interval.
+
+    Args:
+        interval: Float, the first interval in seconds.
+        max_interval: Float, the maximum interval in seconds.
+        factor: Float, growth of the interval after every poll without progress.
+    Yields:
+        Seconds to wait before the next poll (between half and all of the current interval).
+    """
+    current = interval
+    while True:
+        progress = yield current * random.uniform(0.5, 1.0)
+        current = interval if progress else min(current * factor, max_interval)
+
+
+# watch polls the models listing until all targets reached a final state or the timeout passed.
+async def watch(client, targets, timeout=TIMEOUT, interval=2.0, max_interval=60.0, callback=None):
+    """ Wait for conversions
+
+    Args:
+        client: client.Client.
+        targets: List of Target.
+        timeout: Float, maximum number of seconds to wait.
+        interval: Float, first poll interval in seconds (see delays()).
+        max_interval: Float, maximum poll interval in seconds.
+        callback: Optional function called as callback(target) when the state of a target changed.
+    Returns:
+        True if all targets reached a final state (see Target.done) before the timeout.
+    Raises:
+        FetchError if the models listing cannot be retrieved.
+    """
+    import asyncio
+    import time
+    deadline = time.monotonic() + timeout
+    schedule = delays(interval, max_interval)
+    next(schedule)
+    while True:
+        records, pending = {}, [target for target in targets if not target.done]
+        wanted = set(target.cfid for target in pending)
+        sweep, complete = client.iter_records("models"), True
+        try:
+            async for record in sweep:
+                records[record.get('cfid')] = record
+                if "" not in wanted and wanted.issubset(records):  # all (known) targets listed; stop the sweep.
+                    complete = False
+                    break
+        finally:
+            await sweep.aclose()
+        progress = False
+        for target in pending:
+            if target.update(records, complete):
+                progress = True
+                if callback:
+                    callback(target)
+        if all(target.done for target in targets):
+            return True
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return False
+        await asyncio.sleep(min(schedule.send(progress), remaining))
+
+
+if __name__ == '__main__':
+    print("No command line options available for _watch.py.")
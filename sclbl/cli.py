@@ -1,248 +1,648 @@
 import click
 import sys
 import sclbl._globals as glob
+import sclbl._profile as profile
 
-# simple check for the correct version of sclblpy
-from sclblpy import __version__ as version
-if version == "0.1.5":
-    print("Please update your version of sclblpy to 0.1.6 or higher to use the sclbl CLI tools.")
-    sys.exit(1)
+# Note: sclblpy (and with it the complete network stack) is imported lazily by init() and by the
+# individual commands, such that `sclbl --help` and argument errors never load it. The commands
+# contact the platform through the asynchronous client (see client.py and _run()). The modules
+# implementing the commands (_bulk.py, _cache.py, _output.py, ...) are imported by the commands that
+# use them as well; only the values of their options are read from _globals.py.
 
-# import others:
-from sclblpy import _set_taskmanager_URL, _set_toolchain_URL, _set_usermanager_URL, stop_print, \
-    upload_onnx, update_onnx, \
-    models as spmodels, delete_model, \
-    assignments as spassignments, assign as spassign, delete_assignment, \
-    devices as spdevices, delete_device, \
-    remove_credentials
+
+# _completer returns the shell completion of an option completing ids or names (see _complete.py).
+def _completer(field):
+    def complete(ctx, param, incomplete):
+        from sclbl._complete import completer  # imported when completing only.
+        return completer(field)(ctx, param, incomplete)
+
+    return complete
 
 
 @click.group()
-def main():
+@click.option('--profile', 'profile_', is_flag=True, default=False, envvar="SCLBL_PROFILE",
+              help="Print where the time went (startup, sign in, requests, output) to stderr; or set SCLBL_PROFILE=1.")
+@click.option('--trace', type=str, default="", envvar="SCLBL_TRACE",
+              help="Write a Chrome trace (JSON) of the command to this file; or set SCLBL_TRACE.")
+@click.pass_context
+def main(ctx, profile_, trace):
     """ Scailable CLI interface
 
     This package provides a CLI interface to the Scailable Platform. Check the package readme
     or runs sclbl command --help for usage details.
     """
-    init()  # is called whenever CLI interface is used, but not when testing click.
+    if profile.start(profile_, trace):
+        ctx.call_on_close(lambda: profile.finish(ctx.invoked_subcommand or ""))
 
 
-# init initializes the package; this is called by main (which is called whenever the package is used).
+# init initializes the package; this is called by every command that uses the Scailable platform.
 def init(debug=glob.DEBUG):
     """ Initalize the package.
 
-    Called every time and used to set the correct target servers.
+    Called by the commands before they contact the platform and used to check the sclblpy version
+    and set the correct target servers (see _transport.setup). Exits if sclblpy is not supported.
     """
-    if not debug:  # If package not in debug mode, suppress printing from sclblpy.
-        stop_print()
-
-    # Set the correct target servers (see _globals.py)
-    _set_toolchain_URL(glob.TOOLCHAIN_URL)
-    _set_usermanager_URL(glob.USER_MANAGER_URL)
-    _set_taskmanager_URL(glob.TASK_MANAGER_URL)
+    with profile.span("init"):
+        from sclbl._transport import setup, ClientError
+        try:
+            setup(debug)
+        except ClientError as e:
+            print(str(e))
+            sys.exit(1)
 
 
-# upload uploads an ONNX file to the toolchain.
+# upload uploads one or more ONNX files to the toolchain.
 @main.command()
-@click.option('--file', '-f', type=str, required=True, help="Path for the input ONNX file.")
-@click.option('--name', '-n', type=str, required=True, help="Name of the model.")
+@click.option('--file', '-f', type=str, required=False, default="",
+              help="Path for the input ONNX file, a directory of ONNX files, or a glob pattern.")
+@click.option('--manifest', '-mf', type=str, required=False, default="",
+              help="JSON manifest mapping ONNX files to their name, docs, and example.")
+@click.option('--name', '-n', type=str, required=False, default="",
+              help="Name of the model (single file only; defaults to the file name).")
 @click.option('--docs', '-d', type=str, required=False, default="...", help="Model documentation.")
 @click.option('--example', '-e', type=str, required=False, default="...", help="Example model input string.")
 @click.option('--email', '-m', type=bool, required=False, default=True, help="Send confirmation email.")
+@click.option('--jobs', '-j', type=int, required=False, default=4, help="Number of concurrent uploads.")
+@click.option('--force', is_flag=True, default=False, help="Upload models that are unchanged since their last upload.")
+@click.option('--compress', '-c', type=click.Choice(glob.COMPRESS_METHODS), required=False, default="none",
+              help="Compress the upload (auto uses zstd if available, otherwise gzip).")
+@click.option('--wait', '-w', is_flag=True, default=False, help="Wait until the toolchain converted the model(s).")
 @click.option('--verbose', '-v', type=bool, required=False, default=True, help="Provide user feedback.")
-def upload(file, name, docs, example, email, verbose):
-    """ ** Upload an ONNX file to the Scaialble platform.
+def upload(file, manifest, name, docs, example, email, jobs, force, compress, wait, verbose):
+    """ ** Upload ONNX files to the Scaialble platform.
 
     Use the path of an ONNX file and (at minimum) its name to upload the model for automatic
-    conversion to WebAssembly.
+    conversion to WebAssembly. Multiple models can be uploaded at once by passing a directory or
+    a glob pattern as --file, or a JSON manifest ({"file.onnx": {"name": .., "docs": .., "example": ..}})
+    using --manifest; these are uploaded concurrently using --jobs workers.
+
+    Models with the same content and details as an earlier upload from this machine are skipped,
+    unless --force is used. Use --compress to compress the uploads while they are sent; a model is
+    sent uncompressed when compression would save less than 10%. Use --wait to wait for the
+    conversion of the uploaded models (see watch); the command fails if a conversion fails.
     """
+    import sclbl._cache as cache
+    from sclbl._bulk import collect_files, read_manifest, model_name
+    from sclbl._compress import summary as compression_summary
+    from sclbl._watch import Target
+    method = _compression(compress)
+    if manifest:
+        try:
+            items = read_manifest(manifest)
+        except (OSError, ValueError) as e:
+            raise click.BadParameter("Unable to read the manifest: " + str(e), param_hint="--manifest")
+    elif file:
+        files = collect_files(file)
+        items = [{'file': f, 'name': name if name and len(files) == 1 else model_name(f),
+                  'docs': docs, 'example': example} for f in files]
+    else:
+        raise click.UsageError("Please provide an ONNX file (--file) or a manifest (--manifest).")
+
+    if not items:
+        if verbose:
+            print("We were unable to upload your model; are you sure the path is correct?")
+        sys.exit(1)
+
+    # skip the models that have been uploaded before with identical content and details:
+    for item in items:
+        item['hash'] = _fingerprint(item['file'], item['name'], item['docs'], item['example'])
+    if not force:
+        unchanged = [item for item in items if item['hash'] and cache.uploaded(*item['hash'])]
+        if unchanged:
+            items = [item for item in items if item not in unchanged]
+            if verbose:
+                for item in unchanged:
+                    print("Unchanged since its last upload (skipped): " + item['file'])
+        if not items:
+            if verbose:
+                print("Your models are unchanged since their last upload; use --force to upload them again.")
+            return
+
+    init()
+    from sclbl.client import UploadError
+    from sclbl._transport import progress_printer
+    existing = _snapshot(verbose) if wait else None  # models that exist before the upload (see _wait).
+    wait = existing is not None
+
+    # upload_item uploads a single item of the list (streaming the file):
+    async def upload_item(client, item, progress=None):
+        report = await client.upload(item['file'], item['name'], item['docs'], item['example'], email,
+                                     compress=method, progress=progress)
+        if item['hash']:
+            cache.record_upload(*item['hash'], cfid=report.get('cfid', ""))
+        return report
 
     # upload onnx
-    docs = {'name': name, 'docs': docs}
-    result = upload_onnx(file, example, docs, email)
+    if len(items) == 1:
+        printer = progress_printer("Uploading " + items[0]['file']) if verbose else None
+        try:
+            report = _run(lambda client: upload_item(client, items[0], printer))
+            cache.invalidate("models")
+            if verbose:
+                if method:
+                    print(compression_summary(report))
+                print("Your model is uploaded to the Scailable toolchain.")
+        except UploadError as e:
+            if verbose:
+                print("We were unable to upload your model: " + str(e))
+            sys.exit(1)
+        if wait and not _wait([Target(report['cfid'], items[0]['name'], set(existing))], verbose):
+            sys.exit(1)
+        return
+
+    if not _authenticate():  # sign in once, before the uploads start.
+        if verbose:
+            print("We were unable to upload your models; unable to sign in.")
+        sys.exit(1)
+
+    # progress reports each upload as soon as it is done:
+    done = []
+
+    def progress(item, result, error):
+        done.append(item)
+        if verbose:
+            status = "uploaded: " + item['file'] if not error else "FAILED: " + item['file'] + " (" + str(error) + ")"
+            if method and not error:
+                status += " (" + compression_summary(result) + ")"
+            print("[" + str(len(done)) + "/" + str(len(items)) + "] " + status)
+
+    results = _run(lambda client: client.map(lambda item: upload_item(client, item), items, progress), upload=jobs)
+    cache.invalidate("models")
+    failed = [item['file'] for item, result, error in results if error]
     if verbose:
-        if result:
-            print("Your model is uploaded to the Scailable toolchain.")
-        else:
-            print("We were unable to upload your model; are you sure the path is correct?")
+        print("Uploaded " + str(len(items) - len(failed)) + " of " + str(len(items)) + " models to the Scailable "
+              "toolchain.")
+        if failed:
+            print("We were unable to upload:")
+            for f in failed:
+                print("  " + f)
+    if wait:
+        exclude = set(existing)  # shared, such that models with the same name are matched once.
+        targets = [Target(result['cfid'], item['name'], exclude) for item, result, error in results if not error]
+        if targets and not _wait(targets, verbose):
+            sys.exit(1)
+    if failed:
+        sys.exit(1)
 
 
 # update updates an existing model using its cfid
 @main.command()
-@click.option('--cfid', '-id', type=str, required=True, help="The computed function ID (cfid).")
+@click.option('--cfid', '-id', type=str, required=True, help="The computed function ID (cfid).",
+              shell_complete=_completer("cfid"))
 @click.option('--file', '-f', type=str, required=True, help="Path for the input ONNX file.")
 @click.option('--name', '-n', type=str, required=True, help="Name of the model.")
 @click.option('--docs', '-d', type=str, required=False, default="...", help="Model documentation.")
 @click.option('--example', '-e', type=str, required=False, default="...", help="Example model input string.")
 @click.option('--email', '-m', type=bool, required=False, default=True, help="Send confirmation email.")
+@click.option('--force', is_flag=True, default=False, help="Update the model even if it is unchanged.")
+@click.option('--delta', is_flag=True, default=False,
+              help="Only send the changes since the last --delta update of the model from this machine.")
+@click.option('--compress', '-c', type=click.Choice(glob.COMPRESS_METHODS), required=False, default="none",
+              help="Compress the upload (auto uses zstd if available, otherwise gzip).")
+@click.option('--wait', '-w', is_flag=True, default=False,
+              help="Wait until the toolchain converted the model (only possible if the platform reports its status).")
 @click.option('--verbose', '-v', type=bool, required=False, default=True, help="Provide user feedback.")
-def update(file, cfid, name, docs, example, email, verbose):
+def update(file, cfid, name, docs, example, email, force, delta, compress, wait, verbose):
     """ Update an existing model on the Scaialble platform.
 
     Use the model id (cfid), the path of an ONNX file and (at minimum) its name to upload the model for automatic
-    conversion to WebAssembly and overwrite the existing model.
+    conversion to WebAssembly and overwrite the existing model. The update is skipped if the model and its
+    details are unchanged since the last update from this machine, unless --force is used. Use --compress
+    to compress the model while it is sent, and --wait to wait for its conversion (see watch).
+
+    With --delta only the changed nodes and tensors are sent, compared to a copy of the model kept by the
+    previous --delta update (the first one sends the complete model). The complete model is also sent
+    when the changes are not sufficiently smaller than the model.
     """
+    import sclbl._cache as cache
+    from sclbl._compress import summary as compression_summary
+    from sclbl._watch import Target
+    method = _compression(compress)
+    fingerprint = _fingerprint(file, name, docs, example)
+    if not force and fingerprint and cache.uploaded(*fingerprint, cfid=cfid):
+        if verbose:
+            print("Your model is unchanged since its last update; use --force to update it again.")
+        return
 
-    # update onnx
-    docs = {'name': name, 'docs': docs}
-    result = update_onnx(file, cfid, example, docs, email)
+    init()
+    from sclbl.client import UploadError
+    from sclbl._transport import progress_printer
+    existing = _snapshot(verbose) if wait else None  # the model before the update (see _wait).
+
+    # update onnx (streaming the file)
+    progress = progress_printer("Uploading " + file) if verbose else None
+    try:
+        report = _run(lambda client: client.update(cfid, file, name, docs, example, email, method, progress, delta))
+    except UploadError as e:
+        if verbose:
+            print("We were unable to update your model: " + str(e))
+        sys.exit(1)
+    cache.invalidate("models", "assignments")  # assignments include the model name.
+    if fingerprint:
+        cache.record_upload(*fingerprint, cfid=cfid)
     if verbose:
-        if result:
-            print("Your model has been submitted for an update.")
-        else:
-            print("We were unable to update your model.")
+        if delta:
+            from sclbl._delta import summary as delta_summary
+            print(delta_summary(report))
+        if method:
+            print(compression_summary(report))
+        print("Your model has been submitted for an update.")
+    if existing is not None and not _wait([Target(cfid, name, baseline=existing.get(cfid))], verbose):
+        sys.exit(1)
 
 
 # `models` : List all models associated with the current user ID
 @main.command()
 @click.option('--offset', '-o', type=int, required=False, default=0, help="Offset for DB query.")
-@click.option('--limit', '-l', type=int, required=False, default=20, help="Limit for DB query.")
+@click.option('--limit', '-l', type=int, required=False, default=20, help="Limit for DB query (page size for --all).")
+@click.option('--all', '-a', 'all_', is_flag=True, default=False, help="List all models, page by page.")
+@click.option('--refresh', is_flag=True, default=False, help="Ignore the local cache.")
+@click.option('--cached', is_flag=True, default=False, help="Only use the local cache (of any age).")
+@click.option('--format', '-fmt', 'fmt', type=click.Choice(glob.FORMATS), required=False, default="table",
+              help="Output format; json, jsonl, and csv are meant for scripts.")
 @click.option('--verbose', '-v', type=bool, required=False, default=True, help="Provide user feedback.")
-def models(offset, limit, verbose):
+def models(offset, limit, all_, refresh, cached, fmt, verbose):
     """ Models lists all the registered models.
 
-    Generate a printed table of models including their name and ID. More info regarding the models
-    is available at https://admin.sclbl.net.
+    Generate a printed table of models including their name and ID (or the complete records
+    using --format). More info regarding the models is available at https://admin.sclbl.net.
     """
 
     # get models
-    result = spmodels(offset=offset, limit=limit, _verbose=glob.DEBUG, _return=True)
-    if isinstance(result, list):
-        if len(result) == 0:
-            if verbose:
-                print("You have not yet uploaded any models.")
-        else:
-            # print table
-            print("-----------------------------------------------------------------------")
-            print("Model name:                     | CFID:")
-            print("-----------------------------------------------------------------------")
-            for key in result:
-                print(cutfill(key['name'], 30), " | ", key['cfid'])
-            print("-----------------------------------------------------------------------")
-    else:
-        if verbose:
-            print("Unable to retrieve your models.")
+    _listing(_records("models", offset, limit, all_, refresh, cached), fmt,
+             columns=[("Model name", 'name', True), ("CFID", 'cfid', False)],
+             empty="You have not yet uploaded any models.",
+             error="Unable to retrieve your models.",
+             verbose=verbose,
+             batch_size=limit)
 
 
 # `devices` : List all registered devices associated with the current user ID
 @main.command()
 @click.option('--offset', '-o', type=int, required=False, default=0, help="Offset for DB query.")
-@click.option('--limit', '-l', type=int, required=False, default=20, help="Limit for DB query.")
+@click.option('--limit', '-l', type=int, required=False, default=20, help="Limit for DB query (page size for --all).")
+@click.option('--all', '-a', 'all_', is_flag=True, default=False, help="List all devices, page by page.")
+@click.option('--refresh', is_flag=True, default=False, help="Ignore the local cache.")
+@click.option('--cached', is_flag=True, default=False, help="Only use the local cache (of any age).")
+@click.option('--format', '-fmt', 'fmt', type=click.Choice(glob.FORMATS), required=False, default="table",
+              help="Output format; json, jsonl, and csv are meant for scripts.")
 @click.option('--verbose', '-v', type=bool, required=False, default=True, help="Provide user feedback.")
-def devices(offset, limit, verbose):
+def devices(offset, limit, all_, refresh, cached, fmt, verbose):
     """ Devices lists all the registered devices.
 
-    Generate a printed table of devices including their name, Device-ID, and Registration-ID.
-    More info regarding the registered devices is available at https://admin.sclbl.net.
+    Generate a printed table of devices including their name, Device-ID, and Registration-ID (or the
+    complete records using --format). More info regarding the registered devices is available at
+    https://admin.sclbl.net.
     """
 
-    # get models
-    result = spdevices(offset=offset, limit=limit, _verbose=glob.DEBUG, _return=True)
-    if isinstance(result, list):
-        if len(result) == 0:
-            if verbose:
-                print("You have not yet registered any devices.")
-        else:
-            # print table
-            print("---------------------------------------------------------------------------------------")
-            print("Device name:                    | DID:          | RID: ")
-            print("---------------------------------------------------------------------------------------")
-            for key in result:
-                print(cutfill(key['name'], 30), " | ", key['did'], " | ", key['rid'])
-            print("---------------------------------------------------------------------------------------")
-    else:
-        if verbose:
-            print("Unable to retrieve your devices.")
+    # get devices
+    _listing(_records("devices", offset, limit, all_, refresh, cached), fmt,
+             columns=[("Device name", 'name', True), ("DID", 'did', False), ("RID", 'rid', False)],
+             empty="You have not yet registered any devices.",
+             error="Unable to retrieve your devices.",
+             verbose=verbose,
+             batch_size=limit)
 
 
 # `assignments` : List all assignments associated with the current user ID
 @main.command()
 @click.option('--offset', '-o', type=int, required=False, default=0, help="Offset for DB query.")
-@click.option('--limit', '-l', type=int, required=False, default=20, help="Limit for DB query.")
+@click.option('--limit', '-l', type=int, required=False, default=20, help="Limit for DB query (page size for --all).")
+@click.option('--all', '-a', 'all_', is_flag=True, default=False, help="List all assignments, page by page.")
+@click.option('--refresh', is_flag=True, default=False, help="Ignore the local cache.")
+@click.option('--cached', is_flag=True, default=False, help="Only use the local cache (of any age).")
+@click.option('--format', '-fmt', 'fmt', type=click.Choice(glob.FORMATS), required=False, default="table",
+              help="Output format; json, jsonl, and csv are meant for scripts.")
 @click.option('--verbose', '-v', type=bool, required=False, default=True, help="Provide user feedback.")
-def assignments(offset, limit, verbose):
+def assignments(offset, limit, all_, refresh, cached, fmt, verbose):
     """ Assignments lists all the current assignments.
 
-    Generate a printed table of assignments including the model name, device name, and assignment ID.
-    More info regarding the assignments is available at https://admin.sclbl.net.
+    Generate a printed table of assignments including the model name, device name, and assignment ID
+    (or the complete records using --format). More info regarding the assignments is available at
+    https://admin.sclbl.net.
     """
 
-    # get models
-    result = spassignments(offset=offset, limit=limit, _verbose=glob.DEBUG, _return=True)
-    if isinstance(result, list):
-        if len(result) == 0:
-            if verbose:
-                print("You have not yet assigned any models.")
-        else:
-            # print table
-            print("-------------------------------------------------------------------------------------------")
-            print("Model name:              |  Device name:             | AID:")
-            print("-------------------------------------------------------------------------------------------")
-            for key in result:
-                print(cutfill(key['model_name'], 23), " | ", cutfill(key['device_name'], 23), " |",key['aid'])
-            print("-------------------------------------------------------------------------------------------")
-    else:
-        if verbose:
-            print("Unable to retrieve your assignments.")
+    # get assignments
+    _listing(_records("assignments", offset, limit, all_, refresh, cached), fmt,
+             columns=[("Model name", 'model_name', True), ("Device name", 'device_name', True), ("AID", 'aid', False)],
+             empty="You have not yet assigned any models.",
+             error="Unable to retrieve your assignments.",
+             verbose=verbose,
+             batch_size=limit)
 
 
-# assign creates a new assignment
+# assign creates a new assignment (or many, using a mapping file)
 @main.command()
-@click.option('--cfid', '-cfid', type=str, required=True, help="The computed function / model ID (cfid).")
-@click.option('--did', '-did', type=str, required=True, help="The device ID.")
-@click.option('--rid', '-rid', type=str, required=True, help="The registration ID (see devices).")
+@click.option('--cfid', '-cfid', type=str, required=False, default="", help="The computed function / model ID (cfid).",
+              shell_complete=_completer("cfid"))
+@click.option('--did', '-did', type=str, required=False, default="", help="The device ID.",
+              shell_complete=_completer("did"))
+@click.option('--rid', '-rid', type=str, required=False, default="", help="The registration ID (see devices).")
+@click.option('--model-name', '-mn', type=str, required=False, default="",
+              help="The model name (or a unique prefix of its name or cfid), instead of --cfid.",
+              shell_complete=_completer("model-name"))
+@click.option('--device-name', '-dn', type=str, required=False, default="",
+              help="The device name (or a unique prefix of its name or did), instead of --did and --rid.",
+              shell_complete=_completer("device-name"))
+@click.option('--from-file', '-ff', 'from_file', type=str, required=False, default="",
+              help="CSV or JSON file with the cfid, did, and rid of each assignment.")
+@click.option('--results', '-r', type=str, required=False, default="",
+              help="Results file for --from-file (default: <file>.results.csv).")
+@click.option('--jobs', '-j', type=int, required=False, default=8, help="Number of concurrent assignments.")
+@click.option('--rate', type=float, required=False, default=0, help="Maximum assignments per second (0: no limit).")
+@click.option('--retries', type=int, required=False, default=3,
+              help="Retries of an assignment the platform did not process (e.g., while it was unreachable).")
 @click.option('--verbose', '-v', type=bool, required=False, default=True, help="Provide user feedback.")
-def assign(cfid, did, rid, verbose):
+def assign(cfid, did, rid, model_name, device_name, from_file, results, jobs, rate, retries, verbose):
     """ Assign a model to a device.
 
     Assign a model to a device. Note that using 'sclbl devices' and 'sclbl models' you can find the
-    required IDs to create the assignment.
+    required IDs to create the assignment. Alternatively, the model and device can be given by name
+    (--model-name and --device-name), by a unique prefix of their name or ID, or (leaving out --rid)
+    by their ID only; these are looked up in a local index of the names seen in the listings.
+
+    Many assignments can be created at once using --from-file: a CSV file (with header) or JSON list
+    with the fields cfid, did, and rid. The results (including the aid of each created assignment)
+    are written to a results file; running assign --from-file on the results file retries only
+    the rows that failed.
 
     More info is available at https://admin.sclbl.net.
     """
+    import sclbl._cache as cache
+    from sclbl._bulk import results_path
+    if from_file:
+        _assign_all(from_file, results or results_path(from_file), jobs, rate, retries, verbose)
+        return
+    if model_name:
+        cfid = _resolve("models", model_name, "--model-name")['id']
+    if device_name or (did and not rid):
+        device = _resolve("devices", device_name or did, "--device-name" if device_name else "--did")
+        did, rid = device['id'], rid or device['rid']
+    if not cfid or not did or not rid:
+        raise click.UsageError("Please provide a model (--cfid or --model-name) and a device (--did and --rid, or "
+                               "--device-name), or a mapping file using --from-file.")
+
+    init()
+    from sclbl.client import ClientError
+
     # assign
-    result = spassign(cfid, did, rid, glob.DEBUG)
+    try:
+        result = _run(lambda client: client.assign(cfid, did, rid))
+    except ClientError as e:
+        result = False
+        if glob.DEBUG:
+            print(str(e))
+    cache.invalidate("assignments")
     if verbose:
         if result:
             print("Assignment successfully created.")
         else:
             print("We were unable to create your assignment.")
+    if not result:
+        sys.exit(1)
+
+
+# _assign_all creates all assignments listed in a mapping file.
+def _assign_all(path, results, jobs, rate, retries, verbose):
+    """ Create assignments from a file
+
+    Args:
+        path: Path of the CSV or JSON mapping file (fields cfid, did, and rid).
+        results: Path of the results file (fields cfid, did, rid, status, aid, and error).
+        jobs: Int, number of concurrent assignments.
+        rate: Float, maximum number of assignments per second (0: no limit).
+        retries: Int, number of retries of an assignment that was not processed (see NotProcessedError).
+        verbose: Bool, print user feedback.
+    """
+    import sclbl._cache as cache
+    from sclbl._bulk import read_rows, write_rows, RateLimiter, retry_async
+    from sclbl._cache import FetchError
+    try:
+        rows = read_rows(path)
+    except (OSError, ValueError) as e:
+        raise click.BadParameter("Unable to read the mapping: " + str(e), param_hint="--from-file")
 
+    todo = []
+    for row in rows:
+        if row.get('status') == "created":  # created in an earlier run.
+            continue
+        row.update({'status': "failed", 'aid': "", 'error': ""})
+        if not row.get('cfid') or not row.get('did') or not row.get('rid'):
+            row['error'] = "Missing cfid, did, or rid."
+        else:
+            todo.append(row)
+
+    if todo:
+        init()
+        if not _authenticate():
+            for row in todo:
+                row['error'] = "Unable to sign in."
+            todo = []
+
+    if todo:
+        from sclbl.client import NotProcessedError
+        limiter = RateLimiter(rate)
 
-# delete deletes a model, device, or assignment.
+        def progress(row, result, error):
+            if error:
+                row['error'] = str(error)
+                if verbose:
+                    print("Unable to assign " + row['cfid'] + " to " + row['did'] + ": " + str(error))
+            else:
+                row['status'] = "created"
+
+        # assign_rows creates the assignments, and looks up the aids of the new assignments (the
+        # platform does not return them):
+        async def assign_rows(client):
+            await client.map(lambda row: retry_async(lambda: client.assign(row['cfid'], row['did'], row['rid']),
+                                                     retries, limiter=limiter, retry_on=NotProcessedError),
+                             todo, progress)
+            new = {(row['cfid'], row['did']): row for row in todo if row['status'] == "created"}
+            if new:
+                async for record in client.iter_records("assignments"):
+                    row = new.get((record.get('cfid'), record.get('did')))
+                    if row is not None:
+                        row['aid'] = record.get('aid', "")
+
+        try:
+            _run(assign_rows, assign=jobs)
+        except FetchError:
+            if verbose:
+                print("Unable to retrieve the ids of the new assignments.")
+        cache.invalidate("assignments")
+
+    write_rows(results, rows, ['cfid', 'did', 'rid', 'status', 'aid', 'error'])
+    failed = len([row for row in rows if row['status'] != "created"])
+    if verbose:
+        print(str(len(rows) - failed) + " of " + str(len(rows)) + " assignments created; " + str(failed) + " failed.")
+        print("Results written to " + results + (" (rerun using this file to retry the failures)." if failed else "."))
+    if failed:
+        sys.exit(1)
+
+
+# delete deletes models, devices, and/or assignments.
 @main.command()
-@click.option('--cfid', '-cfid', type=str, default="", required=False, help="The computed function / model ID (cfid).")
-@click.option('--did', '-did', type=str, default="", required=False, help="The device ID.")
-@click.option('--aid', '-aid', type=str, default="", required=False, help="The assignment ID (see assignments).")
+@click.option('--cfid', '-cfid', type=str, multiple=True, help="The computed function / model ID (cfid); repeatable.",
+              shell_complete=_completer("cfid"))
+@click.option('--did', '-did', type=str, multiple=True, help="The device ID; repeatable.",
+              shell_complete=_completer("did"))
+@click.option('--aid', '-aid', type=str, multiple=True, help="The assignment ID (see assignments); repeatable.",
+              shell_complete=_completer("aid"))
+@click.option('--model-name', '-mn', type=str, multiple=True,
+              help="The model name (or a unique prefix of its name or cfid); repeatable.",
+              shell_complete=_completer("model-name"))
+@click.option('--device-name', '-dn', type=str, multiple=True,
+              help="The device name (or a unique prefix of its name or did); repeatable.",
+              shell_complete=_completer("device-name"))
+@click.option('--ids-file', type=click.File('r'), default=None,
+              help="File with one ID per line ('-' reads stdin); requires --kind.")
+@click.option('--name-match', type=str, default="",
+              help="Delete the models or devices (see --kind) whose name matches this pattern (e.g., 'test-*').")
+@click.option('--kind', type=click.Choice(["model", "device", "assignment"]), default=None,
+              help="Kind of the objects selected using --ids-file or --name-match.")
+@click.option('--assignments-for', type=str, multiple=True,
+              help="Delete all assignments of this model (cfid) or device (did); repeatable.")
+@click.option('--dry-run', is_flag=True, default=False, help="Only show what would be deleted.")
+@click.option('--jobs', '-j', type=int, required=False, default=8, help="Number of concurrent deletes.")
 @click.option('--verbose', '-v', type=bool, required=False, default=True, help="Provide user feedback.")
-def delete(cfid, did, aid, verbose):
-    """ Delete a model, device, or assignment.
+def delete(cfid, did, aid, model_name, device_name, ids_file, name_match, kind, assignments_for, dry_run, jobs,
+           verbose):
+    """ Delete models, devices, or assignments.
 
-    Delete a model, device, or assignment by providing its cfid, did, or aid respectively.
+    Delete a model, device, or assignment by providing its cfid, did, or aid respectively, or a model or
+    device by its name (--model-name, --device-name; see assign). The options can be repeated, IDs can
+    be read from a file (or stdin), and objects can be selected using a filter: --assignments-for
+    deletes all assignments of a model or device, --name-match all models or devices with a matching
+    name. Use --dry-run to inspect the plan first; assignments are deleted before models and devices.
     """
+    import sclbl._cache as cache
+    from sclbl._cache import FetchError
+    if (ids_file or name_match) and not kind:
+        raise click.UsageError("Please specify the --kind of the objects to delete.")
+    if name_match and kind == "assignment":
+        raise click.UsageError("--name-match selects models or devices.")
+
+    plan = [("model", i) for i in cfid if i] + [("device", i) for i in did if i] + [("assignment", i) for i in aid if i]
+    plan += [("model", _resolve("models", n, "--model-name")['id']) for n in model_name if n]
+    plan += [("device", _resolve("devices", n, "--device-name")['id']) for n in device_name if n]
+    if ids_file:
+        plan += [(kind, line.strip()) for line in ids_file if line.strip()]
 
-    result = False
-    if cfid:
+    if name_match or assignments_for:
+        try:
+            plan += _select(name_match, kind, assignments_for)
+        except FetchError:
+            if verbose:
+                print("Unable to retrieve the objects to delete.")
+                print("The delete action failed.")
+            sys.exit(1)
+    plan = sorted(set(plan), key=lambda item: (item[0] != "assignment", item))  # assignments first.
+
+    if not plan:
         if verbose:
-            print("Deleting model with id: " + cfid)
-        result = delete_model(cfid)
-    elif did:
+            if name_match or assignments_for:
+                print("No objects match the filter.")
+            else:
+                print("Please provide a cfid, did, aid, model name, or device name.")
+                print("The delete action failed.")
+        if not (name_match or assignments_for):
+            sys.exit(1)
+        return
+    if dry_run:
+        print("The following " + str(len(plan)) + " objects would be deleted:")
+        for item in plan:
+            print("  " + item[0] + ": " + item[1])
+        return
+
+    init()
+    from sclbl.client import ClientError
+    from sclbl._delta import forget as forget_model
+    invalidates = {"model": ("models", "assignments"), "device": ("devices", "assignments"),
+                   "assignment": ("assignments",)}
+
+    # delete_item deletes a single object of the plan:
+    async def delete_item(client, item):
+        if item[0] == "model":
+            cache.forget_uploads(item[1])
+            forget_model(item[1])
+        result = await client.delete(*item)
+        cache.unindex(item[0] + "s", [item[1]])
+        return result
+
+    if len(plan) == 1:
         if verbose:
-            print("Deleting device with id: " + did)
-        result = delete_device(did)
-    elif aid:
+            print("Deleting " + plan[0][0] + " with id: " + plan[0][1])
+        try:
+            result = _run(lambda client: delete_item(client, plan[0]))
+        except ClientError as e:
+            result = False
+            if glob.DEBUG:
+                print(str(e))
+        cache.invalidate(*invalidates[plan[0][0]])
         if verbose:
-            print("Deleting assignment with id: " + aid)
-        result = delete_assignment(aid)
-    else:
+            if result:
+                print("Delete action successful.")
+            else:
+                print("The delete action failed.")
+        if not result:
+            sys.exit(1)
+        return
+
+    if not _authenticate():
+        if verbose:
+            print("Unable to sign in; the delete action failed.")
+        sys.exit(1)
+
+    def progress(item, result, error):
         if verbose:
-            print("Please provide a cfid, did, or aid.")
+            print(("Deleted " if result and not error else "Unable to delete ") + item[0] + " " + item[1])
 
+    # delete_all deletes the assignments first, such that no assignments to deleted models or devices remain.
+    async def delete_all(client):
+        results = []
+        for first in [True, False]:
+            phase = [item for item in plan if (item[0] == "assignment") == first]
+            results += await client.map(lambda item: delete_item(client, item), phase, progress)
+        return results
+
+    failed = [item for item, result, error in _run(delete_all, delete=jobs) if error or not result]
+    cache.invalidate(*set(kind for item in plan for kind in invalidates[item[0]]))
     if verbose:
-        if result:
-            print("Delete action successful.")
-        else:
-            print("The delete action failed.")
+        print("Deleted " + str(len(plan) - len(failed)) + " of " + str(len(plan)) + " objects; "
+              + str(len(failed)) + " failed.")
+    if failed:
+        sys.exit(1)
+
+
+# _select selects the objects to delete using the filters of the delete command.
+def _select(name_match, kind, assignments_for):
+    """ Select objects to delete
+
+    Args:
+        name_match: String, glob pattern matched against the names of the models or devices ("" for none).
+        kind: String, "model" or "device", the kind of objects name_match applies to.
+        assignments_for: List of cfids and/or dids of which all assignments are selected.
+    Returns:
+        A list of (kind, id) tuples.
+    Raises:
+        FetchError if the listings cannot be retrieved.
+    """
+    import sclbl._cache as cache
+    from fnmatch import fnmatchcase
+    selected = []
+    if name_match:
+        listing, key = ("models", 'cfid') if kind == "model" else ("devices", 'did')
+        records = list(_records(listing, 0, 100, True, refresh=True))
+        cache.index(listing, records)
+        for record in records:
+            if fnmatchcase(record.get('name', ""), name_match):
+                selected.append((kind, record[key]))
+    if assignments_for:
+        ids = set(assignments_for)
+        for record in _records("assignments", 0, 100, True, refresh=True):
+            if record.get('cfid') in ids or record.get('did') in ids:
+                selected.append(("assignment", record['aid']))
+    return selected
 
 
 # reset resets a user's details
@@ -251,11 +651,20 @@ def delete(cfid, did, aid, verbose):
 def reset(verbose):
     """ Reset user details.
 
-    Remove the currently stored user details. After running reset you will be asked for you login again
-    when calling a command in the sclbl CLI.
+    Remove the currently stored user details (and the cached access token). After running reset you will
+    be asked for you login again when calling a command in the sclbl CLI.
     """
+    init()
+    import sclbl._cache as cache
+    from sclblpy import remove_credentials
+    from sclbl._delta import forget as forget_model
+
     # reset
+    import sclbl._token
     result = remove_credentials(glob.DEBUG)
+    sclbl._token.clear()
+    cache.clear()  # the cached listings belong to the removed user.
+    forget_model()  # and so do the copies of the models kept for delta updates.
     if verbose:
         if result:
             print("Your user details have been removed.")
@@ -263,21 +672,436 @@ def reset(verbose):
             print("Unable to remove your user detials.")
 
 
-# cutfill is a utility to print string of the right length
-def cutfill(string, length):
-    """ Cutfill formats strings
+# watch waits for the conversion of one or more models.
+@main.command()
+@click.option('--cfid', '-cfid', type=str, multiple=True, help="The computed function / model ID (cfid); repeatable.",
+              shell_complete=_completer("cfid"))
+@click.option('--timeout', type=float, required=False, default=glob.WAIT_TIMEOUT,
+              help="Maximum number of seconds to wait.")
+@click.option('--interval', type=float, required=False, default=2.0,
+              help="Seconds between the first status checks; backs off to a minute while nothing changes.")
+@click.option('--verbose', '-v', type=bool, required=False, default=True, help="Provide user feedback.")
+def watch(cfid, timeout, interval, verbose):
+    """ Wait for models to be converted.
+
+    Poll the conversion status of the given models until each of them is converted (or failed). All
+    models are checked at once using the models listing; the time between checks grows while
+    nothing changes. Fails (exit status 1) if a conversion failed or the timeout passed.
+    """
+    cfids = list(dict.fromkeys(c for c in cfid if c))
+    if not cfids:
+        raise click.UsageError("Please provide one or more models (--cfid).")
+
+    init()
+    from sclbl._watch import Target
+    if not _wait([Target(c) for c in cfids], verbose, timeout, interval):
+        sys.exit(1)
+
+
+# apply reconciles the assignments with a desired state file.
+@main.command()
+@click.argument('desired', type=click.Path(exists=True, dir_okay=False))
+@click.option('--plan', 'plan_only', is_flag=True, default=False, help="Only show the changes (a dry run).")
+@click.option('--jobs', '-j', type=int, required=False, default=8, help="Number of concurrent changes.")
+@click.option('--retries', type=int, required=False, default=3,
+              help="Retries of a change the platform did not process (e.g., while it was unreachable).")
+@click.option('--verbose', '-v', type=bool, required=False, default=True, help="Provide user feedback.")
+def apply(desired, plan_only, jobs, retries, verbose):
+    """ Assign models to devices as described in a file.
+
+    DESIRED is a JSON (or YAML) file mapping devices to the models that should be assigned to them:
+
+        {"devices": {"Camera 1": ["Resnet", "Mobilenet"], "Camera 2": []}}
+
+    Devices and models are given by name or ID. The current assignments are compared with the file,
+    and only the missing assignments are created and the superfluous assignments of the listed
+    devices are deleted (devices that are not listed are left alone). New assignments are created
+    first; the assignments of a device are only deleted once all its new assignments exist. Use
+    --plan to see the changes without making them.
+    """
+    import sclbl._cache as cache
+    from sclbl._bulk import retry_async
+    from sclbl._cache import FetchError
+    from sclbl._reconcile import read_desired, plan
+    try:
+        state = read_desired(desired)
+    except (OSError, ValueError) as e:
+        raise click.BadParameter("Unable to read the desired state: " + str(e), param_hint="DESIRED")
+
+    init()
+    import asyncio
+
+    # fetch_all retrieves the complete listings concurrently:
+    async def fetch_all(client):
+        async def listing(kind):
+            return [record async for record in client.iter_records(kind)]
+
+        return await asyncio.gather(*[listing(kind) for kind in ("models", "devices", "assignments")])
+
+    try:
+        model_records, device_records, assignment_records = _run(fetch_all)
+    except FetchError as e:
+        print("Unable to retrieve the current assignments: " + str(e))
+        sys.exit(1)
+    cache.index("models", model_records)
+    cache.index("devices", device_records)
+    cache.index("assignments", assignment_records)
+    try:
+        creates, deletes = plan(state, model_records, device_records, assignment_records)
+    except ValueError as e:
+        raise click.BadParameter("\n" + str(e), param_hint="DESIRED")
+
+    if verbose or plan_only:
+        for row in creates:
+            print("+ assign " + row['model_name'] + " (" + row['cfid'] + ") to " + row['device_name'] + " (" +
+                  row['did'] + ")")
+        for record in deletes:
+            print("- delete assignment " + str(record.get('aid')) + ": " + str(record.get('model_name', "")) +
+                  " (" + str(record.get('cfid')) + ") on " + str(record.get('device_name', "")) + " (" +
+                  str(record.get('did')) + ")")
+        print("Plan: " + str(len(creates)) + " assignments to create, " + str(len(deletes)) + " to delete.")
+    if plan_only or not (creates or deletes):
+        return
+
+    def assign_failed(row, result, error):
+        if error and verbose:
+            print("Unable to assign " + row['cfid'] + " to " + row['did'] + ": " + str(error))
+
+    def delete_failed(record, result, error):
+        if error and verbose:
+            print("Unable to delete assignment " + str(record.get('aid')) + ": " + str(error))
+
+    # execute creates the new assignments, and then deletes the superfluous assignments of the devices
+    # whose new assignments were all created (changes are only retried when the platform certainly did
+    # not process them, so an assignment is never created twice):
+    async def execute(client):
+        from sclbl.client import NotProcessedError
+        created = await client.map(
+            lambda row: retry_async(lambda: client.assign(row['cfid'], row['did'], row['rid']), retries,
+                                    retry_on=NotProcessedError),
+            creates, assign_failed)
+        incomplete = set(row['did'] for row, result, error in created if error)
+        phase = [record for record in deletes if record['did'] not in incomplete]
+        deleted = await client.map(
+            lambda record: retry_async(lambda: client.delete("assignment", record['aid']), retries,
+                                       retry_on=NotProcessedError),
+            phase, delete_failed)
+        return created, deleted, len(deletes) - len(phase)
+
+    created, deleted, skipped = _run(execute, assign=jobs, delete=jobs)
+    cache.invalidate("assignments")
+    failed = len([job for job, result, error in created + deleted if error])
+    if verbose:
+        print("Created " + str(len(created) - len([r for r in created if r[2]])) + " of " + str(len(creates)) +
+              " assignments; deleted " + str(len(deleted) - len([r for r in deleted if r[2]])) + " of " +
+              str(len(deletes)) + "; " + str(failed) + " failed" +
+              (", " + str(skipped) + " deletes skipped (devices with failed assignments)" if skipped else "") + ".")
+    if failed or skipped:
+        sys.exit(1)
+
+
+# batch runs a script of sclbl commands in a single process.
+@main.command()
+@click.argument('script', type=click.File('r'), default="-")
+@click.option('--stop-on-error', is_flag=True, default=False, help="Stop at the first command that fails.")
+@click.option('--verbose', '-v', type=bool, required=False, default=True, help="Provide user feedback.")
+def batch(script, stop_on_error, verbose):
+    """ Run a script of sclbl commands.
+
+    Read commands from SCRIPT (or stdin), one per line as they would be typed after `sclbl`, e.g.
+    `assign --cfid .. --did .. --rid ..`. Empty lines and lines starting with # are skipped. All
+    commands run in a single process: the platform is signed in to once and connections to the
+    servers are kept open between commands.
+    """
+    import shlex
+    count, failed = 0, []
+    for number, line in enumerate(script, 1):
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        count += 1
+        if verbose:
+            print("$ sclbl " + line)
+        try:
+            args = shlex.split(line)
+            if args[0] == "batch":
+                raise click.UsageError("Batch scripts cannot run batch.")
+            main.main(args, prog_name="sclbl", standalone_mode=False)
+        except click.ClickException as e:
+            e.show()
+            failed.append(number)
+        except (click.Abort, ValueError) as e:
+            print("Error: " + (str(e) or "aborted"))
+            failed.append(number)
+        except SystemExit as e:
+            if e.code:
+                failed.append(number)
+        if failed and failed[-1] == number and stop_on_error:
+            break
+
+    if verbose:
+        print("Ran " + str(count) + " commands; " + str(len(failed)) + " failed" +
+              (" (line " + ", ".join(str(n) for n in failed) + ")." if failed else "."))
+    if failed:
+        sys.exit(1)
+
+
+# _compression checks the --compress option before anything is uploaded.
+def _compression(compress):
+    """ Resolve the --compress option into "gzip", "zstd", or None (see _compress.resolve). """
+    from sclbl._compress import resolve as resolve_compression
+    try:
+        return resolve_compression(compress)
+    except ValueError as e:
+        raise click.BadParameter(str(e), param_hint="--compress")
+
+
+# _fingerprint identifies the content of an upload: the hash of the file and of its details.
+def _fingerprint(file, name, docs, example):
+    """ Fingerprint of an upload
+
+    Returns:
+        A tuple (file hash, details hash), or None if the file cannot be read.
+    """
+    from sclbl._files import file_hash, details_hash
+    try:
+        return file_hash(file), details_hash(name=name, docs=docs, example=example)
+    except OSError:
+        return None
+
+
+# _authenticate signs in to the platform (if needed) before concurrent requests start.
+def _authenticate():
+    """ Sign in once
+
+    The platform is signed in to lazily, asking for the user details if none are stored. Calling
+    this before starting concurrent requests makes sure that the user is asked (at most) once.
+
+    Returns:
+        True if a valid login is available, False otherwise.
+    """
+    from sclblpy._jwt import _check_jwt
+    try:
+        return _check_jwt()
+    except Exception:
+        return False
 
-    If the input string is longer than length, it is trimmed to length-2 adding "..".
-    If the input string is shorter than length, it will be padded.
+
+# _snapshot retrieves all models, before an upload or update that is waited for.
+def _snapshot(verbose):
+    """ Records of all models (a dict cfid -> record), or None if they cannot be retrieved. """
+    from sclbl._cache import FetchError
+
+    async def models(client):
+        return {record.get('cfid'): record async for record in client.iter_records("models")}
+
+    try:
+        return _run(models)
+    except FetchError as e:
+        if verbose:
+            print("Unable to retrieve your models; not waiting for the conversion: " + str(e))
+        return None
+
+
+# _wait waits for the conversion of models and reports the results (see _watch.py).
+def _wait(targets, verbose, timeout=glob.WAIT_TIMEOUT, interval=2.0):
+    """ Wait for conversions
+
+    Args:
+        targets: List of _watch.Target.
+        verbose: Bool, print user feedback.
+        timeout: Float, maximum number of seconds to wait.
+        interval: Float, seconds before the first status check is repeated.
+    Returns:
+        True if all models were converted successfully (or, for updates, their conversion cannot be
+        detected; see _watch.Target).
+    """
+    from sclbl._cache import FetchError
+    from sclbl._watch import watch as watch_models
+
+    def report(target):
+        if verbose and target.state == "unknown":
+            print("Unable to tell when the conversion of " + target.label() + " finishes: the platform does not "
+                  "report the conversion status of your models, and its listing did not change; not waiting for it.")
+        elif verbose and target.state == "missing":
+            print("Unknown model: " + target.label() + " is not listed on the platform.")
+        elif verbose and target.done:
+            print(("Converted: " if target.state == "ready" else "Conversion FAILED: ") + target.label())
+
+    if verbose:
+        print("Waiting for the conversion of " + str(len(targets)) + " model(s)...")
+    try:
+        _run(lambda client: watch_models(client, targets, timeout, interval, callback=report))
+    except FetchError as e:
+        if verbose:
+            print("Unable to retrieve the status of your models: " + str(e))
+        return False
+    ready = len([target for target in targets if target.state == "ready"])
+    failed = len([target for target in targets if target.state == "failed"])
+    unknown = len([target for target in targets if target.state == "unknown"])
+    missing = len([target for target in targets if target.state == "missing"])
+    if verbose:
+        print(str(ready) + " of " + str(len(targets)) + " models converted" +
+              ("; " + str(failed) + " failed" if failed else "") +
+              ("; " + str(unknown) + " unknown" if unknown else "") +
+              ("; " + str(missing) + " not found" if missing else "") +
+              ("; " + str(len(targets) - ready - failed - unknown - missing) + " still pending (timed out)"
+               if ready + failed + unknown + missing < len(targets) else "") + ".")
+    return ready + unknown == len(targets)
+
+
+# _resolve finds a model or device by name (or by a prefix of its name or id) in the local name index.
+def _resolve(kind, text, option):
+    """ Resolve a name
+
+    The name index (see _cache.lookup) is kept up to date by the listings. The complete listing is
+    only retrieved, to rebuild the index, when the name is not found or is ambiguous.
+
+    Args:
+        kind: String, "models" or "devices".
+        text: String, the name, or a prefix of the name or id.
+        option: String, the option providing text (for error messages).
+    Returns:
+        A dict with the keys id, name, and rid (see _cache.lookup).
+    Raises:
+        click.BadParameter if no or more than one model or device matches.
+        click.ClickException if the listing cannot be retrieved.
+    """
+    import sclbl._cache as cache
+    from sclbl._cache import FetchError
+    matches = cache.lookup(kind, text)
+    if len(matches) != 1:
+        try:
+            cache.index(kind, list(_records(kind, 0, 100, True, refresh=True)))
+        except FetchError as e:
+            raise click.ClickException("Unable to retrieve your " + kind + ": " + str(e))
+        matches = cache.lookup(kind, text)
+    if not matches:
+        raise click.BadParameter("No " + kind[:-1] + " is named '" + text + "' (or has a name or id starting with it).",
+                                 param_hint=option)
+    if len(matches) > 1:
+        raise click.BadParameter("'" + text + "' is ambiguous; it matches " + kind + ":\n" +
+                                 "".join("  " + m['name'] + " (" + m['id'] + ")\n" for m in matches) +
+                                 "Please provide a longer prefix or the id.", param_hint=option)
+    return matches[0]
+
+
+# _run runs an operation on the asynchronous client and returns its result.
+def _run(operation, **limits):
+    """ Run an operation
 
     Args:
-        string: String to operate on
-        length: Desired length of the output
+        operation: Function called with a client.Client, returning a coroutine.
+        limits: Maximum number of concurrent requests per endpoint (e.g., upload=4; see client.LIMITS).
     Returns:
-        The shortened/padded string
+        The result of the coroutine.
+    """
+    import asyncio
+    from sclbl.client import Client
+    client = Client(limits)
+
+    async def main():
+        return await operation(client)
+
+    return asyncio.run(main())
+
+
+# _records yields the records of a listing: a single page, or (using all_) all pages.
+def _records(kind, offset, limit, all_, refresh=False, cached=False):
+    """ Records of a listing
+
+    Pages are served from the local cache when fresh (see _cache.py); the platform is only
+    contacted (and the client created) when a page actually has to be retrieved. All pages are
+    walked by _cache.walk on a single event loop.
+
+    Args:
+        kind: String, the listing: "models", "devices", or "assignments".
+        offset: Int, offset of the (first) page.
+        limit: Int, size of the page(s).
+        all_: Bool, if True all records from offset onwards are streamed page by page.
+        refresh: Bool, if True the cache is bypassed (and updated).
+        cached: Bool, if True only the cache is used.
+    Yields:
+        The records.
+    Raises:
+        FetchError if a page cannot be retrieved.
     """
-    out = (string[:(length-2)] + '..') if len(string) > length else string
-    return out.ljust(length)
+    if refresh and cached:
+        raise click.UsageError("Please use either --refresh or --cached.")
+    import asyncio
+    import sclbl._cache as cache
+    clients = []
+
+    # client returns the client, creating it on first use:
+    def client():
+        if not clients:
+            init()
+            from sclbl.client import Client
+            clients.append(Client())
+        return clients[0]
+
+    fetch = cache.cached_fetch(kind, lambda o, l: client().records(kind, o, l), refresh, cached)
+    loop = asyncio.new_event_loop()
+    try:
+        if not all_:
+            yield from loop.run_until_complete(fetch(offset, limit))
+            return
+        records = cache.walk(fetch, offset, limit)
+        try:
+            while True:
+                page = loop.run_until_complete(_take(records, max(1, limit)))
+                yield from page
+                if len(page) < max(1, limit):
+                    return
+        finally:
+            loop.run_until_complete(records.aclose())  # e.g., cancels the retrieval of the next page.
+    finally:
+        loop.close()
+
+
+# _take awaits the next (at most) count records of an async iterator.
+async def _take(records, count):
+    taken = []
+    try:
+        while len(taken) < count:
+            taken.append(await records.__anext__())
+    except StopAsyncIteration:
+        pass
+    return taken
+
+
+# _listing writes the records of a listing in the requested format (see _output.py).
+def _listing(records, fmt, columns, empty, error, verbose, batch_size):
+    """ Print a listing
+
+    Args:
+        records: Iterable of records (see _records).
+        fmt: String, the output format (see _output.FORMATS).
+        columns: List of (title, key, shrink) tuples, the columns of a table or csv file.
+        empty: Message printed when there are no records (tables only).
+        error: Message printed when the records cannot be retrieved.
+        verbose: Bool indicating whether messages should be printed.
+        batch_size: Int, the number of records written at once: the page size, such that the first
+            rows are shown as soon as the first page arrives (the columns of a table are sized to it).
+    """
+    from sclbl._output import write_records
+    from sclbl._cache import FetchError
+    try:
+        with profile.span("render", fmt=fmt) as rendering:
+            count = write_records(records, fmt, columns, batch_size=max(1, batch_size))
+            rendering.args['records'] = count
+    except FetchError as e:
+        if fmt != "table":  # keep the output parsable and signal the failure to scripts.
+            click.echo(error + " " + str(e), err=True)
+            sys.exit(1)
+        if verbose:
+            print(error)
+            print(str(e))
+        sys.exit(1)
+    if not count and fmt == "table" and verbose:
+        print(empty)
+    from sclbl._complete import refresh
+    refresh()  # the listing updated the name index; rewrite the completion snapshot (see _complete.py).
 
 
 # Run if ran as main
@@ -0,0 +1,205 @@
+# Asynchronous client for the Scailable platform; the engine behind the sclbl commands.
+#
+# Usage:
+#
+#     from sclbl.client import Client
+#
+#     async with Client(limits={'assign': 16}) as client:
+#         models = await client.models()
+#         await client.map(lambda row: client.assign(row['cfid'], row['did'], row['rid']), rows)
+#
+# The blocking requests (see _transport.py) run on a shared pool of worker threads over one pool of
+# keep-alive connections per server; the event loop only waits for them, so many requests overlap.
+import asyncio
+import functools
+import threading
+import time
+import sclbl._profile as profile
+import sclbl._transport as transport
+from sclbl._cache import FetchError, walk
+from sclbl._transport import ClientError, UploadError, NotProcessedError, POOL_SIZE
+
+__all__ = ["Client", "ClientError", "UploadError", "NotProcessedError", "FetchError", "LIMITS"]
+
+LIMITS = {'upload': 4, 'list': 8, 'assign': 8, 'delete': 8}  # Default maximum of concurrent requests per endpoint.
+
+_executor = None  # The worker threads shared by all clients of this process (see _workers()).
+_executor_lock = threading.Lock()
+
+
+# _workers returns the thread pool that runs the blocking requests of all clients.
+def _workers():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            from concurrent.futures import ThreadPoolExecutor
+            _executor = ThreadPoolExecutor(max_workers=POOL_SIZE, thread_name_prefix="sclbl")
+    return _executor
+
+
+class Client:
+    """ Asynchronous Scailable client
+
+    All methods are coroutines. The number of concurrent requests is limited per endpoint (upload,
+    list, assign, and delete; see LIMITS), so fan-out operations such as map() can be started for
+    thousands of objects at once. A client can be used from one event loop at a time. Signing in
+    uses sclblpy as configured by the host process; the client does not change its settings.
+    """
+
+    def __init__(self, limits=None):
+        """ Create a client
+
+        Args:
+            limits: Optional dict with the maximum number of concurrent requests per endpoint,
+                overriding the defaults in LIMITS (e.g., {'upload': 2}).
+        """
+        transport.check_version()  # sclblpy itself is configured by the CLI only (see _transport.setup).
+        self.limits = dict(LIMITS, **(limits or {}))
+        self._semaphores = {}
+        self._sign_in_lock = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        pass
+
+    # _limit returns the semaphore limiting the concurrent requests to an endpoint.
+    def _limit(self, endpoint):
+        if endpoint not in self._semaphores:  # created lazily, inside the running event loop.
+            self._semaphores[endpoint] = asyncio.Semaphore(max(1, self.limits.get(endpoint, 1)))
+        return self._semaphores[endpoint]
+
+    # _call runs a blocking request of the _transport module on the worker threads.
+    async def _call(self, endpoint, func, *args, **kwargs):
+        await self.sign_in()
+        limit, queued = self._limit(endpoint), time.perf_counter()
+        waited = limit.locked()
+        async with limit:
+            if waited:  # all slots of the endpoint were taken (see LIMITS).
+                profile.record("queue " + endpoint, "client", queued, time.perf_counter() - queued)
+            call = functools.partial(func, *args, **kwargs)
+            return await asyncio.get_running_loop().run_in_executor(_workers(), call)
+
+    async def sign_in(self):
+        """ Sign in (if needed); concurrent callers wait for a single sign in.
+
+        Raises:
+            ClientError if no valid access token can be obtained.
+        """
+        if transport.signed_in():
+            return
+        if self._sign_in_lock is None:
+            self._sign_in_lock = asyncio.Lock()
+        async with self._sign_in_lock:
+            if not transport.signed_in():
+                await asyncio.get_running_loop().run_in_executor(_workers(), transport.authorize)
+
+    async def upload(self, path, name, docs="...", example="...", email=True, compress=None, progress=None):
+        """ Upload an ONNX model (see _transport.upload_model)
+
+        Returns:
+            The upload report (a dict, see _transport.upload_model).
+        Raises:
+            UploadError if the model could not be uploaded.
+        """
+        return await self._call('upload', transport.upload_model, path, name, docs, example, email,
+                                progress=progress, compress=compress)
+
+    async def update(self, cfid, path, name, docs="...", example="...", email=True, compress=None, progress=None,
+                     delta=False):
+        """ Update an existing model (cfid) with a new ONNX file; see upload() and, for delta,
+        _transport.update_model. """
+        return await self._call('upload', transport.update_model, cfid, path, name, docs, example, email,
+                                progress=progress, compress=compress, delta=delta)
+
+    async def records(self, kind, offset=0, limit=20):
+        """ Retrieve a page of "models", "devices", or "assignments".
+
+        Returns:
+            A list of records (dicts).
+        Raises:
+            FetchError if the page cannot be retrieved.
+        """
+        try:
+            return await self._call('list', transport.list_records, kind, offset, limit)
+        except ClientError as e:  # i.e., unable to sign in.
+            raise FetchError(str(e))
+
+    async def models(self, offset=0, limit=20):
+        """ Retrieve a page of models (see records()). """
+        return await self.records("models", offset, limit)
+
+    async def devices(self, offset=0, limit=20):
+        """ Retrieve a page of devices (see records()). """
+        return await self.records("devices", offset, limit)
+
+    async def assignments(self, offset=0, limit=20):
+        """ Retrieve a page of assignments (see records()). """
+        return await self.records("assignments", offset, limit)
+
+    def iter_records(self, kind, offset=0, limit=100, fetch=None):
+        """ Iterate over all records of a listing (an async generator; see _cache.walk)
+
+        Pages of limit records are retrieved until a page is incomplete; the next page is already
+        requested while the records of the current page are consumed, so at most two pages are held
+        in memory at any time.
+
+        Args:
+            kind: String, the listing: "models", "devices", or "assignments".
+            offset: Int, offset of the first record. Default 0.
+            limit: Int, the page size. Default 100.
+            fetch: Optional coroutine function called as fetch(offset, limit) retrieving the pages
+                instead of records() (e.g., from the local cache; see _cache.cached_fetch).
+        Raises:
+            FetchError if a page cannot be retrieved (after yielding the records of the earlier pages).
+        """
+        return walk(fetch or functools.partial(self.records, kind), offset, limit)
+
+    async def assign(self, cfid, did, rid):
+        """ Assign a model (cfid) to a device (did, with registration id rid).
+
+        Returns:
+            True if successful.
+        Raises:
+            ClientError if the assignment was not created.
+        """
+        return await self._call('assign', transport.create_assignment, cfid, did, rid)
+
+    async def delete(self, kind, object_id):
+        """ Delete a "model", "device", or "assignment" by its cfid, did, or aid.
+
+        Returns:
+            True if successful.
+        Raises:
+            ClientError if the object was not deleted.
+        """
+        return await self._call('delete', transport.delete_object, kind, object_id)
+
+    async def map(self, func, jobs, callback=None):
+        """ Run func(job) for all jobs concurrently
+
+        The concurrency is limited by the endpoints that func uses (see LIMITS).
+
+        Args:
+            func: Coroutine function called with a single job.
+            jobs: Iterable of jobs.
+            callback: Optional function called as callback(job, result, error) as soon as a job is done.
+        Returns:
+            A list of (job, result, error) tuples in the order of jobs; error is None if the job succeeded.
+        """
+
+        async def run(job):
+            try:
+                result, error = await func(job), None
+            except Exception as e:
+                result, error = None, e
+            if callback:
+                callback(job, result, error)
+            return job, result, error
+
+        return list(await asyncio.gather(*[run(job) for job in jobs]))
+
+
+if __name__ == '__main__':
+    print("No command line options available for client.py.")
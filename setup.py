@@ -28,5 +28,5 @@ setuptools.setup(
         ]
     },
     python_requires='>=3.7',
-    install_requires=['click', 'sclblpy']
+    install_requires=['click', 'sclblpy>=0.1.6,<0.1.9']  # sclbl uses internals of sclblpy (see _transport.py).
 )
@@ -0,0 +1,263 @@
+# Offline benchmarks of the sclbl commands against the mock platform (see mock_server.py).
+#
+# Usage (from the root of the repository):
+#
+#     python test/benchmark.py                            # run the benchmarks and print the results
+#     python test/benchmark.py --save baseline.json       # ... and store the results as a baseline
+#     python test/benchmark.py --compare baseline.json    # ... and report regressions (exit status 1)
+#
+# The benchmarks measure the cold start of the CLI, listing throughput, bulk upload throughput (for
+# models the size of test/files/model.onnx and for large models), the bulk assign rate, and the latency
+# of shell completion (in-process, and of a complete `sclbl` process) with a large snapshot. Use
+# --latency and --failure-rate to benchmark against a slow or unreliable platform; see --help for the
+# sizes. Baselines are specific to a machine: compare results from the same machine only.
+import argparse
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))  # The repository, to run from a checkout.
+sys.path[:0] = [os.path.join(ROOT, "test"), ROOT]
+from mock_server import MockServer, TOKEN, USER_ID  # noqa: E402
+
+MODEL = os.path.join(ROOT, "test", "files", "model.onnx")
+TOLERANCE = 0.2  # Default fraction a result may be worse than its baseline before it is a regression.
+
+
+# configured points the CLI at a mock platform, and restores the settings afterwards.
+@contextmanager
+def configured(mock, directory):
+    """ Use the mock platform (the counterpart of the platform fixture in conftest.py). """
+    import sclblpy._globals as spglob
+    import sclbl._transport as transport
+    import sclbl._globals as glob
+    settings = [(transport, "_configured", True), (glob, "USER_MANAGER_URL", mock.url),
+                (glob, "TOOLCHAIN_URL", mock.url),
+                (glob, "CACHE_FILE", os.path.join(directory, "cache.sqlite")),
+                (glob, "TOKEN_FILE", os.path.join(directory, "token.json")),
+                (glob, "COMPLETION_FILE", os.path.join(directory, "completion.tsv")),
+                (glob, "DELTA_DIR", os.path.join(directory, "models")),
+                (spglob, "JWT_TOKEN", TOKEN), (spglob, "JWT_USER_ID", USER_ID), (spglob, "JWT_TIMESTAMP", time.time())]
+    saved = [(module, name, getattr(module, name)) for module, name, value in settings]
+    for module, name, value in settings:
+        setattr(module, name, value)
+    try:
+        yield mock
+    finally:
+        for module, name, value in saved:
+            setattr(module, name, value)
+
+
+# _invoke runs a sclbl command in this process and returns the seconds it took.
+def _invoke(args):
+    from click.testing import CliRunner
+    from sclbl.cli import main
+    start = time.perf_counter()
+    result = CliRunner().invoke(main, args)
+    seconds = time.perf_counter() - start
+    if result.exit_code != 0:
+        raise RuntimeError("sclbl " + " ".join(args) + " failed:\n" + result.output[-2000:])
+    return seconds
+
+
+# bench_cold_start measures starting the CLI in a new interpreter (sclbl --help).
+def bench_cold_start(runs=5):
+    """ Median seconds to start python, import the CLI, and render --help. """
+    code = "from sclbl.cli import main; main(['--help'], standalone_mode=False)"
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, "-c", code], stdout=subprocess.DEVNULL, check=True, cwd=ROOT)
+        times.append(time.perf_counter() - start)
+    return {'cold_start': (1000 * statistics.median(times), "ms", "lower")}
+
+
+# bench_listing measures listing all models, as a table and as JSON lines.
+def bench_listing(mock, records):
+    """ Records per second of `models --all` (bypassing the local cache). """
+    mock.models[:] = [{'cfid': "cfid-" + str(i), 'name': "Model " + str(i), 'exampleinput': "..."}
+                      for i in range(records)]
+    results = {}
+    for fmt in ["jsonl", "table"]:
+        seconds = _invoke(['models', '--all', '--limit', "100", '--refresh', '--format', fmt])
+        results['listing_' + fmt] = (records / seconds, "records/s", "higher")
+    return results
+
+
+# bench_upload measures uploading a directory of models with concurrent uploads.
+def bench_upload(mock, directory, count, size_mb, label, jobs=4):
+    """ Models and megabytes per second of `upload --file <directory>` for count models of size_mb (0: model.onnx). """
+    models = os.path.join(directory, label)
+    os.makedirs(models)
+    for i in range(count):
+        path = os.path.join(models, "model_" + str(i) + ".onnx")
+        if size_mb:
+            with open(path, 'wb') as f:
+                for _ in range(size_mb):
+                    f.write(os.urandom(1024 * 1024))
+        else:
+            shutil.copyfile(MODEL, path)
+    total = sum(os.path.getsize(os.path.join(models, f)) for f in os.listdir(models)) / (1024 * 1024)
+    uploads = len(mock.uploads)
+    seconds = _invoke(['upload', '--file', models, '--jobs', str(jobs), '--force', '--verbose', "False"])
+    if mock.failure_rate == 0 and len(mock.uploads) - uploads != count:
+        raise RuntimeError("Only " + str(len(mock.uploads) - uploads) + " of " + str(count) + " models were uploaded.")
+    return {'upload_' + label + '_models': (count / seconds, "models/s", "higher"),
+            'upload_' + label + '_throughput': (total / seconds, "MB/s", "higher")}
+
+
+# bench_assign measures creating assignments from a mapping file.
+def bench_assign(mock, directory, count, jobs=8):
+    """ Assignments per second of `assign --from-file` (one model assigned to count devices). """
+    cfid = mock.add_model("Benchmark model")
+    rows = [{'cfid': cfid, 'did': mock.add_device("Device " + str(i))} for i in range(count)]
+    path = os.path.join(directory, "mapping.json")
+    with open(path, 'w') as f:
+        json.dump([dict(row, rid="rid-" + row['did']) for row in rows], f)
+    assignments = len(mock.assignments)
+    seconds = _invoke(['assign', '--from-file', path, '--jobs', str(jobs), '--verbose', "False"])
+    if mock.failure_rate == 0 and len(mock.assignments) - assignments != count:
+        raise RuntimeError("Only " + str(len(mock.assignments) - assignments) + " of " + str(count) +
+                           " assignments were created.")
+    return {'assign': (count / seconds, "assignments/s", "higher")}
+
+
+# bench_completion measures completing ids and names from a snapshot of entries models and devices.
+def bench_completion(directory, entries, runs=5):
+    """ Median milliseconds of completing a cfid (in-process) and a model name (in a new `sclbl` process). """
+    import sclbl._cache as cache
+    from sclbl._complete import write, lookup
+    cache.index("models", [{'cfid': "cfid-" + str(i), 'name': "Model " + str(i)} for i in range(entries // 2)])
+    cache.index("devices", [{'did': "did-" + str(i), 'name': "Device " + str(i)} for i in range(entries // 2)])
+    if write() is None:
+        raise RuntimeError("Unable to write the completion snapshot.")
+    times = []
+    for i in range(100):
+        start = time.perf_counter()
+        lookup("cfid", "cfid-" + str(i * 7 % (entries // 2)))
+        times.append(time.perf_counter() - start)
+    results = {'completion': (1000 * statistics.median(times), "ms", "lower")}
+
+    import sclbl._globals as glob
+    env = dict(os.environ, _SCLBL_COMPLETE="bash_complete", COMP_WORDS="sclbl assign --model-name 'Model 12'",
+               COMP_CWORD="3", SCLBL_CONFIG_DIR=directory, SCLBL_EXEC_MODE="local")
+    code = "from sclbl.cli import main; main(prog_name='sclbl')"
+    if glob.COMPLETION_FILE != os.path.join(directory, "completion.tsv"):
+        raise RuntimeError("The snapshot should be in the configuration directory of the benchmark.")
+    write(path=cache.scoped(glob.COMPLETION_FILE, "http://localhost:8008"))  # the snapshot of the new process.
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        proc = subprocess.run([sys.executable, "-c", code], stdout=subprocess.PIPE, env=env, cwd=ROOT)
+        times.append(time.perf_counter() - start)
+        if not proc.stdout.startswith(b"plain,Model 12"):
+            raise RuntimeError("Unexpected completions: " + proc.stdout[:200].decode())
+    results['completion_process'] = (1000 * statistics.median(times), "ms", "lower")
+    return results
+
+
+# run runs all benchmarks.
+def run(records=10000, uploads=50, large=2, large_mb=64, assignments=2000, latency=0.0, failure_rate=0.0,
+        cold_start_runs=5, completions=50000):
+    """ Run the benchmarks
+
+    Returns:
+        A dict mapping the name of every result to a (value, unit, better) tuple; better is "higher"
+        or "lower".
+    """
+    results = bench_cold_start(cold_start_runs)
+    directory = tempfile.mkdtemp(prefix="sclbl-benchmark-")
+    try:
+        with MockServer() as mock, configured(mock, directory):
+            mock.latency, mock.failure_rate = latency, failure_rate
+            results.update(bench_listing(mock, records))
+            results.update(bench_upload(mock, directory, uploads, 0, "small"))
+            if large:
+                results.update(bench_upload(mock, directory, large, large_mb, "large"))
+            results.update(bench_assign(mock, directory, assignments))
+            results.update(bench_completion(directory, completions, cold_start_runs))
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+    return results
+
+
+# compare compares results with a baseline and returns the regressions.
+def compare(results, baseline, tolerance=TOLERANCE):
+    """ Find regressions
+
+    Args:
+        results: Dict of results (see run).
+        baseline: Dict of earlier results (as saved using --save).
+        tolerance: Float, the fraction a result may be worse than its baseline.
+    Returns:
+        A list of (name, value, baseline value) tuples of the results that are worse than their
+        baseline by more than tolerance.
+    """
+    regressions = []
+    for name, (value, unit, better) in results.items():
+        if name not in baseline:
+            continue
+        base = baseline[name][0]
+        worse = value < base * (1 - tolerance) if better == "higher" else value > base * (1 + tolerance)
+        if worse:
+            regressions.append((name, value, base))
+    return regressions
+
+
+# report formats the results (and their change compared to the baseline) as a table.
+def report(results, baseline=None, tolerance=TOLERANCE):
+    """ Render the results as a string. """
+    regressed = set(name for name, value, base in compare(results, baseline or {}, tolerance))
+    lines = ["Benchmark".ljust(28) + "Result".rjust(14) + "  " + "Unit".ljust(15) + "Baseline".rjust(12) +
+             "Change".rjust(9)]
+    for name, (value, unit, better) in results.items():
+        line = name.ljust(28) + "{:.1f}".format(value).rjust(14) + "  " + unit.ljust(15)
+        if baseline and name in baseline:
+            base = baseline[name][0]
+            line += "{:.1f}".format(base).rjust(12) + "{:+.0%}".format((value - base) / base if base else 0).rjust(9)
+            line += "  REGRESSION" if name in regressed else ""
+        lines.append(line.rstrip())
+    return "\n".join(lines) + "\n"
+
+
+# main runs the benchmarks from the command line (see the top of this file).
+def main(args=None):
+    parser = argparse.ArgumentParser(description="Offline benchmarks of the sclbl CLI.")
+    parser.add_argument("--records", type=int, default=10000, help="Number of models listed.")
+    parser.add_argument("--uploads", type=int, default=50, help="Number of small (model.onnx) models uploaded.")
+    parser.add_argument("--large", type=int, default=2, help="Number of large models uploaded.")
+    parser.add_argument("--large-mb", type=int, default=64, help="Size of the large models in MB.")
+    parser.add_argument("--assignments", type=int, default=2000, help="Number of assignments created.")
+    parser.add_argument("--completions", type=int, default=50000, help="Number of models and devices completed.")
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds every request to the platform takes.")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="Probability that a request fails.")
+    parser.add_argument("--save", default="", help="Store the results in this (JSON) file.")
+    parser.add_argument("--compare", default="", help="Compare the results with this baseline (JSON) file.")
+    parser.add_argument("--tolerance", type=float, default=TOLERANCE, help="Allowed fraction of slowdown.")
+    args = parser.parse_args(args)
+
+    results = run(args.records, args.uploads, args.large, args.large_mb, args.assignments, args.latency,
+                  args.failure_rate, completions=args.completions)
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)['results']
+    print(report(results, baseline, args.tolerance), end="")
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump({'settings': vars(args), 'python': sys.version, 'results': results}, f, indent=2)
+    regressions = compare(results, baseline or {}, args.tolerance)
+    if regressions:
+        print(str(len(regressions)) + " regression(s) of more than " + "{:.0%}".format(args.tolerance) + ".")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,25 @@
+import time
+import pytest
+import sclblpy._globals as spglob
+import sclbl._transport as transport
+import sclbl._globals as glob
+import sclbl._policy as policy
+from mock_server import MockServer, TOKEN, USER_ID
+
+
+# platform runs the commands against a local stand-in for the Scailable platform (see mock_server.py).
+@pytest.fixture
+def platform(tmp_path, monkeypatch):
+    policy.reset()  # no circuits opened, retries spent, or latencies observed by earlier tests.
+    with MockServer() as mock:
+        monkeypatch.setattr(transport, "_configured", True)
+        monkeypatch.setattr(glob, "USER_MANAGER_URL", mock.url)
+        monkeypatch.setattr(glob, "TOOLCHAIN_URL", mock.url)
+        monkeypatch.setattr(glob, "CACHE_FILE", str(tmp_path / "cache.sqlite"))
+        monkeypatch.setattr(glob, "TOKEN_FILE", str(tmp_path / "token.json"))
+        monkeypatch.setattr(glob, "DELTA_DIR", str(tmp_path / "models"))
+        monkeypatch.setattr(glob, "COMPLETION_FILE", "")  # no background refresh per listing (see test_complete.py).
+        monkeypatch.setattr(spglob, "JWT_TOKEN", TOKEN)
+        monkeypatch.setattr(spglob, "JWT_USER_ID", USER_ID)
+        monkeypatch.setattr(spglob, "JWT_TIMESTAMP", time.time())
+        yield mock
@@ -0,0 +1,408 @@
+# A local stand-in for the Scailable platform, used by the offline tests and benchmarks (see benchmark.py).
+#
+# Run this file to serve the platform on the local ports of _globals.py, and use the CLI against it:
+#
+#     python test/mock_server.py --models 10000 --latency 0.01 &
+#     SCLBL_EXEC_MODE=local sclbl models --all
+#
+# Any user name and password can be used to sign in.
+import hashlib
+import json
+import threading
+import time
+import uuid
+import random
+import socket
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+USER_ID = "mock-user"
+TOKEN = "mock-token"
+KEEP_CONTENT = 4 * 1024 * 1024  # Uploaded files smaller than this are kept in memory (see MockServer.uploads).
+LOCAL_PORTS = (8008, 8010, 8080)  # The user manager, toolchain, and task manager of EXEC_MODE "local".
+
+
+class MockServer:
+    """ Stand-in for the toolchain (uploads) and the user manager (sign in, token refresh, listings,
+    assignments, and deletes)
+
+    Use as a context manager; the base url of the server is available as url. The models, devices,
+    and assignments of the (single) user are kept in the lists of the same name; uploads add a model
+    and add_device() registers a device. Assigning requires an existing model and device. Received uploads are
+    recorded in uploads as dicts with the keys method, path, encoding, received (bytes on the wire),
+    fields, size, sha256, and (for files smaller than KEEP_CONTENT) content. Request bodies may use
+    chunked transfer encoding and gzip (or, if zstandard is installed, zstd) content encoding.
+    Updates can be sent as a patch (PATCH, see sclbl/_delta.py) of the latest upload of the model, which is
+    kept in files (if smaller than KEEP_CONTENT); the model rebuilt from a patch is recorded as its sha256.
+    Set patches to False to stand in for a toolchain without patches (PATCH requests are refused with 405),
+    and returns_cfid to True to return the cfid of new models (the toolchain may not).
+    Latency and failures can be injected: every request to the listing, assign, delete, and upload
+    endpoints takes latency seconds, and fails (with failure_status, 503 by default) with probability
+    failure_rate; the next stall of these requests take stall_seconds (e.g., to test hedged reads).
+    If convert_after is set, uploaded and updated models are listed with status "converting" until
+    convert_after seconds passed, and "ready" (or "failed", if their name contains "fail") after that.
+    """
+
+    def __init__(self, ports=(0,)):
+        """ Create the server
+
+        Args:
+            ports: The ports to listen on, all serving the same platform (0 picks a free port). Default
+                a single free port; use LOCAL_PORTS to stand in for the servers of EXEC_MODE "local".
+        """
+        self.uploads = []
+        self.files = {}  # cfid -> content of its latest upload (the base of patches).
+        self.models = []  # Records as returned by the listings, e.g., {'cfid': .., 'name': ..}.
+        self.devices = []
+        self.assignments = []
+        self.requests = []  # (method, path) of all requests to the listing, assign, and delete endpoints.
+        self.latency = 0.0  # Seconds these requests take to handle.
+        self.active = 0  # Number of these requests being handled (and the maximum so far).
+        self.max_active = 0
+        self.signins = 0  # Number of sign ins (and, below, token refreshes).
+        self.refreshes = 0
+        self.connections = 0  # Number of connections accepted (keep-alive connections are counted once).
+        self.drop_uploads = 0  # Number of upload requests that are interrupted halfway through the body.
+        self.drop_responses = 0  # Number of upload requests that are processed, but not responded to.
+        self.failure_rate = 0.0  # Probability that a request fails (with failure_status).
+        self.failure_status = 503
+        self.stall = 0  # Number of requests that take stall_seconds (instead of latency).
+        self.stall_seconds = 0.0
+        self.failures = 0  # Number of injected failures.
+        self.convert_after = None  # Seconds the conversion of an upload takes; None lists models without status.
+        self.converting = {}  # cfid -> time at which the conversion of the model finishes.
+        self.patches = True  # Whether updates can be sent as a patch.
+        self.returns_cfid = False  # Whether the response to an upload of a new model includes its cfid.
+        self.lock = threading.Lock()
+        self.servers = [ThreadingHTTPServer(("127.0.0.1", port), _handler(self)) for port in ports]
+        for server in self.servers:
+            server.daemon_threads = True
+        self.url = "http://127.0.0.1:" + str(self.servers[0].server_address[1])
+
+    def add_model(self, name):
+        """ Add a model (without uploading it); returns its cfid. """
+        cfid = str(uuid.uuid4())
+        with self.lock:
+            self.models.append({'cfid': cfid, 'name': name, 'exampleinput': "..."})
+        return cfid
+
+    def add_device(self, name):
+        """ Register a device; returns its did (its rid is "rid-" + did). """
+        did = str(uuid.uuid4())
+        with self.lock:
+            self.devices.append({'did': did, 'rid': "rid-" + did, 'name': name})
+        return did
+
+    def convert(self):
+        """ Finish the conversions that are due (called with the lock held). """
+        now = time.monotonic()
+        for model in self.models:
+            if model['cfid'] in self.converting and self.converting[model['cfid']] <= now:
+                del self.converting[model['cfid']]
+                model['status'] = "failed" if "fail" in model['name'] else "ready"
+
+    def __enter__(self):
+        for server in self.servers:
+            threading.Thread(target=server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *args):
+        for server in self.servers:
+            server.shutdown()
+            server.server_close()
+
+    def _fail(self):
+        """ Decide whether to inject a failure (see failure_rate). """
+        with self.lock:
+            fail = self.failure_rate > 0 and random.random() < self.failure_rate
+            self.failures += 1 if fail else 0
+        return fail
+
+
+# _handler creates the request handler class for a MockServer.
+def _handler(mock):
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args):
+            pass
+
+        def setup(self):
+            super().setup()
+            # send the headers and body of a response at once (as real servers do), not after a delayed ACK:
+            self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            with mock.lock:
+                mock.connections += 1
+
+        def _reply(self, status, result):
+            body = json.dumps(result).encode('utf-8')
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_POST(self):
+            if self.path.startswith("/user/signin"):
+                self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                with mock.lock:
+                    mock.signins += 1
+                return self._reply(200, {'token': TOKEN, 'uid': USER_ID})
+            if self.path.startswith("/upload/"):
+                return self._upload()
+            data = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            if self.path == "/assign/" + USER_ID:
+                return self._authorized() and self._assign(json.loads(data or b"{}"))
+            self._reply(404, {'error': "Not found"})
+
+        def do_GET(self):
+            if self.path.startswith("/user/refresh"):
+                if self.headers.get("Authorization") != TOKEN:
+                    return self._reply(401, {'error': "Unauthorized"})
+                with mock.lock:
+                    mock.refreshes += 1
+                return self._reply(200, {'token': TOKEN})
+            url = urlsplit(self.path)
+            listings = {"/compute-functions/": mock.models, "/devices/": mock.devices,
+                        "/assignments/user/": mock.assignments}
+            for prefix, records in listings.items():
+                if url.path == prefix + USER_ID:
+                    if not self._authorized():
+                        return
+                    query = parse_qs(url.query)
+                    offset, limit = int(query.get('offset', [0])[0]), int(query.get('limit', [20])[0])
+                    with mock.lock:
+                        if records is mock.models:
+                            mock.convert()
+                        return self._reply(200, records[offset:offset + limit])
+            self._reply(404, {'error': "Not found"})
+
+        def do_DELETE(self):
+            self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            objects = {"/compute-function/": (mock.models, 'cfid'), "/device/": (mock.devices, 'did'),
+                       "/assign/": (mock.assignments, 'aid')}
+            for prefix, (records, key) in objects.items():
+                if self.path.startswith(prefix + USER_ID + "/"):
+                    if not self._authorized():
+                        return
+                    object_id = self.path.split("/")[-1]
+                    with mock.lock:
+                        found = [record for record in records if record[key] == object_id]
+                        for record in found:
+                            records.remove(record)
+                    return self._reply(200, {'error': "" if found else "Not found: " + object_id})
+            self._reply(404, {'error': "Not found"})
+
+        def _authorized(self):
+            with mock.lock:
+                mock.requests.append((self.command, self.path))
+                mock.active += 1
+                mock.max_active = max(mock.max_active, mock.active)
+                stall = mock.stall > 0
+                mock.stall -= 1 if stall else 0
+            time.sleep(mock.stall_seconds if stall else mock.latency)
+            with mock.lock:
+                mock.active -= 1
+            if self.headers.get("Authorization") != TOKEN:
+                self._reply(401, {'error': "Unauthorized"})
+                return False
+            if mock._fail():
+                self._reply(mock.failure_status, {'error': "Injected failure."})
+                return False
+            return True
+
+        def _assign(self, data):
+            with mock.lock:
+                model = [m for m in mock.models if m['cfid'] == data.get('modelId')]
+                device = [d for d in mock.devices if d['did'] == data.get('deviceId')]
+                if not model or not device or device[0]['rid'] != data.get('registrationId'):
+                    return self._reply(200, {'error': "Unknown model or device."})
+                mock.assignments.append({'aid': str(uuid.uuid4()), 'cfid': model[0]['cfid'], 'did': device[0]['did'],
+                                         'rid': device[0]['rid'], 'model_name': model[0]['name'],
+                                         'device_name': device[0]['name']})
+            self._reply(200, {'error': ""})
+
+        def do_PUT(self):
+            if self.path.startswith("/upload/"):
+                return self._upload()
+            self._reply(404, {'error': "Not found"})
+
+        def do_PATCH(self):
+            if self.path.startswith("/upload/"):
+                return self._upload()
+            self._reply(404, {'error': "Not found"})
+
+        def _upload(self):
+            length = int(self.headers.get("Content-Length", 0))
+            with mock.lock:
+                drop = mock.drop_uploads > 0
+                mock.drop_uploads -= 1 if drop else 0
+            if drop:
+                self.rfile.read(length // 2)
+                self.close_connection = True
+                self.connection.close()
+                return
+            body = _Body(self.rfile, self.headers)
+            refused = self.command == "PATCH" and not mock.patches
+            if self.headers.get("Authorization") != TOKEN or refused or mock._fail():
+                while body.read(1024 * 1024):
+                    pass
+                if self.headers.get("Authorization") != TOKEN:
+                    return self._reply(401, {'error': "Unauthorized"})
+                if refused:
+                    return self._reply(405, {'error': "Method not allowed"})
+                return self._reply(mock.failure_status, {'error': "Injected failure."})
+            upload = _read_multipart(body, self.headers.get("Content-Type", ""))
+            upload.update({'method': self.command, 'path': self.path, 'received': body.received,
+                           'encoding': self.headers.get("Content-Encoding", "")})
+            content, cfid = upload['content'], self.path.split("/")[-1]
+            if self.command == "PATCH":
+                from sclbl._delta import apply
+                try:
+                    content = apply(mock.files[cfid], upload['content'] or b"")
+                except (KeyError, ValueError) as e:
+                    return self._reply(409, {'error': "Unable to apply the patch: " + str(e)})
+                upload['patched'] = hashlib.sha256(content).hexdigest()
+            with mock.lock:
+                mock.uploads.append(upload)
+                name = json.loads(upload['fields'].get('data', "{}")).get('name', "")
+                if self.command == "POST":
+                    mock.models.append({'cfid': str(uuid.uuid4()), 'name': name, 'exampleinput': "..."})
+                    model, cfid = mock.models[-1], mock.models[-1]['cfid']
+                else:
+                    model = next((m for m in mock.models if m['cfid'] == cfid), None)
+                if content is not None:
+                    mock.files[cfid] = content
+                else:
+                    mock.files.pop(cfid, None)  # too large to keep; patches of it are rejected.
+                if model is not None and mock.convert_after is not None:
+                    model.update({'name': name or model['name'], 'status': "converting"})
+                    mock.converting[model['cfid']] = time.monotonic() + mock.convert_after
+                drop = mock.drop_responses > 0
+                mock.drop_responses -= 1 if drop else 0
+            if drop:
+                self.close_connection = True
+                self.connection.close()
+                return
+            self._reply(200, dict({'error': ""}, **({'cfid': cfid} if mock.returns_cfid else {})))
+
+    return Handler
+
+
+class _Body:
+    """ Reads a request body, undoing its transfer encoding (chunked) and content encoding (gzip, zstd). """
+
+    def __init__(self, rfile, headers):
+        self.rfile = rfile
+        self.chunked = headers.get("Transfer-Encoding", "").lower() == "chunked"
+        self.remaining = None if self.chunked else int(headers.get("Content-Length", 0))
+        self.received = 0
+        encoding = headers.get("Content-Encoding", "")
+        if encoding == "gzip":
+            self.decoder = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        elif encoding == "zstd":
+            import zstandard
+            self.decoder = zstandard.ZstdDecompressor().decompressobj()
+        else:
+            self.decoder = None
+
+    def _raw(self, size):
+        if self.chunked:
+            if self.remaining == 0:
+                self.rfile.readline()  # the line break after a chunk.
+                self.remaining = None
+            if self.remaining is None:
+                self.remaining = int(self.rfile.readline().split(b";")[0], 16)
+                if self.remaining == 0:
+                    while self.rfile.readline() not in (b"\r\n", b""):  # (empty) trailer.
+                        pass
+                    self.chunked, self.remaining = False, 0
+                    return b""
+        chunk = self.rfile.read(min(size, self.remaining))
+        self.remaining -= len(chunk)
+        self.received += len(chunk)
+        return chunk
+
+    def read(self, size):
+        while True:
+            chunk = self._raw(size)
+            if not self.decoder or not chunk:
+                return chunk
+            out = self.decoder.decompress(chunk)
+            if out:
+                return out
+
+
+# _read_multipart reads a multipart/form-data body, streaming the file part into a hash.
+def _read_multipart(stream, content_type):
+    """ Parse a multipart body without holding (large) files in memory. """
+    boundary = ("--" + content_type.split("boundary=")[-1]).encode('utf-8')
+    delimiter = b"\r\n" + boundary
+    result = {'fields': {}, 'size': 0, 'sha256': "", 'content': None}
+    buffer = b""
+
+    def fill():
+        nonlocal buffer
+        chunk = stream.read(1024 * 1024)
+        buffer += chunk
+        return len(chunk) > 0
+
+    while True:
+        while b"\r\n\r\n" not in buffer and fill():
+            pass
+        if b"\r\n\r\n" not in buffer:
+            break
+        header, buffer = buffer.split(b"\r\n\r\n", 1)
+        if header.strip().startswith(boundary + b"--"):
+            break
+        name = header.split(b'name="')[1].split(b'"')[0].decode('utf-8')
+        digest, size, content = hashlib.sha256(), 0, b""
+        while True:
+            index = buffer.find(delimiter)
+            if index >= 0:
+                part, buffer = buffer[:index], buffer[index + 2:]
+            else:
+                keep = len(delimiter)
+                part, buffer = buffer[:-keep], buffer[-keep:]
+            digest.update(part)
+            size += len(part)
+            if size < KEEP_CONTENT:
+                content += part
+            if index >= 0 or not fill():
+                break
+        if b"filename=" in header:
+            result.update({'size': size, 'sha256': digest.hexdigest(),
+                           'content': content if size < KEEP_CONTENT else None})
+        else:
+            result['fields'][name] = content.decode('utf-8')
+    return result
+
+
+# serve runs the mock platform on the local ports until interrupted.
+def serve(args=None):
+    """ Serve the mock platform for EXEC_MODE "local" (see the top of this file). """
+    import argparse
+    parser = argparse.ArgumentParser(description="Local stand-in for the Scailable platform.")
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds every request takes.")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="Probability that a request fails.")
+    parser.add_argument("--models", type=int, default=0, help="Number of models to create.")
+    parser.add_argument("--devices", type=int, default=0, help="Number of devices to register.")
+    args = parser.parse_args(args)
+    with MockServer(LOCAL_PORTS) as mock:
+        mock.latency, mock.failure_rate = args.latency, args.failure_rate
+        for i in range(args.models):
+            mock.add_model("Model " + str(i))
+        for i in range(args.devices):
+            mock.add_device("Device " + str(i))
+        print("Serving the mock platform on ports " + ", ".join(str(p) for p in LOCAL_PORTS) + " (Ctrl-C to stop).")
+        try:
+            while True:
+                time.sleep(3600)
+        except KeyboardInterrupt:
+            pass
+
+
+if __name__ == '__main__':
+    serve()
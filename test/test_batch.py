@@ -0,0 +1,36 @@
+from click.testing import CliRunner
+from sclbl.cli import batch
+from mock_server import MockServer, TOKEN
+
+
+# test_batch tests running a script of commands, reporting the commands that fail.
+def test_batch(tmp_path, platform):
+    for i in range(10):
+        platform.add_model("cfid-" + str(i))
+    script = tmp_path / "script.txt"
+    script.write_text("# list the models\nmodels\n\nmodels --offset 5\nassign --cfid only\nbatch\nmodels 'unclosed\n")
+    result = CliRunner().invoke(batch, [str(script)])
+    assert "cfid-0" in result.output and "cfid-5" in result.output, "Commands in the script should run."
+    assert "Ran 5 commands; 3 failed (line 5, 6, 7)." in result.output, "Failed commands should be reported."
+    assert result.exit_code == 1, "A batch with failed commands should fail."
+
+    result = CliRunner().invoke(batch, ["--stop-on-error"], input="assign --cfid only\nmodels\n")
+    assert "cfid-0" not in result.output, "--stop-on-error should stop at the first failure."
+    assert CliRunner().invoke(batch, [], input="models\n").exit_code == 0, "Scripts should be read from stdin."
+
+
+# test_route_sclblpy tests that sclblpy's requests reuse the connections of the shared session.
+def test_route_sclblpy():
+    import sclblpy.main
+    from sclbl._transport import route_sclblpy
+    original = sclblpy.main.requests
+    route_sclblpy()
+    try:
+        with MockServer() as mock:
+            for i in range(3):
+                response = sclblpy.main.requests.post(mock.url + "/user/signin/", data="{}")
+                assert response.json()['token'] == TOKEN, "Request not sent."
+            assert mock.connections == 1, "Requests should reuse a single connection."
+    finally:
+        sclblpy.main.requests = original
+        sclblpy._jwt.req = original
@@ -0,0 +1,45 @@
+import statistics
+import subprocess
+import sys
+import time
+import benchmark
+
+# Maximum milliseconds that starting the CLI (sclbl --help) may take beyond starting python and importing click;
+# importing sclblpy and the network stack alone takes longer.
+COLD_START_BUDGET = 100.0
+
+
+# test_benchmarks tests that the benchmark suite runs (at a small scale) against the mock platform.
+def test_benchmarks():
+    results = benchmark.run(records=250, uploads=3, large=1, large_mb=1, assignments=20, cold_start_runs=1,
+                            completions=1000)
+    assert set(results) == {'cold_start', 'listing_jsonl', 'listing_table', 'upload_small_models',
+                            'upload_small_throughput', 'upload_large_models', 'upload_large_throughput', 'assign',
+                            'completion', 'completion_process'}, \
+        "Unexpected results: " + str(list(results))
+    assert all(value > 0 for value, unit, better in results.values()), "All results should be positive."
+
+
+# test_compare tests finding regressions relative to a baseline.
+def test_compare():
+    results = {'cold_start': (130.0, "ms", "lower"), 'assign': (700.0, "assignments/s", "higher"),
+               'listing_jsonl': (5000.0, "records/s", "higher")}
+    baseline = {'cold_start': [100.0, "ms", "lower"], 'assign': [1000.0, "assignments/s", "higher"]}
+    assert benchmark.compare(results, baseline) == [('cold_start', 130.0, 100.0), ('assign', 700.0, 1000.0)], \
+        "Both slowdowns of more than 20% should be regressions."
+    assert benchmark.compare(results, baseline, tolerance=0.5) == [], "Slowdowns within the tolerance are allowed."
+    assert "REGRESSION" in benchmark.report(results, baseline), "Regressions should be marked in the report."
+
+
+# test_cold_start_latency tests that starting the CLI stays within COLD_START_BUDGET.
+def test_cold_start_latency():
+    times = []
+    for _ in range(5):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, "-c", "import click"], stdout=subprocess.DEVNULL, check=True)
+        times.append(time.perf_counter() - start)
+    interpreter = 1000 * statistics.median(times)
+    cold_start = benchmark.bench_cold_start(runs=5)['cold_start'][0]
+    assert cold_start - interpreter < COLD_START_BUDGET, \
+        "Starting the CLI took " + str(int(cold_start - interpreter)) + " ms longer than importing click (" + \
+        str(int(COLD_START_BUDGET)) + " ms allowed)."
@@ -0,0 +1,168 @@
+import json
+import os
+import time
+import pytest
+from click.testing import CliRunner
+from sclbl.cli import upload, assign, delete
+from sclbl._bulk import collect_files, read_manifest, read_rows, write_rows, results_path, RateLimiter, retry_async
+
+FILES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "files")
+
+
+# test_collect_files tests expanding files, directories, and glob patterns.
+def test_collect_files():
+    model = os.path.join(FILES_DIR, "model.onnx")
+    assert collect_files(model) == [model], "A single file should be returned as is."
+    assert collect_files(FILES_DIR) == [model], "A directory should expand to its .onnx files."
+    assert collect_files(os.path.join(FILES_DIR, "*.onnx")) == [model], "Glob pattern not expanded."
+    assert collect_files(os.path.join(FILES_DIR, "missing.onnx")) == [], "Missing files should not match."
+
+
+# test_read_manifest tests reading a JSON upload manifest.
+def test_read_manifest(tmp_path):
+    path = tmp_path / "manifest.json"
+    path.write_text(json.dumps({"a.onnx": {"name": "Model A", "docs": "Docs A"}, "b.onnx": {}}))
+    jobs = read_manifest(str(path))
+    assert [job['name'] for job in jobs] == ["Model A", "b"], "Names not read from the manifest."
+    assert jobs[0]['file'] == str(tmp_path / "a.onnx"), "Files should be relative to the manifest."
+    assert jobs[1]['example'] == "...", "Missing details should get their defaults."
+
+
+# test_upload_requires_input tests that upload fails on missing input without contacting the platform.
+def test_upload_requires_input():
+    result = CliRunner().invoke(upload, [])
+    assert result.exit_code == 2, "Upload without --file or --manifest should be a usage error."
+
+
+# test_rows tests reading and writing CSV and JSON rows.
+def test_rows(tmp_path):
+    rows = [{'cfid': "c1", 'did': "d1", 'rid': "r1"}, {'cfid': "c2", 'did': "d2", 'rid': "r2"}]
+    for name in ["mapping.csv", "mapping.json"]:
+        path = str(tmp_path / name)
+        write_rows(path, rows, ['cfid', 'did', 'rid'])
+        assert read_rows(path) == rows, "Rows not read back from " + name
+    assert results_path("mapping.csv") == "mapping.results.csv", "Wrong results path."
+    assert results_path("mapping.results.csv") == "mapping.results.csv", "Reruns should update the results file."
+
+
+# test_retry tests retrying failed calls and the rate limiter.
+def test_retry():
+    import asyncio
+    attempts = []
+
+    async def flaky():
+        attempts.append(1)
+        if len(attempts) == 1:
+            raise ValueError("flaky")
+        return len(attempts) >= 3
+
+    assert asyncio.run(retry_async(flaky, retries=3, backoff=0.001)), "Call should succeed on the third attempt."
+    assert len(attempts) == 3, "Call should stop being retried after success."
+    attempts.clear()
+    with pytest.raises(ValueError):
+        asyncio.run(retry_async(flaky, retries=3, backoff=0.001, retry_on=KeyError))
+    assert len(attempts) == 1, "Only the exceptions of retry_on should be retried."
+
+    async def limited():
+        return True
+
+    limiter = RateLimiter(200)
+    start = time.monotonic()
+    for _ in range(11):
+        asyncio.run(retry_async(limited, limiter=limiter))
+    assert time.monotonic() - start >= 0.045, "Rate limiter allowed too many calls."
+
+
+# test_assign_from_file tests creating assignments from a mapping file, and retrying the failures.
+def test_assign_from_file(tmp_path, platform):
+    cfid = platform.add_model("Model")
+    dids = [platform.add_device("Device " + str(i)) for i in range(10)]
+    path = tmp_path / "mapping.csv"
+    path.write_text("cfid,did,rid\n" + "".join(cfid + "," + did + ",rid-" + did + "\n" for did in dids) +
+                    cfid + ",bad,r\n" + cfid + ",,r\n")
+    result = CliRunner().invoke(assign, ['--from-file', str(path), '--retries', '0'])
+    assert result.exit_code == 1, "Failed rows should fail the command: " + result.output
+    rows = read_rows(str(tmp_path / "mapping.results.csv"))
+    assert [row['status'] for row in rows] == ["created"] * 10 + ["failed"] * 2, "Wrong status per row."
+    aids = {a['did']: a['aid'] for a in platform.assignments}
+    assert rows[3]['aid'] == aids[dids[3]], "The aid of created assignments should be looked up."
+
+    platform.requests.clear()
+    CliRunner().invoke(assign, ['--from-file', str(tmp_path / "mapping.results.csv"), '--retries', '0'])
+    assigned = [path for method, path in platform.requests if method == "POST"]
+    assert len(assigned) == 1 and len(platform.assignments) == 10, "A rerun should only retry the failed rows."
+
+
+# test_assign_retries tests that only assignments the platform did not process are retried.
+def test_assign_retries(tmp_path, platform, monkeypatch):
+    import sclbl._policy as policy
+    monkeypatch.setattr(policy, "BACKOFF", 0.001)
+    cfid, did = platform.add_model("Model"), platform.add_device("Device")
+    path = tmp_path / "mapping.csv"
+    path.write_text("cfid,did,rid\n" + cfid + "," + did + ",rid-" + did + "\n")
+    refusals = iter([True] * policy.MAX_ATTEMPTS)  # more than the policy retries: the row has to be retried.
+    monkeypatch.setattr(platform, "_fail", lambda: next(refusals, False))
+    result = CliRunner().invoke(assign, ['--from-file', str(path), '--retries', '1'])
+    assigned = [p for method, p in platform.requests if method == "POST"]
+    assert result.exit_code == 0 and len(platform.assignments) == 1, "A refused (503) row should be retried."
+    assert len(assigned) == policy.MAX_ATTEMPTS + 1, "The row should be retried once the policy gave up."
+
+    platform.requests.clear()
+    path.write_text("cfid,did,rid\n" + cfid + ",bad,r\n")
+    result = CliRunner().invoke(assign, ['--from-file', str(path), '--retries', '3'])
+    assigned = [p for method, p in platform.requests if method == "POST"]
+    assert result.exit_code == 1 and len(assigned) == 1, "Errors of the platform should not be retried."
+
+
+# test_delete_plan tests selecting objects to delete using IDs, stdin, and filters (dry run).
+def test_delete_plan(platform):
+    c1, c2 = platform.add_model("test-1"), platform.add_model("prod")
+    d1 = platform.add_device("Device")
+    platform.assignments += [{'cfid': c2, 'did': d1, 'aid': "a1"}, {'cfid': "c3", 'did': "d2", 'aid': "a2"}]
+
+    result = CliRunner().invoke(delete, ['--dry-run', '--kind', 'device', '--ids-file', '-', '-cfid', 'c9'],
+                                input="d7\nd8\n\n")
+    assert result.exit_code == 0, "Dry run failed: " + result.output
+    assert "3 objects" in result.output and "device: d8" in result.output, "IDs from stdin not planned."
+
+    result = CliRunner().invoke(delete, ['--dry-run', '--kind', 'model', '--name-match', 'test-*',
+                                         '--assignments-for', c2])
+    assert result.exit_code == 0, "Dry run failed: " + result.output
+    assert result.output.index("assignment: a1") < result.output.index("model: " + c1), "Assignments go first."
+    assert c2 not in result.output.replace("a1", ""), "Only matching objects should be planned."
+    assert not [r for r in platform.requests if r[0] == "DELETE"], "A dry run should not delete anything."
+
+    result = CliRunner().invoke(delete, ['--ids-file', '-'], input="d1\n")
+    assert result.exit_code == 2, "--ids-file without --kind should be a usage error."
+
+
+# test_delete_many tests deleting multiple objects concurrently.
+def test_delete_many(platform):
+    d1 = platform.add_device("Device 1")
+    platform.assignments += [{'cfid': "c", 'did': d1, 'aid': "a1"}, {'cfid': "c", 'did': d1, 'aid': "a2"}]
+
+    result = CliRunner().invoke(delete, ['-did', d1, '-did', 'd2', '-aid', 'a1', '-aid', 'a2'])
+    assert result.exit_code == 1, "The failed delete should fail the command: " + result.output
+    deleted = [path.split("/")[-1] for method, path in platform.requests if method == "DELETE"]
+    assert set(deleted[:2]) == {"a1", "a2"} and set(deleted[2:]) == {d1, "d2"}, "Wrong delete order."
+    assert "Deleted 3 of 4 objects; 1 failed." in result.output, "Wrong summary."
+    assert not platform.devices and not platform.assignments, "Objects not deleted."
+
+
+# test_names tests assigning and deleting using model and device names.
+def test_names(platform):
+    cfid, did = platform.add_model("Resnet"), platform.add_device("Camera 1")
+    platform.add_device("Camera 2")
+    result = CliRunner().invoke(assign, ['--model-name', "Res", '--device-name', "Camera 1"])
+    assert result.exit_code == 0 and "successfully" in result.output, "Assign by name failed: " + result.output
+    assert platform.assignments[0]['did'] == did, "The wrong device was assigned."
+
+    requests = len(platform.requests)
+    CliRunner().invoke(assign, ['--cfid', cfid, '--device-name', "Camera 1"])
+    assert len(platform.requests) == requests + 1, "Known names should be resolved without listing."
+    result = CliRunner().invoke(assign, ['--model-name', "Resnet", '--device-name', "Camera"])
+    assert result.exit_code == 2 and "ambiguous" in result.output, "Ambiguous names should be reported."
+    result = CliRunner().invoke(delete, ['--model-name', "Mobilenet"])
+    assert result.exit_code == 2 and "No model" in result.output, "Unknown names should be reported."
+    result = CliRunner().invoke(delete, ['--model-name', "Resnet", '--dry-run'])
+    assert "model: " + cfid in result.output, "Delete by name should resolve the cfid."
@@ -0,0 +1,109 @@
+import os
+import pytest
+from click.testing import CliRunner
+import sclbl._globals as glob
+import sclbl._cache as cache
+from sclbl._cache import FetchError
+from sclbl.cli import models
+
+RECORDS = [{'name': "Model " + str(i), 'cfid': "cfid-" + str(i)} for i in range(5)]
+
+
+@pytest.fixture(autouse=True)
+def cache_file(tmp_path, monkeypatch):
+    monkeypatch.setattr(glob, "CACHE_FILE", str(tmp_path / "cache.sqlite"))
+
+
+# test_get_put tests storing and retrieving a page, including the TTL.
+def test_get_put():
+    assert cache.get("models", 0, 20) is None, "Empty cache should not return a page."
+    assert cache.put("models", 0, 20, RECORDS), "Unable to store a page."
+    assert cache.get("models", 0, 20) == RECORDS, "Stored page not returned."
+    assert cache.get("models", 20, 20) is None, "Other pages should not be returned."
+    assert cache.get("models", 0, 20, ttl=0) is None, "Expired page should not be returned."
+    assert cache.get("models", 0, 20, ttl=-1) == RECORDS, "Negative TTL should accept any age."
+
+
+# test_invalidate tests removing listings and clearing the cache.
+def test_invalidate():
+    cache.put("models", 0, 20, RECORDS)
+    cache.put("devices", 0, 20, [])
+    assert cache.invalidate("models"), "Unable to invalidate."
+    assert cache.get("models", 0, 20) is None, "Invalidated page still returned."
+    assert cache.get("devices", 0, 20) == [], "Other listings should not be invalidated."
+    assert cache.clear(), "Unable to clear the cache."
+    assert cache.get("devices", 0, 20) is None, "Cleared cache still returns pages."
+
+
+# test_servers tests that every server has a cache of its own.
+def test_servers(monkeypatch):
+    cache.put("models", 0, 20, RECORDS)
+    cache.record_upload("digest", "details", "cfid-1")
+    server = glob.USER_MANAGER_URL
+    monkeypatch.setattr(glob, "USER_MANAGER_URL", "https://dev.usermanager.sclbl.net:8008")
+    assert cache.path().endswith("cache-dev.usermanager.sclbl.net_8008.sqlite"), "Unexpected file: " + cache.path()
+    assert cache.get("models", 0, 20) is None, "The listings of another server should not be returned."
+    assert not cache.uploaded("digest", "details"), "The uploads to another server should not count."
+    assert not cache.lookup("models", "Model"), "The names of another server should not be found."
+    cache.put("devices", 0, 20, [])
+    monkeypatch.setattr(glob, "USER_MANAGER_URL", server)
+    assert cache.get("models", 0, 20) == RECORDS, "The listings of the server should be kept."
+    assert cache.clear(), "Unable to clear the caches."
+    assert not [f for f in os.listdir(os.path.dirname(glob.CACHE_FILE)) if f.startswith("cache")], \
+        "The caches of all servers should be removed."
+
+
+# test_cached_fetch tests the refresh and cached modes.
+def test_cached_fetch():
+    import asyncio
+    calls = []
+
+    async def fetch(offset, limit):
+        calls.append(offset)
+        return RECORDS
+
+    def run(fetch_):
+        return asyncio.run(fetch_(0, 20))
+
+    assert run(cache.cached_fetch("models", fetch)) == RECORDS and calls == [0], "First fetch should be remote."
+    assert run(cache.cached_fetch("models", fetch)) == RECORDS and calls == [0], "Second fetch should be cached."
+    run(cache.cached_fetch("models", fetch, refresh=True))
+    assert calls == [0, 0], "Refresh should bypass the cache."
+    with pytest.raises(FetchError):
+        asyncio.run(cache.cached_fetch("models", fetch, cached=True)(20, 20))
+    assert calls == [0, 0], "Cached mode should never fetch."
+
+
+# test_models_cached tests listing models from the cache without contacting the platform.
+def test_models_cached():
+    cache.put("models", 0, 20, RECORDS)
+    result = CliRunner().invoke(models, ['--cached'])
+    assert result.exit_code == 0, "Listing cached models failed."
+    assert "cfid-4" in result.output, "Cached models not printed."
+    result = CliRunner().invoke(models, ['--cached', '--refresh'])
+    assert result.exit_code == 2, "--cached and --refresh should be exclusive."
+
+
+# test_models_cached_all tests that listing all pages from the cache never creates a client (loading sclblpy).
+def test_models_cached_all(monkeypatch):
+    import sclbl.client
+    created = []
+    monkeypatch.setattr(sclbl.client, "Client", lambda *args: created.append(args))
+    for offset in (0, 2, 4):
+        cache.put("models", offset, 2, RECORDS[offset:offset + 2])
+    result = CliRunner().invoke(models, ['--all', '--cached', '--limit', "2"])
+    assert result.exit_code == 0 and all(r['cfid'] in result.output for r in RECORDS), "Unexpected: " + result.output
+    assert not created, "No client should be created for cached pages."
+
+
+# test_lookup tests the name index: exact names, prefixes of names and ids, and rebuilding it.
+def test_lookup():
+    cache.put("models", 0, 20, RECORDS + [{'name': "Model 1", 'cfid': "other"}])
+    assert [m['id'] for m in cache.lookup("models", "Model 2")] == ["cfid-2"], "Exact name not found."
+    assert len(cache.lookup("models", "Model 1")) == 2, "Both models named Model 1 should match."
+    assert len(cache.lookup("models", "Mod")) == 6, "Name prefix should match all models."
+    assert [m['id'] for m in cache.lookup("models", "oth")] == ["other"], "Id prefix not found."
+    assert cache.lookup("devices", "Model 2") == [], "Other listings should not match."
+    assert cache.index("models", RECORDS[:1]), "Unable to rebuild the index."
+    assert cache.lookup("models", "Model 2") == [], "Rebuilding should remove models no longer listed."
+    assert cache.unindex("models", ["cfid-0"]) and cache.lookup("models", "Model 0") == [], "Unable to unindex."
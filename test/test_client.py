@@ -0,0 +1,104 @@
+import asyncio
+import time
+import pytest
+import sclblpy._globals as spglob
+import sclbl
+from sclbl.client import Client, ClientError, FetchError
+
+
+# test_client_listings tests retrieving single pages and iterating over all pages.
+def test_client_listings(platform):
+    for i in range(25):
+        platform.add_model("Model " + str(i))
+
+    async def listings(client):
+        page = await client.models(offset=5, limit=5)
+        records = [record async for record in client.iter_records("models", limit=10)]
+        return page, records
+
+    page, records = asyncio.run(listings(Client()))
+    assert [m['name'] for m in page] == ["Model " + str(i) for i in range(5, 10)], "Wrong page."
+    assert records == platform.models, "Not all records were returned."
+    assert sclbl.Client is Client, "The client should be available as sclbl.Client."
+
+
+# test_iter_records tests walking the pages of a listing: offsets, prefetching, and errors of a later page.
+def test_iter_records(platform):
+    records, requested = [{'cfid': str(i)} for i in range(45)], []
+
+    async def fetch(offset, limit):
+        requested.append(offset)
+        if offset >= 20 and limit == 5:
+            raise FetchError("page unavailable")
+        return records[offset:offset + limit]
+
+    async def walk(offset, limit, count=None, received=None):
+        received = [] if received is None else received
+        walker = Client().iter_records("models", offset, limit, fetch)
+        try:
+            async for record in walker:
+                received.append(record)
+                await asyncio.sleep(0)  # e.g., writing the record.
+                if len(received) == count:
+                    break
+        finally:
+            await walker.aclose()
+        return received
+
+    assert asyncio.run(walk(0, 10)) == records and asyncio.run(walk(40, 10)) == records[40:], "Wrong records."
+    assert asyncio.run(walk(0, 45)) == records, "Exactly one full page should end with an empty page."
+    requested.clear()
+    asyncio.run(walk(0, 10, count=1))
+    assert requested == [0, 10], "The second page should be prefetched after the first page arrived."
+    received = []
+    with pytest.raises(FetchError):
+        asyncio.run(walk(0, 5, received=received))
+    assert received == records[:20], "Records before the failing page should be yielded."
+
+
+# test_client_limits tests that concurrent requests are limited per endpoint.
+def test_client_limits(platform):
+    platform.latency = 0.05
+
+    async def fan_out(client):
+        return await client.map(lambda i: client.records("devices", i, 1), range(8))
+
+    start = time.monotonic()
+    results = asyncio.run(fan_out(Client(limits={'list': 2})))
+    assert platform.max_active == 2, "At most 2 listing requests should run concurrently."
+    assert time.monotonic() - start >= 0.2 and len(results) == 8, "Requests were not limited."
+
+    platform.max_active = 0
+    asyncio.run(fan_out(Client(limits={'list': 8})))
+    assert platform.max_active > 2, "Requests to the same endpoint should overlap."
+
+
+# test_client_errors tests that failed operations raise, and that map() collects the errors per job.
+def test_client_errors(platform, monkeypatch):
+    cfid, did = platform.add_model("Model"), platform.add_device("Device")
+
+    async def operations(client):
+        assert await client.assign(cfid, did, "rid-" + did), "Assignment not created."
+        with pytest.raises(ClientError):
+            await client.assign(cfid, "unknown", "rid")
+        return await client.map(lambda kind: client.delete(kind, did), ["device", "device"])
+
+    results = asyncio.run(operations(Client()))
+    assert [error is None for job, result, error in results].count(True) == 1, "The device can be deleted once."
+
+    monkeypatch.setattr(spglob, "JWT_TOKEN", "expired")
+    with pytest.raises(FetchError):
+        asyncio.run(Client().devices())
+
+
+# test_client_setup tests that the client leaves sclblpy alone, raising (not exiting) for an unsupported version.
+def test_client_setup(monkeypatch):
+    import sclblpy.main
+    import sclbl._transport as transport
+    monkeypatch.setattr(transport, "_configured", False)
+    routed = sclblpy.main.requests
+    Client()
+    assert not transport._configured and sclblpy.main.requests is routed, "The client should not configure sclblpy."
+    monkeypatch.setattr(transport, "sclblpy_version", "0.1.5")
+    with pytest.raises(ClientError):
+        Client()
@@ -0,0 +1,64 @@
+import os
+import time
+import pytest
+from click.testing import CliRunner
+import sclbl._globals as glob
+import sclbl._cache as cache
+from sclbl._complete import write, lookup, refresh
+from sclbl.cli import main, models
+
+MODELS = [{'cfid': "cfid-" + str(i), 'name': "Model " + str(i)} for i in range(12)] + \
+         [{'cfid': "other", 'name': "Tab\tand\nnewline"}]
+DEVICES = [{'did': "did-1", 'rid': "rid-1", 'name': "Camera 1"}]
+ASSIGNMENTS = [{'aid': "aid-1", 'cfid': "cfid-1", 'did': "did-1", 'model_name': "Model 1", 'device_name': "Camera 1"}]
+
+
+@pytest.fixture
+def snapshot(tmp_path, monkeypatch):
+    monkeypatch.setattr(glob, "CACHE_FILE", str(tmp_path / "cache.sqlite"))
+    monkeypatch.setattr(glob, "COMPLETION_FILE", str(tmp_path / "completion.tsv"))
+    for kind, records in [("models", MODELS), ("devices", DEVICES), ("assignments", ASSIGNMENTS)]:
+        cache.put(kind, 0, 20, records)
+    return glob.COMPLETION_FILE
+
+
+# test_lookup tests completing ids and names from the snapshot.
+def test_lookup(snapshot):
+    assert lookup("cfid", "cfid-1") == [], "There should be no completions before the snapshot is written."
+    assert write() == 2 * len(MODELS) + 2 * len(DEVICES) + len(ASSIGNMENTS), "Unexpected number of completions."
+    assert [value for value, help_ in lookup("cfid", "cfid-1")] == ["cfid-1", "cfid-10", "cfid-11"], "Bad ids."
+    assert lookup("cfid", "cfid-2") == [("cfid-2", "Model 2")], "The name should be the help of an id."
+    assert lookup("model-name", "Model 3") == [("Model 3", "cfid-3")], "The id should be the help of a name."
+    assert lookup("model-name", "Tab") == [("Tab and newline", "other")], "Whitespace should be normalized."
+    assert lookup("aid", "") == [("aid-1", "Model 1 on Camera 1")], "Assignments should be named after both."
+    assert lookup("device-name", "Model") == [], "Other fields should not match."
+    assert len(lookup("cfid", "", limit=5)) == 5, "The number of completions should be limited."
+    assert all(lookup("cfid", value)[0] == (value, help_) for value, help_ in lookup("cfid", "")), \
+        "Every entry should be found."
+
+
+# test_completion tests the completions offered by the shell completion of the commands.
+def test_completion(snapshot):
+    write()
+    env = {'_SCLBL_COMPLETE': "bash_complete", 'COMP_WORDS': "sclbl delete --cfid cfid-1", 'COMP_CWORD': "3"}
+    result = CliRunner().invoke(main, [], prog_name="sclbl", env=env)
+    assert result.output.split() == ["plain,cfid-1", "plain,cfid-10", "plain,cfid-11"], "Bad: " + result.output
+    env.update(COMP_WORDS="sclbl assign --device-name Cam", COMP_CWORD="3")
+    result = CliRunner().invoke(main, [], prog_name="sclbl", env=env)
+    assert result.output == "plain,Camera 1\n", "Names should be completed: " + result.output
+
+
+# test_refresh tests that a listing refreshes the snapshot in the background.
+def test_refresh(platform, tmp_path, monkeypatch):
+    monkeypatch.setattr(glob, "COMPLETION_FILE", str(tmp_path / "completion.tsv"))
+    platform.add_model("Resnet")
+    result = CliRunner().invoke(models, [])
+    assert result.exit_code == 0, "Unable to list the models: " + result.output
+    deadline = time.time() + 30
+    while not lookup("model-name", "Res") and time.time() < deadline:
+        time.sleep(0.05)
+    assert [value for value, help_ in lookup("model-name", "Res")] == ["Resnet"], "The snapshot was not refreshed."
+    assert not [f for f in os.listdir(os.path.dirname(glob.COMPLETION_FILE)) if f.endswith(".tmp")], \
+        "Temporary files should be removed."
+    assert CliRunner().invoke(models, ['--cached']).exit_code == 0 and not refresh(), \
+        "A listing served from the cache should not refresh the snapshot."
@@ -0,0 +1,97 @@
+import os
+import pytest
+from click.testing import CliRunner
+from sclbl.cli import update
+from sclbl._delta import segments, write_patch, apply, _fields, GRAPH
+from sclbl._files import file_hash
+
+MODEL = os.path.join(os.path.dirname(os.path.abspath(__file__)), "files", "model.onnx")
+
+
+# _retrain writes a copy of model.onnx with the last bytes of (the raw data of) some initializers changed.
+def _retrain(path, count=1, seed=1):
+    with open(MODEL, 'rb') as f:
+        data = bytearray(f.read())
+    graph = next(field for field in _fields(data, 0, len(data)) if field[0] == GRAPH)
+    initializers = sorted((end - start, end) for number, start, payload, end in _fields(data, graph[2], graph[3])
+                          if number == 5)
+    for size, end in initializers[-count:]:
+        data[end - 4:end] = bytes((b + seed) % 256 for b in data[end - 4:end])
+    with open(path, 'wb') as f:
+        f.write(data)
+    return str(path)
+
+
+# test_patch tests splitting a model, and writing and applying patches.
+def test_patch(tmp_path):
+    with open(MODEL, 'rb') as f:
+        data = f.read()
+    parts = segments(data)
+    assert parts[0][0] == 0 and parts[-1][1] == len(data) and all(a[1] == b[0] for a, b in zip(parts, parts[1:])), \
+        "The segments should cover the model."
+    assert len(parts) > 100, "The graph should be split into its nodes and initializers."
+
+    new = _retrain(tmp_path / "new.onnx")
+    size = write_patch(MODEL, new, str(tmp_path / "patch"))
+    patch = (tmp_path / "patch").read_bytes()
+    assert size == len(patch) and size < len(data) / 5, "The patch should only contain the changed initializer."
+    with open(new, 'rb') as f:
+        assert apply(data, patch) == f.read(), "Applying the patch should result in the new model."
+    assert write_patch(MODEL, MODEL, str(tmp_path / "same")) < 300, "The patch of an unchanged model should be tiny."
+    with pytest.raises(ValueError):
+        apply(patch, patch)  # another base.
+    with pytest.raises(ValueError):
+        segments(b"\x0f\x00")  # not a protobuf message.
+
+
+# test_delta_update tests delta updates against the platform, and the fallbacks to complete uploads.
+def test_delta_update(tmp_path, platform):
+    cfid = platform.add_model("Model")
+    runner = CliRunner()
+    result = runner.invoke(update, ['-id', cfid, '-f', MODEL, '-n', "Model", '--delta'])
+    assert result.exit_code == 0 and "no earlier delta update" in result.output, "Unexpected: " + result.output
+    assert platform.uploads[-1]['method'] == "PUT", "The first delta update should send the complete model."
+
+    new = _retrain(tmp_path / "new.onnx")
+    result = runner.invoke(update, ['-id', cfid, '-f', new, '-n', "Model", '--delta'])
+    assert result.exit_code == 0 and "Sent a patch of" in result.output, "Unexpected: " + result.output
+    assert platform.uploads[-1]['method'] == "PATCH" and platform.uploads[-1]['patched'] == file_hash(new), \
+        "The platform should have rebuilt the new model from the patch."
+    assert platform.uploads[-1]['received'] < os.path.getsize(new) / 5, "The patch should be much smaller."
+
+    platform.files.clear()  # e.g., the model was updated from another machine.
+    newer = _retrain(tmp_path / "newer.onnx", seed=2)
+    result = runner.invoke(update, ['-id', cfid, '-f', newer, '-n', "Model", '--delta'])
+    assert result.exit_code == 0 and "did not accept the patch" in result.output, "Unexpected: " + result.output
+    assert [u['method'] for u in platform.uploads[-2:]] == ["PATCH", "PUT"], "A rejected patch should fall back."
+    assert platform.files[cfid] == open(newer, 'rb').read(), "The complete model should have been sent."
+
+    result = runner.invoke(update, ['-id', cfid, '-f', _retrain(tmp_path / "all.onnx", count=45), '-n', "Model",
+                                    '--delta'])
+    assert result.exit_code == 0 and "would not be smaller" in result.output, "Unexpected: " + result.output
+    assert platform.uploads[-1]['method'] == "PUT", "Large changes should be sent as the complete model."
+
+
+# test_delta_unsupported tests that a toolchain without patches is recorded, and that other errors are not hidden.
+def test_delta_unsupported(tmp_path, platform):
+    cfid = platform.add_model("Model")
+    runner = CliRunner()
+    assert runner.invoke(update, ['-id', cfid, '-f', MODEL, '-n', "Model", '--delta']).exit_code == 0, \
+        "Unable to send the first delta update."
+
+    platform.failure_rate, platform.failure_status = 1.0, 500
+    result = runner.invoke(update, ['-id', cfid, '-f', _retrain(tmp_path / "new.onnx"), '-n', "Model", '--delta'])
+    platform.failure_rate = 0.0
+    assert result.exit_code == 1 and platform.failures == 1, \
+        "Only a patch the toolchain cannot apply should fall back: " + result.output
+
+    platform.patches = False
+    result = runner.invoke(update, ['-id', cfid, '-f', _retrain(tmp_path / "new.onnx"), '-n', "Model", '--delta'])
+    assert result.exit_code == 0 and "does not support patches" in result.output, "Unexpected: " + result.output
+    assert platform.uploads[-1]['method'] == "PUT", "The complete model should have been sent."
+
+    platform.patches = True
+    result = runner.invoke(update, ['-id', cfid, '-f', _retrain(tmp_path / "newer.onnx", seed=2), '-n', "Model",
+                                    '--delta'])
+    assert result.exit_code == 0 and "does not support patches" in result.output, "Unexpected: " + result.output
+    assert [u['method'] for u in platform.uploads[-2:]] == ["PUT", "PUT"], "No patch should have been attempted."
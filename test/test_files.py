@@ -0,0 +1,73 @@
+import hashlib
+import os
+import pytest
+from click.testing import CliRunner
+import sclbl._globals as glob
+from sclbl.cli import upload, update, delete
+from sclbl._files import file_hash, details_hash
+
+MODEL = os.path.join(os.path.dirname(os.path.abspath(__file__)), "files", "model.onnx")
+
+
+@pytest.fixture(autouse=True)
+def cache_file(tmp_path, monkeypatch):
+    monkeypatch.setattr(glob, "CACHE_FILE", str(tmp_path / "cache.sqlite"))
+
+
+# test_file_hash tests hashing files over a memory map.
+def test_file_hash(tmp_path):
+    with open(MODEL, 'rb') as f:
+        expected = hashlib.sha256(f.read()).hexdigest()
+    assert file_hash(MODEL) == expected, "Hash of the model is incorrect."
+    assert file_hash(MODEL, chunk_size=7) == expected, "Hash should not depend on the chunk size."
+    empty = tmp_path / "empty.onnx"
+    empty.write_bytes(b"")
+    assert file_hash(str(empty)) == hashlib.sha256(b"").hexdigest(), "Hash of an empty file is incorrect."
+    assert details_hash(name="a", docs="b") != details_hash(name="a", docs="c"), "Details should be hashed."
+
+
+# test_upload_skips_unchanged tests that unchanged models are only uploaded again using --force.
+def test_upload_skips_unchanged(platform, monkeypatch):
+    import sclbl._transport as transport
+    calls = []
+    monkeypatch.setattr(transport, "upload_model", lambda path, name, docs, example, email, cfid="", **kwargs:
+                        calls.append(cfid or path) or {'cfid': cfid or "new-" + str(len(calls))})
+
+    runner = CliRunner()
+    runner.invoke(upload, ['-f', MODEL, '-n', "Model"])
+    result = runner.invoke(upload, ['-f', MODEL, '-n', "Model"])
+    assert len(calls) == 1 and "unchanged" in result.output, "Unchanged model should be skipped."
+    runner.invoke(upload, ['-f', MODEL, '-n', "Model", '-d', "New docs"])
+    assert len(calls) == 2, "Model with changed docs should be uploaded."
+    runner.invoke(upload, ['-f', MODEL, '-n', "Model", '--force'])
+    assert len(calls) == 3, "--force should upload unchanged models."
+
+    runner.invoke(update, ['-id', "cfid-1", '-f', MODEL, '-n', "Model"])
+    runner.invoke(update, ['-id', "cfid-1", '-f', MODEL, '-n', "Model"])
+    runner.invoke(update, ['-id', "cfid-2", '-f', MODEL, '-n', "Model"])
+    assert calls[3:] == ["cfid-1", "cfid-2"], "Unchanged updates should be skipped per model."
+
+
+# test_upload_after_delete tests that a deleted model is uploaded again, and that uploads without cfid are not skipped.
+def test_upload_after_delete(platform):
+    platform.returns_cfid = True
+    runner = CliRunner()
+    runner.invoke(upload, ['-f', MODEL, '-n', "Model"])
+    assert "unchanged" in runner.invoke(upload, ['-f', MODEL, '-n', "Model"]).output, "The model should be skipped."
+    result = runner.invoke(delete, ['--cfid', platform.models[0]['cfid']])
+    assert result.exit_code == 0 and not platform.models, "Unable to delete the model: " + result.output
+    result = runner.invoke(upload, ['-f', MODEL, '-n', "Model"])
+    assert result.exit_code == 0 and len(platform.uploads) == 2, "A deleted model should be uploaded: " + result.output
+
+    platform.returns_cfid = False  # its upload cannot be forgotten when the model is deleted.
+    runner.invoke(upload, ['-f', MODEL, '-n', "Model", '-d', "New docs"])
+    runner.invoke(upload, ['-f', MODEL, '-n', "Model", '-d', "New docs"])
+    assert len(platform.uploads) == 4, "Uploads without cfid should not be skipped."
+
+
+# test_compress_option tests that an unavailable compression method is rejected before uploading.
+def test_compress_option(monkeypatch):
+    import importlib.util
+    monkeypatch.setattr(importlib.util, "find_spec", lambda name: None)
+    result = CliRunner().invoke(upload, ['-f', MODEL, '-n', "Model", '--compress', "zstd"])
+    assert result.exit_code == 2 and "zstandard" in result.output, "zstd without zstandard should be rejected."
@@ -0,0 +1,102 @@
+import csv
+import io
+import json
+import pytest
+from click.testing import CliRunner
+from sclbl.cli import models, devices
+from sclbl._output import write_records, _write_table
+from sclbl._cache import FetchError
+
+COLUMNS = [("Model name", 'name', True), ("CFID", 'cfid', False)]
+RECORDS = [{'name': "Model " + str(i), 'cfid': "cfid-" + str(i), 'exampleinput': "[" + str(i) + "]"} for i in range(5)]
+
+
+# _table renders records as a table of the given width.
+def _table(records, width=80):
+    out = io.StringIO()
+    _write_table(iter(records), COLUMNS, out, 1000, width)
+    return out.getvalue()
+
+
+# test_table tests that the column widths follow from the data, shrinking names (not ids) to fit.
+def test_table():
+    lines = _table(RECORDS).splitlines()
+    assert lines[1] == "Model name: | CFID:", "Columns should be as wide as their values or titles."
+    assert lines[3] == "Model 0     | cfid-0", "Wrong row."
+
+    wide = [{'name': "A very long model name " * 3, 'cfid': "0123456789abcdef0123456789abcdef"}]
+    lines = _table(wide, width=60).splitlines()
+    assert max(len(line) for line in lines) <= 60, "The table should fit the width."
+    assert lines[3].endswith(".. | 0123456789abcdef0123456789abcdef"), "Names (not ids) should be shortened."
+
+
+# test_write_table tests streaming a table sized to the first batch of records.
+def test_write_table():
+    records = RECORDS + [{'name': "A much longer model name", 'cfid': "cfid-5"}]
+    out = io.StringIO()
+    assert write_records(iter(records), "table", COLUMNS, out, batch_size=2) == 6, "Not all records were written."
+    lines = out.getvalue().splitlines()
+    assert lines[:4] == _table(RECORDS[:2]).splitlines()[:4], "The table should be sized to the first batch."
+    assert lines[-2] == "A much lo.. | cfid-5" and lines[-1] == lines[0], "Later values should be shortened."
+
+    def paged():  # e.g., the pages of models --all.
+        yield from RECORDS[:2]
+        assert len(out.getvalue().splitlines()) == 3 + 2, "The first page should be written before the next arrives."
+        yield from RECORDS[2:]
+
+    out = io.StringIO()
+    assert write_records(paged(), "table", COLUMNS, out, batch_size=2) == 5, "Not all records were written."
+
+    def failing():
+        yield from RECORDS[:3]
+        raise FetchError("page unavailable")
+
+    out = io.StringIO()
+    with pytest.raises(FetchError):
+        write_records(failing(), "table", COLUMNS, out, batch_size=2)
+    assert len(out.getvalue().splitlines()) == 3 + 3 + 1, "The rows received before the error should be written."
+
+
+# test_write_records tests the streaming formats.
+def test_write_records():
+    for fmt in ["json", "jsonl", "csv"]:
+        out = io.StringIO()
+        assert write_records(iter(RECORDS), fmt, COLUMNS, out, batch_size=2) == 5, "Not all records were written."
+        text = out.getvalue()
+        if fmt == "json":
+            assert json.loads(text) == RECORDS, "Invalid JSON output."
+        elif fmt == "jsonl":
+            assert [json.loads(line) for line in text.splitlines()] == RECORDS, "Invalid JSON lines output."
+        else:
+            assert list(csv.DictReader(io.StringIO(text))) == [{'name': r['name'], 'cfid': r['cfid']} for r in RECORDS]
+
+    def failing():
+        yield from RECORDS[:3]
+        raise FetchError("page unavailable")
+
+    out = io.StringIO()
+    with pytest.raises(FetchError):
+        write_records(failing(), "json", COLUMNS, out, batch_size=2)
+    assert json.loads(out.getvalue()) == RECORDS[:3], "The JSON array should be closed after an error."
+    out = io.StringIO()
+    write_records([], "json", COLUMNS, out)
+    assert json.loads(out.getvalue()) == [], "An empty listing should be an empty array."
+
+
+# test_listing_formats tests the --format option of the listings.
+def test_listing_formats(platform, monkeypatch):
+    for i in range(3):
+        platform.add_model("Model " + str(i))
+    result = CliRunner().invoke(models, ['--format', 'jsonl', '--all', '--limit', '2'])
+    assert [json.loads(line) for line in result.output.splitlines()] == platform.models, "Wrong JSON lines."
+    result = CliRunner().invoke(devices, ['--format', 'json'])
+    assert result.exit_code == 0 and json.loads(result.output) == [], "Empty listings should be valid JSON."
+
+    platform.models.clear()
+    result = CliRunner().invoke(models, ['--refresh'])
+    assert "You have not yet uploaded any models." in result.output, "Empty tables should say so."
+
+    import sclblpy._globals as spglob
+    monkeypatch.setattr(spglob, "JWT_TOKEN", "expired")
+    result = CliRunner().invoke(models, ['--format', 'csv', '--refresh'])
+    assert result.exit_code == 1 and result.output.splitlines()[0] == "name,cfid", "Errors should fail the command."
@@ -0,0 +1,99 @@
+import time
+import pytest
+from click.testing import CliRunner
+import sclbl._policy as policy
+from sclbl._transport import session
+from sclbl.cli import models, assign
+from mock_server import TOKEN, USER_ID
+
+
+# test_retries tests that injected failures are retried, for listings and (unprocessed) assignments.
+def test_retries(platform, monkeypatch):
+    monkeypatch.setattr(policy, "BACKOFF", 0.001)
+    for i in range(50):
+        platform.add_model("Model " + str(i))
+    calls = []  # every third request fails (random failures could fail a page MAX_ATTEMPTS times).
+    monkeypatch.setattr(platform, "_fail", lambda: calls.append(1) is None and len(calls) % 3 == 1)
+    result = CliRunner().invoke(models, ['--all', '--limit', "5", '--format', "jsonl", '--refresh'])
+    assert result.exit_code == 0 and len(result.output.splitlines()) == 50, "Listing failed: " + result.output
+    assert len(calls) > 11, "The failed requests of the 11 pages were not retried."
+
+    cfid, did = platform.add_model("Model"), platform.add_device("Device")
+    platform.failure_rate, platform.failures = 1.0, 0
+    monkeypatch.setattr(platform, "_fail", lambda: platform.failures < 2 and setattr(platform, "failures",
+                                                                                        platform.failures + 1) is None)
+    result = CliRunner().invoke(assign, ['--cfid', cfid, '--did', did, '--rid', "rid-" + did])
+    assert result.exit_code == 0 and len(platform.assignments) == 1, "A 503 should be retried: " + result.output
+
+
+# test_writes tests that writes are only repeated when the server did not process them.
+def test_writes(platform, monkeypatch):
+    monkeypatch.setattr(policy, "BACKOFF", 0.001)
+    platform.failure_rate = 1.0
+    for status in [500, 502, 504]:
+        platform.failure_status = status
+        session().post(platform.url + "/assign/" + USER_ID, data="{}", headers={'Authorization': TOKEN})
+    assert len(platform.requests) == 3, "A failed (5xx) write may have been processed and should not be repeated."
+    platform.requests.clear()
+    policy.reset()  # close the circuit opened by these failures.
+    platform.failure_status = 503
+    session().post(platform.url + "/assign/" + USER_ID, data="{}", headers={'Authorization': TOKEN})
+    assert len(platform.requests) == policy.MAX_ATTEMPTS, "An unprocessed (503) write should be retried."
+
+
+# test_exit_codes tests that failures are reflected in the exit code.
+def test_exit_codes(platform, monkeypatch):
+    monkeypatch.setattr(policy, "BACKOFF", 0.001)
+    platform.failure_rate = 1.0
+    result = CliRunner().invoke(models, ['--refresh'])
+    assert result.exit_code == 1 and "Unable to retrieve your models." in result.output, "A failed listing should fail."
+    result = CliRunner().invoke(assign, ['--cfid', "c", '--did', "d", '--rid', "r"])
+    assert result.exit_code == 1, "A failed assignment should fail."
+
+
+# test_circuit_breaker tests failing at once when a server is down, and recovering after the cooldown.
+def test_circuit_breaker(platform, monkeypatch):
+    monkeypatch.setattr(policy, "BACKOFF", 0.001)
+    monkeypatch.setattr(policy, "BREAKER_COOLDOWN", 0.2)
+    url = platform.url + "/devices/" + USER_ID
+    platform.failure_rate = 1.0
+    assert session().get(url, headers={'Authorization': TOKEN}).status_code == 503, "The failure should be returned."
+    with pytest.raises(policy.CircuitOpenError):
+        session().get(url, headers={'Authorization': TOKEN})
+    sent = len(platform.requests)
+    assert sent == policy.BREAKER_FAILURES, "The circuit should open after BREAKER_FAILURES failures."
+    with pytest.raises(policy.CircuitOpenError):
+        session().get(url, headers={'Authorization': TOKEN})
+    assert len(platform.requests) == sent, "An open circuit should not send requests."
+
+    platform.failure_rate = 0.0
+    time.sleep(0.25)
+    assert session().get(url, headers={'Authorization': TOKEN}).ok, "The circuit should close when the server is back."
+
+
+# test_hedged_reads tests that a slow read is hedged.
+def test_hedged_reads(platform, monkeypatch):
+    monkeypatch.setattr(policy, "HEDGE_AFTER", 0.05)
+    platform.stall, platform.stall_seconds = 1, 2.0
+    start = time.monotonic()
+    response = session().get(platform.url + "/devices/" + USER_ID, headers={'Authorization': TOKEN})
+    assert response.ok and time.monotonic() - start < 1.0, "The slow read should have been hedged."
+    assert len(platform.requests) == 2, "The read should have been sent twice."
+
+
+# test_stalled_requests tests that requests to a server that stopped responding time out.
+def test_stalled_requests(platform, monkeypatch):
+    monkeypatch.setattr(policy, "BACKOFF", 0.001)
+    monkeypatch.setattr(policy, "HEDGE_AFTER", 0.05)
+    monkeypatch.setattr(policy, "READ_TIMEOUT", 0.3)
+    cfid, did = platform.add_model("Model"), platform.add_device("Device")
+    platform.stall, platform.stall_seconds = 1, 5.0
+    start = time.monotonic()
+    result = CliRunner().invoke(assign, ['--cfid', cfid, '--did', did, '--rid', "rid-" + did])
+    assert result.exit_code == 1 and time.monotonic() - start < 2.0, "A stalled assignment should time out."
+    assert len(platform.requests) == 1 and not platform.assignments, "A timed out write should not be repeated."
+
+    platform.stall = 2  # the read and its hedge.
+    start = time.monotonic()
+    response = session().get(platform.url + "/devices/" + USER_ID, headers={'Authorization': TOKEN})
+    assert response.ok and time.monotonic() - start < 2.0, "A stalled read should time out and be retried."
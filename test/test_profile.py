@@ -0,0 +1,38 @@
+import json
+from click.testing import CliRunner
+import sclbl._profile as profile
+from sclbl.cli import main
+
+
+# test_span tests that spans are only recorded while profiling.
+def test_span():
+    with profile.span("disabled"):
+        pass
+    assert profile.start(summary=True) and not profile.start(summary=True), "Profiling should start once."
+    with profile.span("enabled", "test", key="value") as s:
+        s.args['more'] = 1
+    names = [span[0] for span in profile._spans]
+    assert "import" in names and "enabled" in names and "disabled" not in names, "Unexpected spans: " + str(names)
+    assert profile._spans[-1][5] == {'key': "value", 'more': 1}, "Arguments not recorded."
+    profile.enabled = False
+
+
+# test_profile tests the summary and trace of a command against the platform.
+def test_profile(tmp_path, platform):
+    for i in range(30):
+        platform.add_model("Model " + str(i))
+    trace = str(tmp_path / "trace.json")
+    result = CliRunner().invoke(main, ['--profile', '--trace', trace, 'models', '--all', '--limit', "10"])
+    assert result.exit_code == 0 and "Model 29" in result.output, "The command failed: " + result.output
+    assert "Profile of sclbl models" in result.output, "No summary printed."
+    assert "GET /compute-functions" in result.output and "Network: 4 requests" in result.output, \
+        "Requests not summarized: " + result.output
+    with open(trace) as f:
+        events = json.load(f)['traceEvents']
+    requests = [e for e in events if e['cat'] == "remote"]
+    assert len(requests) == 4 and all(e['args']['received'] > 0 for e in requests), "Requests not traced."
+    assert set(["import", "render"]).issubset(e['name'] for e in events), "Startup or rendering not traced."
+    assert not profile.enabled, "Profiling should stop with the command."
+
+    result = CliRunner().invoke(main, ['models'], env={'SCLBL_PROFILE': "1"})
+    assert "Profile of sclbl models" in result.output, "SCLBL_PROFILE should enable the summary."
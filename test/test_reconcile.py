@@ -0,0 +1,83 @@
+import json
+import pytest
+from click.testing import CliRunner
+from sclbl.cli import apply
+from sclbl._reconcile import read_desired, plan
+
+MODELS = [{'cfid': "m1", 'name': "Resnet"}, {'cfid': "m2", 'name': "Mobilenet"}, {'cfid': "m3", 'name': "Mobilenet"}]
+DEVICES = [{'did': "d1", 'rid': "r1", 'name': "Camera 1"}, {'did': "d2", 'rid': "r2", 'name': "Camera 2"}]
+
+
+# test_read_desired tests reading JSON and YAML desired states.
+def test_read_desired(tmp_path):
+    path = tmp_path / "desired.json"
+    path.write_text(json.dumps({'devices': {"Camera 1": ["Resnet"], "Camera 2": "Resnet", "d3": None}}))
+    assert read_desired(str(path)) == [("Camera 1", ["Resnet"]), ("Camera 2", ["Resnet"]), ("d3", [])], "Bad state."
+    path = tmp_path / "desired.yaml"
+    path.write_text("devices:\n  Camera 1: [Resnet, m2]\n")
+    pytest.importorskip("yaml")
+    assert read_desired(str(path)) == [("Camera 1", ["Resnet", "m2"])], "Unable to read YAML."
+    path.write_text("models: []\n")
+    with pytest.raises(ValueError):
+        read_desired(str(path))
+
+
+# test_plan tests computing the minimal changes, and reporting unknown and ambiguous names.
+def test_plan():
+    assignments = [{'aid': "a1", 'cfid': "m1", 'did': "d1"}, {'aid': "a2", 'cfid': "m1", 'did': "d1"},
+                   {'aid': "a3", 'cfid': "m3", 'did': "d1"}, {'aid': "a4", 'cfid': "m3", 'did': "d9"}]
+    creates, deletes = plan([("Camera 1", ["Resnet", "m2"]), ("d2", ["m1"])], MODELS, DEVICES, assignments)
+    assert [(row['cfid'], row['did'], row['rid']) for row in creates] == [("m2", "d1", "r1"), ("m1", "d2", "r2")], \
+        "Missing assignments should be created."
+    assert [record['aid'] for record in deletes] == ["a2", "a3"], "Duplicate and superfluous assignments of listed " \
+                                                                  "devices (only) should be deleted."
+    assert plan([("Camera 1", ["Resnet"])], MODELS, DEVICES, assignments[:1]) == ([], []), "Nothing should change."
+    with pytest.raises(ValueError) as e:
+        plan([("Camera 3", ["Resnet"]), ("Camera 1", ["Mobilenet"])], MODELS, DEVICES, [])
+    assert "Unknown device 'Camera 3'" in str(e.value) and "ambiguous" in str(e.value), "All problems should be listed."
+
+
+# test_apply tests the apply command against the platform, including the plan (dry run).
+def test_apply(tmp_path, platform):
+    resnet, mobilenet = platform.add_model("Resnet"), platform.add_model("Mobilenet")
+    dids = [platform.add_device("Camera " + str(i)) for i in range(20)]
+    path = tmp_path / "desired.json"
+    path.write_text(json.dumps({'devices': {"Camera " + str(i): ["Resnet"] for i in range(20)}}))
+    result = CliRunner().invoke(apply, [str(path), '--plan'])
+    assert result.exit_code == 0 and "20 assignments to create" in result.output, "Unexpected plan: " + result.output
+    assert not platform.assignments, "--plan should not change anything."
+
+    result = CliRunner().invoke(apply, [str(path)])
+    assert result.exit_code == 0 and len(platform.assignments) == 20, "Unable to apply: " + result.output
+    path.write_text(json.dumps({'devices': {"Camera 0": ["Mobilenet"], "Camera 1": []}}))
+    result = CliRunner().invoke(apply, [str(path)])
+    assert result.exit_code == 0 and "Plan: 1 assignments to create, 2 to delete" in result.output, result.output
+    assert sorted((a['cfid'], a['did']) for a in platform.assignments if a['did'] in dids[:2]) == \
+        [(mobilenet, dids[0])], "The assignments of the listed devices should match the desired state."
+    assert len([a for a in platform.assignments if a['cfid'] == resnet]) == 18, "Other devices should be left alone."
+    result = CliRunner().invoke(apply, [str(path)])
+    assert "Plan: 0 assignments to create, 0 to delete" in result.output, "Applying again should change nothing."
+
+    path.write_text(json.dumps({'devices': {"Camera 99": ["Resnet"]}}))
+    result = CliRunner().invoke(apply, [str(path)])
+    assert result.exit_code == 2 and "Unknown device 'Camera 99'" in result.output, "Unknown devices should fail."
+
+
+# test_apply_retries tests that apply only retries the changes the platform did not process.
+def test_apply_retries(tmp_path, platform, monkeypatch):
+    platform.add_model("Resnet")
+    platform.add_model("Mobilenet")
+    platform.add_device("Camera 1")
+    path = tmp_path / "desired.json"
+    path.write_text(json.dumps({'devices': {"Camera 1": ["Resnet"]}}))
+    assert CliRunner().invoke(apply, [str(path)]).exit_code == 0, "Unable to apply."
+
+    platform.requests.clear()
+    platform.failure_status = 500  # e.g., the assignment was created, but the response failed.
+    refusals = iter([True])
+    monkeypatch.setattr(platform, "_fail", lambda: platform.requests[-1][0] == "POST" and next(refusals, False))
+    path.write_text(json.dumps({'devices': {"Camera 1": ["Mobilenet"]}}))
+    result = CliRunner().invoke(apply, [str(path), '--retries', '3'])
+    assert result.exit_code == 1 and "1 deletes skipped" in result.output, "Unexpected: " + result.output
+    assert len([r for r in platform.requests if r[0] == "POST"]) == 1, "A failed assignment should not be retried."
+    assert not [r for r in platform.requests if r[0] == "DELETE"], "The old assignment should be kept."
@@ -0,0 +1,57 @@
+import subprocess
+import sys
+
+# Modules that should only load when a command runs.
+HEAVY_MODULES = ["sclblpy", "requests", "urllib3", "numpy", "asyncio", "sqlite3", "ssl"]
+# The modules (besides the standard library and click) that importing the CLI loads; extend deliberately, never
+# silently: every module listed adds to the start of every command.
+STARTUP_MODULES = ["sclbl", "sclbl.cli", "sclbl.version", "sclbl._globals", "sclbl._profile"]
+
+
+# _importtime runs a python snippet with -X importtime and returns {module: cumulative microseconds}.
+def _importtime(code):
+    """ Run code in a fresh interpreter and parse the -X importtime report. """
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", code],
+                          stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True)
+    modules = {}
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        try:
+            _, cumulative, name = line[len("import time:"):].split("|")
+            modules[name.strip()] = int(cumulative)
+        except ValueError:  # header line
+            continue
+    return modules
+
+
+# test_help_is_lazy tests that --help never imports the network stack.
+def test_help_is_lazy():
+    modules = _importtime("from sclbl.cli import main; main(['--help'], standalone_mode=False)")
+    loaded = [m for m in modules if m.split(".")[0] in HEAVY_MODULES]
+    assert not loaded, "sclbl --help imported " + ", ".join(loaded)
+
+
+# test_argument_error_is_lazy tests that argument errors never import the network stack.
+def test_argument_error_is_lazy():
+    modules = _importtime("from sclbl.cli import main\n"
+                          "try:\n    main(['upload'], standalone_mode=False)\nexcept Exception:\n    pass")
+    loaded = [m for m in modules if m.split(".")[0] in HEAVY_MODULES]
+    assert not loaded, "sclbl upload (missing options) imported " + ", ".join(loaded)
+
+
+# test_cold_start_modules tests that importing the CLI only loads the modules every command needs.
+def test_cold_start_modules():
+    modules = _importtime("import sclbl.cli")
+    assert "sclbl.cli" in modules, "Unable to list the modules imported by sclbl.cli."
+    interpreter = _importtime("pass")  # e.g., site packages.
+    stdlib = getattr(sys, "stdlib_module_names", None)  # Python 3.10+; before, only the sclbl modules are checked.
+
+    def unexpected(module):
+        package = module.split(".")[0]
+        return package not in stdlib and package != "click" if stdlib else package == "sclbl"
+
+    loaded = [m for m in modules if m not in interpreter and m not in STARTUP_MODULES and unexpected(m)]
+    assert not loaded, "import sclbl.cli loaded " + ", ".join(sorted(loaded)) + " (see STARTUP_MODULES)."
+    heavy = [m for m in modules if m.split(".")[0] in HEAVY_MODULES]
+    assert not heavy, "import sclbl.cli imported " + ", ".join(heavy)
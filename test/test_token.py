@@ -0,0 +1,66 @@
+import os
+import time
+import pytest
+from click.testing import CliRunner
+import sclblpy
+import sclblpy._globals as spglob
+import sclbl.cli as cli
+import sclbl._globals as glob
+import sclbl._token as token
+import sclbl._transport as transport
+from mock_server import MockServer, TOKEN, USER_ID
+
+
+@pytest.fixture(autouse=True)
+def token_file(tmp_path, monkeypatch):
+    monkeypatch.setattr(glob, "TOKEN_FILE", str(tmp_path / "config" / "token.json"))
+    monkeypatch.setattr(glob, "CACHE_FILE", str(tmp_path / "cache.sqlite"))
+    monkeypatch.setattr(token, "_saved", None)
+    monkeypatch.setattr(spglob, "JWT_TOKEN", TOKEN)
+    monkeypatch.setattr(spglob, "JWT_USER_ID", USER_ID)
+    monkeypatch.setattr(spglob, "JWT_TIMESTAMP", time.time())
+    return glob.TOKEN_FILE
+
+
+# test_save_load tests storing the token and only reading back tokens that are still valid.
+def test_save_load(token_file, monkeypatch):
+    assert token.save(), "The token should be written."
+    assert not token.save(), "An unchanged token should not be written again."
+    if os.name == "posix":
+        assert os.stat(token_file).st_mode & 0o777 == 0o600, "The token file should only be readable by its owner."
+    assert token.load()['token'] == TOKEN, "The token should be read back."
+
+    server = glob.USER_MANAGER_URL
+    monkeypatch.setattr(glob, "USER_MANAGER_URL", "https://other.server")
+    assert token.load() is None, "Tokens of another user manager should not be used."
+    monkeypatch.setattr(glob, "USER_MANAGER_URL", server)
+
+    os.chmod(token_file, 0o644)
+    if os.name == "posix":
+        assert token.load() is None, "A token readable by others should not be used."
+    os.chmod(token_file, 0o600)
+    monkeypatch.setattr(spglob, "JWT_TIMESTAMP", time.time() - token.EXPIRES_AFTER)
+    token.save()
+    assert token.load() is None, "Expired tokens should not be used."
+    token.clear()
+    assert not os.path.exists(token_file), "clear() should remove the token."
+
+
+# test_refresh tests refreshing the token shortly before sclblpy would.
+def test_refresh(monkeypatch):
+    with MockServer() as mock:
+        monkeypatch.setattr(spglob, "USER_MANAGER_URL", mock.url)
+        assert token.refresh() > token.REFRESH_AFTER - 5, "A fresh token should not be refreshed."
+        monkeypatch.setattr(spglob, "JWT_TIMESTAMP", time.time() - token.REFRESH_AFTER - 1)
+        assert token.refresh() == token.REFRESH_AFTER and mock.refreshes == 1, "An old token should be refreshed."
+        assert mock.signins == 0, "Refreshing should not sign in again."
+    assert time.time() - token.load()['issued'] < 5, "The refreshed token should be stored."
+
+
+# test_reset_clears_token tests that reset removes the cached token.
+def test_reset_clears_token(token_file, monkeypatch):
+    token.save()
+    monkeypatch.setattr(transport, "_configured", True)
+    monkeypatch.setattr(sclblpy, "remove_credentials", lambda debug=False: True)
+    CliRunner().invoke(cli.reset, [])
+    assert not os.path.exists(token_file), "reset should remove the cached token."
@@ -0,0 +1,122 @@
+import hashlib
+import json
+import os
+import time
+import tracemalloc
+import pytest
+import sclblpy._globals as spglob
+import sclbl._globals as glob
+from sclbl._transport import MultipartStream, UploadError, upload_model
+from mock_server import MockServer, TOKEN, USER_ID
+
+MODEL = os.path.join(os.path.dirname(os.path.abspath(__file__)), "files", "model.onnx")
+
+
+@pytest.fixture
+def server(monkeypatch):
+    with MockServer() as mock:
+        monkeypatch.setattr(glob, "TOOLCHAIN_URL", mock.url)
+        monkeypatch.setattr(spglob, "JWT_TOKEN", TOKEN)
+        monkeypatch.setattr(spglob, "JWT_USER_ID", USER_ID)
+        monkeypatch.setattr(spglob, "JWT_TIMESTAMP", time.time())
+        yield mock
+
+
+# test_multipart_stream tests that the streamed body has the announced length and contains the file.
+def test_multipart_stream():
+    body = MultipartStream({'data': "{}"}, 'bundle', MODEL)
+    content = b""
+    while True:
+        block = body.read(1000)
+        assert len(block) <= 1000, "read() returned more than requested."
+        if not block:
+            break
+        content += block
+    body.close()
+    with open(MODEL, 'rb') as f:
+        assert f.read() in content, "The file is not part of the body."
+    assert len(content) == len(body), "The body length does not match Content-Length."
+
+
+# test_upload_model tests uploading and updating a model against the stand-in server.
+def test_upload_model(server):
+    progress = []
+    assert upload_model(MODEL, "Model", "Docs", "[1]", progress=lambda sent, total: progress.append(sent))
+    assert upload_model(MODEL, "Model", cfid="cfid-1")
+    new, updated = server.uploads
+    with open(MODEL, 'rb') as f:
+        assert new['content'] == f.read(), "The uploaded file is not intact."
+    assert new['method'] == "POST" and new['path'] == "/upload/" + USER_ID, "Wrong upload request."
+    assert json.loads(new['fields']['data'])['name'] == "Model", "Model details not sent."
+    assert updated['method'] == "PUT" and updated['path'].endswith("/cfid-1"), "Wrong update request."
+    assert progress[-1] > os.path.getsize(MODEL), "Progress should be reported up to the complete body."
+
+
+# test_upload_compressed tests compressed uploads, and skipping compression when it does not pay off.
+def test_upload_compressed(server, tmp_path):
+    path = str(tmp_path / "sparse.onnx")
+    with open(path, 'wb') as f:
+        f.write(bytes(8 * 1024 * 1024))
+    report = upload_model(path, "Sparse model", compress="gzip", backoff=0.01)
+    upload = server.uploads[0]
+    assert upload['encoding'] == "gzip" and report['compression'] == "gzip", "The upload should be compressed."
+    assert upload['sha256'] == hashlib.sha256(bytes(8 * 1024 * 1024)).hexdigest(), "The model did not arrive intact."
+    assert upload['received'] == report['sent'] < report['size'] // 10, "The compressed size is not reported."
+
+    server.drop_uploads = 1
+    assert upload_model(path, "Sparse model", cfid="cfid-1", compress="gzip", backoff=0.01), \
+        "Compressed uploads should be retried."
+    assert server.uploads[1]['size'] == 8 * 1024 * 1024, "The retried upload is incomplete."
+
+    noise = str(tmp_path / "noise.onnx")
+    with open(noise, 'wb') as f:
+        f.write(os.urandom(1024 * 1024))
+    report = upload_model(noise, "Noise", compress="gzip")
+    assert server.uploads[2]['encoding'] == "" and report['compression'] is None, "Compression should be skipped."
+    assert report['estimate'] > 0.9, "The estimated compression ratio is not reported."
+
+
+# test_upload_model_interrupted tests that an interrupted upload is retried.
+def test_upload_model_interrupted(server, tmp_path):
+    path = str(tmp_path / "large.onnx")  # larger than the socket buffers, so the interruption is noticed while sending.
+    with open(path, 'wb') as f:
+        f.write(bytes(32 * 1024 * 1024))
+    server.drop_uploads = 1
+    assert upload_model(path, "Model", backoff=0.01), "Interrupted upload should be retried."
+    assert len(server.uploads) == 1, "Upload should be received once."
+    server.drop_uploads = 5
+    with pytest.raises(UploadError):
+        upload_model(path, "Model", retries=1, backoff=0.01)
+    with pytest.raises(UploadError):
+        upload_model("missing.onnx", "Model")
+
+
+# test_upload_model_unanswered tests that a new model is not uploaded again when the response (not the body) failed.
+def test_upload_model_unanswered(server):
+    server.drop_responses = 1
+    with pytest.raises(UploadError):
+        upload_model(MODEL, "Model", backoff=0.01)
+    assert len(server.uploads) == 1, "A model that may have been uploaded should not be uploaded again."
+    server.drop_responses = 1
+    assert upload_model(MODEL, "Model", cfid="cfid-1", backoff=0.01), "An update should be retried."
+    assert [u['method'] for u in server.uploads[1:]] == ["PUT", "PUT"], "The update should be sent again."
+
+
+# test_upload_large_model tests that uploading a large model keeps memory use bounded.
+def test_upload_large_model(server, tmp_path):
+    path = str(tmp_path / "large.onnx")
+    digest = hashlib.sha256()
+    with open(path, 'wb') as f:
+        for i in range(64):
+            block = bytes([i]) * (1024 * 1024)
+            digest.update(block)
+            f.write(block)
+
+    tracemalloc.start()
+    try:
+        assert upload_model(path, "Large model")
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    assert server.uploads[0]['sha256'] == digest.hexdigest(), "The large model did not arrive intact."
+    assert peak < 16 * 1024 * 1024, "Uploading a 64 MB model used " + str(peak // 1024 // 1024) + " MB."
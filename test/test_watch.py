@@ -0,0 +1,94 @@
+import os
+from click.testing import CliRunner
+from sclbl.cli import upload, update, watch
+from sclbl._watch import Target, delays
+
+MODEL = os.path.join(os.path.dirname(os.path.abspath(__file__)), "files", "model.onnx")
+
+
+# test_delays tests the backoff of the poll interval and its reset on progress.
+def test_delays():
+    schedule = delays(interval=2.0, max_interval=10.0, factor=2.0)
+    first = next(schedule)
+    assert 1.0 <= first <= 2.0, "The first delay should be (a jittered) interval."
+    grown = [schedule.send(False) for _ in range(5)]
+    assert 2.0 <= grown[0] <= 4.0, "Without progress the interval should grow."
+    assert all(5.0 <= d <= 10.0 for d in grown[-2:]), "The interval should not exceed max_interval."
+    assert 1.0 <= schedule.send(True) <= 2.0, "Progress should reset the interval."
+
+
+# test_target tests matching new models by name and updated models against their baseline.
+def test_target():
+    old = {'cfid': "a", 'name': "Model"}
+    records = {"a": old, "b": {'cfid': "b", 'name': "Model", 'status': "Converting"}}
+    exclude = {"a"}
+    first, second = Target(name="Model", exclude=exclude), Target(name="Model", exclude=exclude)
+    assert first.update(records) and first.cfid == "b", "The new model should be matched by name."
+    assert first.state == "pending", "A converting model should be pending."
+    assert not second.update(records) and second.cfid == "", "A model should only be matched once."
+    records["b"] = dict(records["b"], status="ready")
+    assert first.update(records) and first.done, "A ready model should be done."
+
+    updated = Target("a", baseline=dict(old))
+    assert updated.update(records) and updated.state == "unknown" and updated.done, \
+        "The conversion of an unchanged record without status cannot be detected."
+    updated = Target("a", baseline=dict(old))
+    records["a"] = dict(old, exampleinput="[1]")
+    assert updated.update(records) and updated.state == "ready", "A changed record without status is ready."
+    assert not Target("a", baseline=dict(old, status="ready")).update({"a": dict(old, status="ready")}), \
+        "An unchanged record with a status should remain pending."
+
+
+# test_watch tests the watch command, including failed conversions and the timeout.
+def test_watch(platform):
+    cfid = platform.add_model("Model")
+    result = CliRunner().invoke(watch, ['--cfid', cfid, '--interval', "0.01"])
+    assert result.exit_code == 0 and "1 of 1 models converted" in result.output, "A listed model should be ready."
+
+    failing = platform.add_model("Model that will fail")
+    for model in platform.models:
+        model['status'] = "converting"
+    platform.converting = {model['cfid']: 0 for model in platform.models}
+    result = CliRunner().invoke(watch, ['--cfid', cfid, '--cfid', failing, '--interval', "0.01"])
+    assert result.exit_code == 1 and "Conversion FAILED: " + failing in result.output, "A failure should be reported."
+
+    platform.converting[cfid], platform.models[0]['status'] = float("inf"), "converting"
+    result = CliRunner().invoke(watch, ['--cfid', cfid, '--interval', "0.01", '--timeout', "0.1"])
+    assert result.exit_code == 1 and "still pending" in result.output, "A timeout should fail."
+    assert CliRunner().invoke(watch, []).exit_code == 2, "At least one cfid should be required."
+
+
+# test_watch_missing tests that unknown models fail at once, while new uploads may be listed later.
+def test_watch_missing(platform):
+    cfid = platform.add_model("Model")
+    result = CliRunner().invoke(watch, ['--cfid', cfid, '--cfid', "typo", '--interval', "0.01", '--timeout', "60"])
+    assert result.exit_code == 1 and "Unknown model: typo" in result.output, "Unexpected: " + result.output
+    assert "1 of 2 models converted; 1 not found." in result.output, "The missing model should not be waited for."
+
+    records = {cfid: platform.models[0]}
+    assert not Target("new", "New model", exclude={cfid}).update(records, complete=True), \
+        "A new upload may not be listed yet."
+    assert not Target("typo").update(records), "Only a complete listing shows that a model is missing."
+
+
+# test_upload_wait tests waiting for the conversion of uploaded and updated models.
+def test_upload_wait(platform):
+    platform.convert_after = 0.1
+    platform.add_model("Model")  # an existing model with the same name should not be waited for.
+    result = CliRunner().invoke(upload, ['-f', MODEL, '-n', "Model", '--wait'])
+    assert result.exit_code == 0, "Upload with --wait failed: " + result.output
+    assert "Converted: " + platform.models[1]['cfid'] in result.output, "The new model should be waited for."
+    assert platform.models[1]['status'] == "ready", "The command returned before the conversion finished."
+
+    cfid = platform.models[0]['cfid']
+    result = CliRunner().invoke(update, ['-id', cfid, '-f', MODEL, '-n', "Model fail", '--wait'])
+    assert result.exit_code == 1 and "Conversion FAILED: " + cfid in result.output, "A failed update should fail."
+
+
+# test_update_wait_without_status tests that update --wait does not wait when the conversion cannot be detected.
+def test_update_wait_without_status(platform):
+    cfid = platform.add_model("Model")  # the platform lists models without status (convert_after is None).
+    result = CliRunner().invoke(update, ['-id', cfid, '-f', MODEL, '-n', "Model", '--wait'])
+    assert result.exit_code == 0 and "Unable to tell when the conversion of " + cfid in result.output, \
+        "Unexpected: " + result.output
+    assert "0 of 1 models converted; 1 unknown." in result.output, "The unknown status should be summarized."